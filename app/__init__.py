@@ -14,7 +14,13 @@ from app.routes.categorization import user_categorization_bp
 from app.routes.report import report_bp
 from app.routes.chat import chat_bp
 from app.routes.memo_routes import memo_bp
+from app.routes.jobs import jobs_bp
 from app.socket.chat_socket import register_chat_events
+from app.socket.job_socket import register_job_events
+from app.services.job_engine import job_engine
+from app.services.job_handlers import register_job_types
+from app.services.timestamp_migration import start_background_timestamp_migration
+from app.services.indexes import start_background_index_build
 
 # Initialize SocketIO without app first
 socketio = SocketIO(
@@ -60,9 +66,21 @@ def create_app():
     app.register_blueprint(report_bp, url_prefix="/api/submit-report")
     app.register_blueprint(speech_to_text_bp, url_prefix="/api/speech-to-text")
     app.register_blueprint(text_to_speech_bp, url_prefix="/api/text-to-speech")
+    app.register_blueprint(jobs_bp, url_prefix="/api/jobs")
 
     # Register custom WebSocket events
     register_chat_events(socketio)
+    register_job_events(socketio)
+
+    # Background jobs: categorization / memory backfills, and any left interrupted by a restart
+    register_job_types(job_engine)
+    job_engine.recover()
+
+    # Build missing MongoDB indexes without blocking startup
+    start_background_index_build()
+
+    # Convert remaining ISO-string chat timestamps in the background (opt-in)
+    start_background_timestamp_migration()
 
     # Serve index.html for root (optional for SPA)
     @app.route("/")
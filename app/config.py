@@ -31,10 +31,83 @@ class Config:
     
     # Memory settings
     MEM0_COLLECTION_NAME = os.getenv('MEM0_COLLECTION_NAME', 'chat_memories')
+    MEMORY_SALIENCE_FILTER_ENABLED = os.getenv('MEMORY_SALIENCE_FILTER_ENABLED', 'true').lower() == 'true'
+    MEMORY_SALIENCE_THRESHOLD = float(os.getenv('MEMORY_SALIENCE_THRESHOLD', '0.5'))
+
+    # Per-conversation reply context cache (warmed when a chat is opened)
+    CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '600'))
+    CONTEXT_CACHE_MAX_CONVERSATIONS = int(os.getenv('CONTEXT_CACHE_MAX_CONVERSATIONS', '5000'))
+
+    # Conversation summaries
+    SUMMARY_MODEL = os.getenv('SUMMARY_MODEL', 'gemini-2.5-pro')
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '12000'))
+    SUMMARY_MAP_WORKERS = int(os.getenv('SUMMARY_MAP_WORKERS', '4'))
+    SUMMARY_TOKEN_CAP = int(os.getenv('SUMMARY_TOKEN_CAP', '1500'))
+    # Off until something reads the summaries: each update is a SUMMARY_MODEL call, and the
+    # first one for a conversation summarizes its whole history
+    SUMMARY_UPDATES_ENABLED = os.getenv('SUMMARY_UPDATES_ENABLED', 'false').lower() == 'true'
+    SUMMARY_DEBOUNCE_SECONDS = float(os.getenv('SUMMARY_DEBOUNCE_SECONDS', '30'))
+    SUMMARY_BATCH_MAX_MESSAGES = int(os.getenv('SUMMARY_BATCH_MAX_MESSAGES', '10'))
+    SUMMARY_MAX_CONCURRENT_JOBS = int(os.getenv('SUMMARY_MAX_CONCURRENT_JOBS', '2'))
+    SUMMARY_MAX_QUEUED_JOBS = int(os.getenv('SUMMARY_MAX_QUEUED_JOBS', '100'))
+
+    # Precomputed chat sessions (sessions collection)
+    SESSION_GAP_MINUTES = int(os.getenv('SESSION_GAP_MINUTES', '30'))
+    # Rollout: turn writes on, run `manage.py backfill-sessions`, then turn reads on.
+    # Reads imply writes, so the rows a request reads are kept current.
+    SESSION_STORE_READS_ENABLED = os.getenv('SESSION_STORE_READS_ENABLED', 'false').lower() == 'true'
+    SESSION_STORE_WRITES_ENABLED = SESSION_STORE_READS_ENABLED or os.getenv('SESSION_STORE_WRITES_ENABLED', 'false').lower() == 'true'
+
+    # Per-user daily rollups (user_daily_stats collection). Chat inserts always update them;
+    # turn reads on once `manage.py backfill-daily-stats` has run, so /daily-stats,
+    # /activity-analysis, /day-wise-analytics and the weekly cohorts stop scanning chats
+    DAILY_STATS_ROLLUP_READS_ENABLED = os.getenv('DAILY_STATS_ROLLUP_READS_ENABLED', 'false').lower() == 'true'
+
+    # Chat timestamps: native BSON dates (dual-read while old ISO strings are migrated)
+    CHAT_TIMESTAMPS_NATIVE = os.getenv('CHAT_TIMESTAMPS_NATIVE', 'true').lower() == 'true'
+    CHAT_TIMESTAMP_MIGRATION_ON_STARTUP = os.getenv('CHAT_TIMESTAMP_MIGRATION_ON_STARTUP', 'false').lower() == 'true'
+    CHAT_TIMESTAMP_MIGRATION_BATCH_SIZE = int(os.getenv('CHAT_TIMESTAMP_MIGRATION_BATCH_SIZE', '1000'))
+    CHAT_TIMESTAMP_MIGRATION_PAUSE_SECONDS = float(os.getenv('CHAT_TIMESTAMP_MIGRATION_PAUSE_SECONDS', '0.2'))
+
+    # Build the declared MongoDB indexes in a background thread at startup
+    ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+    # Session categorization with Gemini (worker pool + shared per-minute quotas)
+    CATEGORIZATION_MAX_WORKERS = int(os.getenv('CATEGORIZATION_MAX_WORKERS', '8'))
+    CATEGORIZATION_USER_BATCH_SIZE = int(os.getenv('CATEGORIZATION_USER_BATCH_SIZE', '25'))
+    CATEGORIZATION_OUTPUT_TOKEN_ESTIMATE = int(os.getenv('CATEGORIZATION_OUTPUT_TOKEN_ESTIMATE', '50'))
+    CATEGORIZATION_BATCH_MAX_SESSIONS = int(os.getenv('CATEGORIZATION_BATCH_MAX_SESSIONS', '20'))
+    CATEGORIZATION_BATCH_TOKEN_BUDGET = int(os.getenv('CATEGORIZATION_BATCH_TOKEN_BUDGET', '12000'))
+    CATEGORIZATION_SESSION_TOKEN_CAP = int(os.getenv('CATEGORIZATION_SESSION_TOKEN_CAP', '2000'))
+    LOCAL_CLASSIFIER_ENABLED = os.getenv('LOCAL_CLASSIFIER_ENABLED', 'false').lower() == 'true'
+    LOCAL_CLASSIFIER_CONFIDENCE = float(os.getenv('LOCAL_CLASSIFIER_CONFIDENCE', '0.85'))
+    LOCAL_CLASSIFIER_PATH = os.getenv('LOCAL_CLASSIFIER_PATH', 'models/category_classifier.joblib')
+    LOCAL_CLASSIFIER_EMBEDDING_MODEL = os.getenv('LOCAL_CLASSIFIER_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '150'))
+    GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '1000000'))
+
+    # Background jobs (bulk categorization, memory backfills)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', '15'))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '120'))
+    JOBS_RESUME_ON_STARTUP = os.getenv('JOBS_RESUME_ON_STARTUP', 'false').lower() == 'true'
+
+    # Parallel Mem0 backfills: worker processes and the Gemini / Qdrant budgets they share
+    MEMORY_BACKFILL_PROCESSES = int(os.getenv('MEMORY_BACKFILL_PROCESSES', '4'))
+    MEMORY_BACKFILL_GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('MEMORY_BACKFILL_GEMINI_REQUESTS_PER_MINUTE', '150'))
+    MEMORY_BACKFILL_QDRANT_OPS_PER_SECOND = int(os.getenv('MEMORY_BACKFILL_QDRANT_OPS_PER_SECOND', '50'))
+
+    # Response cache for analytics / categorization dashboards
+    ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYTICS_CACHE_LIVE_TTL_SECONDS = int(os.getenv('ANALYTICS_CACHE_LIVE_TTL_SECONDS', '60'))
+    ANALYTICS_CACHE_HISTORICAL_TTL_SECONDS = int(os.getenv('ANALYTICS_CACHE_HISTORICAL_TTL_SECONDS', '21600'))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYTICS_CACHE_MAX_ENTRIES', '256'))
 
     # AZURE VOICE SPEECH TO TEXT
     AZURE_SPEECH_TO_TEXT_API_URL = os.getenv('AZURE_SPEECH_TO_TEXT_API_URL')
     AZURE_SPEECH_TO_TEXT_API_KEY = os.getenv('AZURE_SPEECH_TO_TEXT_API_KEY')
+    # Seconds ffmpeg may spend transcoding one voice note to WAV
+    AUDIO_CONVERSION_TIMEOUT_SECONDS = float(os.getenv('AUDIO_CONVERSION_TIMEOUT_SECONDS', '30'))
     
     # AZURE TEXT TO SPEECH
     AZURE_TEXT_TO_SPEECH_API_KEY = os.getenv('AZURE_TEXT_TO_SPEECH_API_KEY')
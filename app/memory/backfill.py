@@ -0,0 +1,192 @@
+# app/memory/backfill.py
+"""
+Add existing chats to Mem0 memory, for the memo routes and background jobs
+
+Chats of a user-character pair are read oldest first with (timestamp, _id) keyset
+pagination, and the position after each batch is saved in `memory_backfill_progress`.
+A later run resumes after the last chat it processed, so a restarted migration neither
+rescans nor re-adds what is already in memory.
+"""
+from datetime import datetime
+from typing import Iterator, Optional
+
+from app.memory.memory_service import MemoryService
+from app.services.db import db
+from app.utility.chat_cursor import chat_keyset_filter, decode_chat_cursor, encode_chat_cursor
+
+CHAT_ORDER = [("timestamp", 1), ("_id", 1)]
+
+
+def _position_id(user_id: str, character_id: str) -> str:
+    return f"{user_id}:{character_id}"
+
+
+def load_backfill_position(user_id: str, character_id: str) -> Optional[str]:
+    """Cursor after the last chat added to memory for the pair (None if never backfilled)"""
+    position = db.memory_backfill_progress.find_one({"_id": _position_id(user_id, character_id)}, {"cursor": 1})
+    return position.get("cursor") if position else None
+
+
+def save_backfill_position(user_id: str, character_id: str, cursor: str, processed: int, failed: int) -> None:
+    db.memory_backfill_progress.update_one(
+        {"_id": _position_id(user_id, character_id)},
+        {
+            "$set": {"userId": str(user_id), "characterId": str(character_id), "cursor": cursor, "updatedAt": datetime.utcnow()},
+            "$inc": {"processed": processed, "failed": failed}
+        },
+        upsert=True
+    )
+
+
+def clear_backfill_position(user_id: str, character_id: str) -> None:
+    db.memory_backfill_progress.delete_one({"_id": _position_id(user_id, character_id)})
+
+
+def chat_pair_query(user_id: str, character_id: str, after: Optional[str] = None) -> dict:
+    """Chats of the pair, after cursor token `after` in CHAT_ORDER; raises ValueError for a bad token"""
+    query = {"userId": str(user_id), "characterId": str(character_id)}
+    if after:
+        query.update(chat_keyset_filter(decode_chat_cursor(after), descending=False))
+    return query
+
+
+def iter_chat_batches(user_id: str, character_id: str, batch_size: int, after: Optional[str] = None) -> Iterator[list]:
+    """
+    Batches of the pair's chats, oldest first, starting after cursor token `after`
+
+    Every batch is its own index range query continuing from the previous batch's last
+    chat, so batch N costs the same as batch 1 (unlike skip/limit).
+    """
+    while True:
+        batch = list(db.chats.find(chat_pair_query(user_id, character_id, after)).sort(CHAT_ORDER).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after = encode_chat_cursor(batch[-1])
+
+
+def process_chat_batch(memory_service: MemoryService, user_id: str, character_id: str, batch: list) -> dict:
+    """
+    Process a batch of chats and add them to memory
+    
+    Args:
+        memory_service: MemoryService instance
+        user_id: User ID
+        character_id: Character ID
+        batch: List of chat documents
+    
+    Returns:
+        dict: Results with processed and failed counts
+    """
+    processed = 0
+    failed = 0
+    
+    for chat in batch:
+        try:
+            message = chat.get("message", "").strip()
+            sender = chat.get("sender", "").strip()
+            
+            # Skip empty messages or invalid senders
+            if not message or sender not in ["user", "ai"]:
+                continue
+            
+            # Add to memory
+            success = memory_service.add_message_to_memory(user_id, character_id, message, sender)
+            
+            if success:
+                processed += 1
+            else:
+                failed += 1
+                
+        except Exception as e:
+            print(f"❌ Error processing chat {chat.get('_id', 'unknown')}: {e}")
+            failed += 1
+    
+    return {
+        "processed": processed,
+        "failed": failed
+    }
+
+
+def process_user_character_chats(
+    user_id: str,
+    character_id: str,
+    batch_size: int,
+    sub_batch_size: int,
+    memory_service: Optional[MemoryService] = None,
+    resume: bool = True
+) -> dict:
+    """
+    Process all chats for a specific user-character pair using the existing working logic
+    
+    Args:
+        user_id: User ID
+        character_id: Character ID
+        batch_size: Number of chats per batch
+        sub_batch_size: Sub-batch size for processing
+        memory_service: MemoryService to reuse (a new one is created if omitted)
+        resume: Continue after the last chat a previous run added (False starts over)
+    
+    Returns:
+        dict: Results with processed, failed, and memory counts ("error" is set on failure)
+    """
+    try:
+        # Initialize memory service
+        memory_service = memory_service or MemoryService()
+        
+        if not resume:
+            clear_backfill_position(user_id, character_id)
+        resumed_from = load_backfill_position(user_id, character_id)
+        
+        # Process all batches
+        total_processed = 0
+        total_failed = 0
+        total_batches = 0
+        
+        for chats in iter_chat_batches(user_id, character_id, batch_size, after=resumed_from):
+            # Process chats in sub-batches
+            batch_processed = 0
+            batch_failed = 0
+            
+            for i in range(0, len(chats), sub_batch_size):
+                sub_batch = chats[i:i + sub_batch_size]
+                sub_batch_results = process_chat_batch(memory_service, user_id, character_id, sub_batch)
+                batch_processed += sub_batch_results["processed"]
+                batch_failed += sub_batch_results["failed"]
+            
+            save_backfill_position(user_id, character_id, encode_chat_cursor(chats[-1]), batch_processed, batch_failed)
+            total_processed += batch_processed
+            total_failed += batch_failed
+            total_batches += 1
+        
+        if total_batches == 0:
+            return {
+                "total_processed": 0,
+                "total_failed": 0,
+                "total_memories": 0,
+                "total_batches": 0,
+                "resumed_from": resumed_from
+            }
+        
+        # Get final memory stats
+        final_stats = memory_service.get_memory_stats(user_id, character_id)
+        
+        return {
+            "total_processed": total_processed,
+            "total_failed": total_failed,
+            "total_memories": final_stats.get("total_memories", 0),
+            "total_batches": total_batches,
+            "resumed_from": resumed_from
+        }
+        
+    except Exception as e:
+        print(f"❌ Error processing user-character batches: {e}")
+        return {
+            "total_processed": 0,
+            "total_failed": 0,
+            "total_memories": 0,
+            "total_batches": 0,
+            "error": str(e)
+        }
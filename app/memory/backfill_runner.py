@@ -0,0 +1,229 @@
+# app/memory/backfill_runner.py
+"""
+Mem0 backfills spread across a process pool
+
+Users are handed out one at a time to worker processes. Each worker is started with
+"spawn", so it opens its own MongoDB client and Mem0 (Gemini + Qdrant) client instead of
+inheriting the parent's sockets. All workers draw on the same Gemini and Qdrant budgets
+through limiters kept in shared memory. Used by `python manage.py backfill-memories` and
+the "memory_backfill_parallel" job.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Iterable, Optional
+
+from app.config import Config
+
+# Rough cost of one mem0 `add` with inference: fact extraction and memory update LLM
+# calls plus an embedding, then a similarity search and a write in Qdrant
+GEMINI_CALLS_PER_ADD = 3
+QDRANT_OPS_PER_ADD = 2
+
+_spawn = multiprocessing.get_context("spawn")
+
+
+class SharedRateLimiter:
+    """
+    Evenly spaced calls at `rate` per `per_seconds`, across processes
+
+    The time the next call may start lives in shared memory, so the limiter can be handed
+    to pool workers at start-up and they all queue behind the same schedule.
+    """
+
+    def __init__(self, rate: float, per_seconds: float = 60.0):
+        self.interval = per_seconds / rate if rate > 0 else 0.0
+        self._next_start = _spawn.RawValue("d", 0.0)
+        self._lock = _spawn.Lock()
+
+    def acquire(self, cost: int = 1) -> float:
+        """Wait for `cost` calls' worth of capacity; returns the seconds spent waiting"""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.time()
+            start = max(self._next_start.value, now)
+            self._next_start.value = start + self.interval * cost
+        waited = start - now
+        if waited > 0:
+            time.sleep(waited)
+        return max(waited, 0.0)
+
+
+class RateLimitedMemory:
+    """Mem0 Memory wrapper that takes Gemini / Qdrant capacity before each call"""
+
+    def __init__(self, memory, gemini_limiter: SharedRateLimiter, qdrant_limiter: SharedRateLimiter):
+        self.memory = memory
+        self.gemini_limiter = gemini_limiter
+        self.qdrant_limiter = qdrant_limiter
+        self.rate_limited_seconds = 0.0
+
+    def add(self, *args, **kwargs):
+        self.rate_limited_seconds += self.gemini_limiter.acquire(GEMINI_CALLS_PER_ADD)
+        self.rate_limited_seconds += self.qdrant_limiter.acquire(QDRANT_OPS_PER_ADD)
+        return self.memory.add(*args, **kwargs)
+
+    def get_all(self, *args, **kwargs):
+        self.rate_limited_seconds += self.qdrant_limiter.acquire()
+        return self.memory.get_all(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.memory, name)
+
+
+# --- worker process side ---------------------------------------------------------------
+
+_worker_memory_service = None
+
+
+def _init_worker(gemini_limiter: SharedRateLimiter, qdrant_limiter: SharedRateLimiter) -> None:
+    """Runs once per worker: its own Mem0 client (MongoDB comes from importing app.services.db)"""
+    global _worker_memory_service
+    from app.memory.memory_service import MemoryService
+
+    _worker_memory_service = MemoryService()
+    _worker_memory_service.memory = RateLimitedMemory(_worker_memory_service.memory, gemini_limiter, qdrant_limiter)
+
+
+def _backfill_user(user_id: str, character_id: str, batch_size: int, sub_batch_size: int, resume: bool) -> dict:
+    from app.memory.backfill import process_user_character_chats
+
+    started = time.time()
+    waited_before = _worker_memory_service.memory.rate_limited_seconds
+    stats = process_user_character_chats(
+        user_id, character_id, batch_size, sub_batch_size, _worker_memory_service, resume=resume
+    )
+    return {
+        "user_id": user_id,
+        **stats,
+        "elapsed_seconds": round(time.time() - started, 2),
+        "rate_limited_seconds": round(_worker_memory_service.memory.rate_limited_seconds - waited_before, 2)
+    }
+
+
+# --- parent side ---------------------------------------------------------------------------
+
+class MemoryBackfillPool:
+    """Long-lived pool of backfill workers; created on first use"""
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        gemini_requests_per_minute: Optional[int] = None,
+        qdrant_ops_per_second: Optional[int] = None
+    ):
+        self.processes = processes or Config.MEMORY_BACKFILL_PROCESSES
+        self.gemini_requests_per_minute = gemini_requests_per_minute or Config.MEMORY_BACKFILL_GEMINI_REQUESTS_PER_MINUTE
+        self.qdrant_ops_per_second = qdrant_ops_per_second or Config.MEMORY_BACKFILL_QDRANT_OPS_PER_SECOND
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Job chunks call run() from several threads; they must all share one executor and
+        # so one pair of limiters
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=_spawn,
+                    initializer=_init_worker,
+                    initargs=(
+                        SharedRateLimiter(self.gemini_requests_per_minute, 60.0),
+                        SharedRateLimiter(self.qdrant_ops_per_second, 1.0),
+                    )
+                )
+            return self._executor
+
+    def submit(self, user_id: str, character_id: str, batch_size: int, sub_batch_size: int, resume: bool = True) -> Future:
+        return self._get_executor().submit(_backfill_user, user_id, character_id, batch_size, sub_batch_size, resume)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(
+        self,
+        user_ids: Iterable[str],
+        character_id: str,
+        batch_size: int = 50,
+        sub_batch_size: int = 10,
+        resume: bool = True,
+        on_user_complete: Optional[Callable[[dict], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> dict:
+        """
+        Backfill `user_ids` and report throughput
+
+        At most two users per worker are queued at a time, so `should_stop` takes effect
+        quickly. `on_user_complete` gets each user's result on the calling thread; a user
+        whose worker raised gets a result with "error".
+        """
+        report = BackfillReport(self.processes)
+        pending_users = iter(user_ids)
+        in_flight = {}
+        exhausted = False
+
+        while True:
+            while not exhausted and len(in_flight) < self.processes * 2 and not (should_stop and should_stop()):
+                user_id = next(pending_users, None)
+                if user_id is None:
+                    exhausted = True
+                    break
+                in_flight[self.submit(user_id, character_id, batch_size, sub_batch_size, resume)] = user_id
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                user_id = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"user_id": user_id, "total_processed": 0, "total_failed": 0, "total_memories": 0, "total_batches": 0, "error": str(e)}
+                report.add(result)
+                if on_user_complete:
+                    on_user_complete(result)
+
+        return report.summary()
+
+
+class BackfillReport:
+    """Cumulative counts plus users per minute and messages per second"""
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.started = time.time()
+        self.users = 0
+        self.failed_users = 0
+        self.messages = 0
+        self.failed_messages = 0
+        self.rate_limited_seconds = 0.0
+
+    def add(self, result: dict) -> None:
+        self.users += 1
+        self.failed_users += "error" in result
+        self.messages += result.get("total_processed", 0)
+        self.failed_messages += result.get("total_failed", 0)
+        self.rate_limited_seconds += result.get("rate_limited_seconds", 0.0)
+
+    def summary(self) -> dict:
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            "users": self.users,
+            "failed_users": self.failed_users,
+            "messages": self.messages,
+            "failed_messages": self.failed_messages,
+            "elapsed_seconds": round(elapsed, 2),
+            "users_per_minute": round(self.users / elapsed * 60, 2),
+            "messages_per_second": round(self.messages / elapsed, 2),
+            "rate_limited_seconds": round(self.rate_limited_seconds, 2),
+            "processes": self.processes
+        }
+
+
+# Shared by the parallel backfill job, so its workers (and their Mem0 clients) are reused
+memory_backfill_pool = MemoryBackfillPool()
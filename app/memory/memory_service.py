@@ -1,10 +1,11 @@
 from datetime import datetime
 from bson import ObjectId
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from app.config import Config
 
 from app.services.db import db
 from app.memory.mem0ai_config import MemoryConfig
+from app.memory.salience_filter import salience_filter
 
 class MemoryService:
     """Service class for handling memory operations"""
@@ -30,9 +31,12 @@ class MemoryService:
             print(f"❌ Failed to fetch user info: {e}")
             return None
     
-    def add_message_to_memory(self, user_id: str, character_id: str, message: str, sender: str) -> bool:
-        """Add memory from a chat message"""
+    def add_message_to_memory(self, user_id: str, character_id: str, message: str, sender: str, force: bool = False) -> bool:
+        """Add memory from a chat message (low-information messages are skipped unless forced)"""
         try:
+            if not force and Config.MEMORY_SALIENCE_FILTER_ENABLED and not salience_filter.should_memorize(message, sender):
+                return True
+
             user_identifier = self.get_user_identifier(user_id, character_id)
             user = self._get_user_info(user_id)
             user_name = user.get("userName", "User") if user else "User"
@@ -165,26 +169,61 @@ class MemoryService:
             print(f"❌ Failed to search memories: {e}")
             return "No memories available."
     
-    def update_memory_from_conversation(self, user_id: str, character_id: str, user_message: str, ai_response: str) -> bool:
-        """Update memories based on new conversation turn"""
+    def add_conversation_turn(
+        self,
+        user_id: str,
+        character_id: str,
+        user_message: Union[str, List[str], None],
+        ai_response: Optional[str] = None
+    ) -> bool:
+        """
+        Add a whole conversation turn with a single Mem0 add
+
+        `user_message` may be a list: every user message the AI reply answers, oldest first.
+        """
         try:
+            user_messages = [user_message] if isinstance(user_message, str) else list(user_message or [])
+            turn = [("user", "User", content) for content in user_messages] + [("assistant", "AI", ai_response)]
+            messages = []
+            for role, sender, content in turn:
+                if not content or not content.strip():
+                    continue
+                if Config.MEMORY_SALIENCE_FILTER_ENABLED and not salience_filter.should_memorize(content, sender):
+                    continue
+                messages.append({"role": role, "content": content.strip()})
+
+            if not messages:
+                print(f"⏭️ Conversation turn has nothing worth memorizing, skipping Mem0 add")
+                return True
+
             user_identifier = self.get_user_identifier(user_id, character_id)
-            
-            # Update memories with the conversation context
-            conversation_context = f"User: {user_message}\nAI: {ai_response}"
-            
-            # Use the correct method call for Mem0 update
-            self.memory.update(
-                message=conversation_context,
-                user_id=user_identifier
+            user = self._get_user_info(user_id)
+            user_name = user.get("userName", "User") if user else "User"
+
+            # One extraction + embedding pass for the whole turn
+            self.memory.add(
+                messages=messages,
+                user_id=user_identifier,
+                metadata={
+                    "user_id": user_id,
+                    "character_id": character_id,
+                    "user_name": user_name,
+                    "sender": "+".join(m["role"] for m in messages),
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "message_type": "conversation_turn"
+                }
             )
-            
-            print(f"🔄 Memory updated with conversation context")
+
+            print(f"💾 Conversation turn added to memory ({len(messages)} message(s))")
             return True
-            
+
         except Exception as e:
-            print(f"❌ Failed to update memory: {e}")
+            print(f"❌ Failed to add conversation turn to memory: {e}")
             return False
+
+    def update_memory_from_conversation(self, user_id: str, character_id: str, user_message: str, ai_response: str) -> bool:
+        """Update memories based on new conversation turn (kept for backward compatibility)"""
+        return self.add_conversation_turn(user_id, character_id, user_message, ai_response)
     
     def get_all_memories_for_user(self, user_id: str, character_id: str) -> List[Dict]:
         """Get all memories for a user-character pair"""
@@ -0,0 +1,151 @@
+# app/memory/salience_filter.py
+import math
+import re
+import threading
+from typing import Dict, Optional
+
+from app.config import Config
+
+
+# Filler words that carry no memorable information on their own
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "so", "to", "of", "in", "on", "at", "for",
+    "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "these",
+    "those", "with", "as", "by", "from", "just", "too", "very", "really", "also",
+    "do", "does", "did", "not", "no", "yes", "yeah", "yep", "yup", "nope", "nah",
+    "ok", "okay", "okk", "okkk", "k", "kk", "hmm", "hmmm", "hm", "mm", "mhm", "uh",
+    "um", "umm", "ah", "oh", "ohh", "haha", "hahaha", "lol", "lmao", "rofl", "hehe",
+    "hi", "hii", "hey", "hello", "bye", "thanks", "thank", "thx", "ty", "cool",
+    "nice", "good", "great", "fine", "sure", "right", "alright", "wow", "oops",
+    "what", "why", "how", "huh", "acha", "accha", "haan", "han", "nahi", "theek",
+    "thik", "hai", "ho", "na", "bas", "arre", "arey", "you", "u", "me", "there",
+    "what's", "whats", "up", "sup", "wassup", "gn", "gm", "night", "morning",
+}
+
+# First-person / personal markers usually precede facts worth remembering
+PERSONAL_MARKERS = {
+    "i", "i'm", "im", "i've", "ive", "i'd", "my", "mine", "myself", "me", "we",
+    "our", "family", "mom", "mother", "dad", "father", "sister", "brother",
+    "friend", "boyfriend", "girlfriend", "wife", "husband", "job", "work",
+    "school", "college", "exam", "birthday", "love", "hate", "like", "favorite",
+    "favourite", "prefer", "feel", "feeling", "want", "need", "remember",
+    "mera", "meri", "mujhe", "main",
+}
+
+# Replies produced by our own fallback paths, never worth memorizing
+FALLBACK_PREFIXES = ("⚠️", "Sorry, I'm having trouble")
+
+WORD_PATTERN = re.compile(r"[\w']+", re.UNICODE)
+
+EMOJI_RANGES = (
+    (0x1F000, 0x1FAFF),  # Emoticons, symbols, pictographs, transport, etc.
+    (0x2600, 0x27BF),    # Misc symbols and dingbats
+    (0x2B00, 0x2BFF),    # Arrows, stars
+    (0xFE00, 0xFE0F),    # Variation selectors
+    (0x200D, 0x200D),    # Zero-width joiner
+)
+
+
+def _is_emoji(char: str) -> bool:
+    code = ord(char)
+    return any(start <= code <= end for start, end in EMOJI_RANGES)
+
+
+class SalienceFilter:
+    """Cheap CPU-only filter deciding whether a message is worth sending to Mem0"""
+
+    # Weights of a small logistic model over the extracted features
+    WEIGHTS = {
+        "bias": -1.6,
+        "log_chars": 0.9,
+        "content_words": 0.55,
+        "stopword_ratio": -2.2,
+        "emoji_ratio": -3.0,
+        "personal_markers": 0.8,
+        "has_digits": 0.5,
+        "is_question": 0.3,
+    }
+
+    def __init__(self, threshold: Optional[float] = None, log_every: int = 50):
+        self.threshold = Config.MEMORY_SALIENCE_THRESHOLD if threshold is None else threshold
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._skipped = 0
+
+    @staticmethod
+    def extract_features(message: str) -> Dict[str, float]:
+        """Extract length, stopword, emoji and content features from a message"""
+        text = (message or "").strip()
+        words = [w.lower() for w in WORD_PATTERN.findall(text)]
+        visible_chars = [c for c in text if not c.isspace()]
+        emoji_chars = [c for c in visible_chars if _is_emoji(c)]
+
+        stopword_count = sum(1 for w in words if w in STOPWORDS)
+        content_words = [w for w in words if w not in STOPWORDS and len(w) > 1]
+
+        return {
+            "chars": len(text),
+            "words": len(words),
+            "log_chars": math.log1p(len(text)),
+            "content_words": min(len(content_words), 8),
+            "stopword_ratio": stopword_count / len(words) if words else 1.0,
+            "emoji_ratio": len(emoji_chars) / len(visible_chars) if visible_chars else 1.0,
+            "personal_markers": min(sum(1 for w in words if w in PERSONAL_MARKERS), 3),
+            "has_digits": 1.0 if any(c.isdigit() for c in text) else 0.0,
+            "is_question": 1.0 if text.endswith("?") and len(content_words) >= 2 else 0.0,
+        }
+
+    def score(self, message: str) -> float:
+        """Return the probability (0-1) that a message contains memorable information"""
+        features = self.extract_features(message)
+        logit = self.WEIGHTS["bias"] + sum(
+            weight * features[name] for name, weight in self.WEIGHTS.items() if name != "bias"
+        )
+        return 1 / (1 + math.exp(-logit))
+
+    def should_memorize(self, message: str, sender: str = "User") -> bool:
+        """Decide whether a message should be ingested into memory and track the skip rate"""
+        text = (message or "").strip()
+
+        if not text or text.startswith(FALLBACK_PREFIXES):
+            keep = False
+        else:
+            features = self.extract_features(text)
+            # Hard rules first; only ambiguous messages reach the classifier
+            if features["content_words"] == 0 or features["emoji_ratio"] >= 0.6:
+                keep = False
+            elif features["words"] >= 12:
+                keep = True
+            else:
+                keep = self.score(text) >= self.threshold
+
+        self._record(keep, sender, text)
+        return keep
+
+    def _record(self, keep: bool, sender: str, text: str) -> None:
+        with self._lock:
+            self._seen += 1
+            if not keep:
+                self._skipped += 1
+            seen, skipped = self._seen, self._skipped
+
+        if not keep:
+            print(f"⏭️ Skipping low-information {sender} message for memory: {text[:50]!r}")
+        if seen % self.log_every == 0:
+            print(f"📉 Memory salience filter: skipped {skipped}/{seen} messages ({skipped / seen * 100:.1f}%)")
+
+    def get_stats(self) -> Dict:
+        """Get skip statistics since process start"""
+        with self._lock:
+            seen, skipped = self._seen, self._skipped
+        return {
+            "messages_seen": seen,
+            "messages_skipped": skipped,
+            "skip_rate": round(skipped / seen, 4) if seen else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+# Shared instance so skip statistics are aggregated across all ingestion paths
+salience_filter = SalienceFilter()
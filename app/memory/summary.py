@@ -1,20 +1,67 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
 import google.generativeai as genai
 from app.config import Config
 from app.services.db import db
+from app.utility.token_service import TokenService
+from app.utility.timestamps import timestamp_after_filter, timestamp_equals_filter
+from bson import ObjectId
 from pymongo import ReturnDocument
 
 # Configure Gemini
 genai.configure(api_key=Config.GEMINI_API_KEY)
 
-def load_summary_prompt(user_name: str = "User") -> str:
-    prompt_path = os.path.join("app", "system_prompt", "summarize.md")
+_models: Dict[str, genai.GenerativeModel] = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(model_name: str = None) -> genai.GenerativeModel:
+    """Return a shared GenerativeModel instead of building one per call"""
+    model_name = model_name or Config.SUMMARY_MODEL
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+
+@lru_cache(maxsize=None)
+def _get_token_service() -> TokenService:
+    """Load the tiktoken encoding on first use rather than when the module is imported"""
+    return TokenService()
+
+
+@lru_cache(maxsize=None)
+def _read_prompt_file(file_name: str) -> str:
+    """Read a prompt template from app/system_prompt once per process"""
+    prompt_path = os.path.join("app", "system_prompt", file_name)
     if not os.path.isfile(prompt_path):
-        raise FileNotFoundError("🛑 summary.md is missing inside system_prompt folder.")
+        raise FileNotFoundError(f"Prompt file not found at: {prompt_path}")
 
     with open(prompt_path, "r", encoding="utf-8") as file:
-        template = file.read()
+        return file.read()
+
+
+def _generate(full_prompt: str, max_output_tokens: int = 2048, temperature: float = 0.4) -> str:
+    generation_config = genai.types.GenerationConfig(
+        max_output_tokens=max_output_tokens,
+        temperature=temperature,
+    )
+    response = _get_model().generate_content(
+        full_prompt,
+        generation_config=generation_config
+    )
+    return response.text.strip()
+
+
+def load_summary_prompt(user_name: str = "User") -> str:
+    try:
+        template = _read_prompt_file("summarize.md")
+    except FileNotFoundError:
+        raise FileNotFoundError("🛑 summary.md is missing inside system_prompt folder.")
 
     today = datetime.utcnow().strftime("%Y-%m-%d")
     prompt = template.replace("{{userName}}", user_name)
@@ -23,14 +70,7 @@ def load_summary_prompt(user_name: str = "User") -> str:
     return prompt.strip()
 
 def summarize_incremental(previous_summary: str, new_message: str, user_name: str) -> str:
-    prompt_path = os.path.join("app", "system_prompt", "inputsummary.md")
-
-    if not os.path.exists(prompt_path):
-        raise FileNotFoundError(f"Prompt file not found at: {prompt_path}")
-
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        system_prompt = f.read().strip()
-
+    system_prompt = _read_prompt_file("inputsummary.md").strip()
     system_prompt = system_prompt.replace("{{userName}}", user_name or "User")
 
     # Human instructions and input
@@ -41,60 +81,121 @@ def summarize_incremental(previous_summary: str, new_message: str, user_name: st
 
     full_prompt = f"{system_prompt}\n\n{human_message}"
 
-    # Initialize Gemini model
-    model = genai.GenerativeModel('gemini-2.5-pro')
-    
-    # Configure generation parameters
-    generation_config = genai.types.GenerationConfig(
-        max_output_tokens=2048,
-        temperature=0.4,
-    )
-
-    response = model.generate_content(
-        full_prompt,
-        generation_config=generation_config
-    )
-    
-    print(f"🧠 Gemini Summary Response: {response.text}")
-    return response.text.strip()
+    summary = _generate(full_prompt)
+    print(f"🧠 Gemini Summary Response: {summary}")
+    return summary
 
 
-def summarize_from_scratch(chats: list, user_name: str) -> str:
-    context = ""
+def format_transcript_lines(chats: Iterable[dict]) -> List[str]:
+    """Format chat documents as transcript lines ("You: ..." / "Zenny: ...")"""
+    lines = []
     for chat in chats:
-        sender_raw = chat.get("sender", "").lower()
+        sender_raw = (chat.get("sender") or "").lower()
         sender = "You" if sender_raw == "user" else "Zenny" if sender_raw == "ai" else sender_raw.capitalize()
-        message = chat.get("message", "").strip()
+        message = (chat.get("message") or "").strip()
         if message:
-            context += f"{sender}: {message}\n"
+            lines.append(f"{sender}: {message}")
+    return lines
+
+
+def _group_by_token_budget(items: List[str], max_tokens: int) -> List[List[str]]:
+    """Group consecutive items so each group stays within max_tokens (an oversized item gets its own group)"""
+    token_service = _get_token_service()
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for item in items:
+        item_tokens = token_service.safe_token_count(item) + 1
+        if current and current_tokens + item_tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += item_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def chunk_transcript_lines(lines: List[str], max_tokens: int) -> List[str]:
+    """Split transcript lines into chunks of at most max_tokens"""
+    return ["\n".join(group) for group in _group_by_token_budget(lines, max_tokens)]
+
+
+def _summarize_transcript(system_prompt: str, transcript: str) -> str:
+    human_message = f"Based on this chat, generate the structured summary:\n\n{transcript}"
+    return _generate(f"{system_prompt}\n\n{human_message}")
+
+
+def _reduce_summaries(system_prompt: str, partial_summaries: List[str]) -> str:
+    """Merge partial summaries of consecutive transcript chunks into one summary"""
+    # Reduce in groups if the partial summaries themselves exceed the chunk budget
+    groups = _group_by_token_budget(partial_summaries, Config.SUMMARY_CHUNK_TOKENS)
+    if len(groups) > 1:
+        partial_summaries = [
+            group[0] if len(group) == 1 else _reduce_summaries(system_prompt, group) for group in groups
+        ]
+
+    joined = "\n\n---\n\n".join(
+        f"Part {idx} of {len(partial_summaries)}:\n{summary}" for idx, summary in enumerate(partial_summaries, 1)
+    )
+    human_message = (
+        "The following are summaries of consecutive parts of the same conversation, oldest first. "
+        "Merge them into a single structured summary, keeping later information when parts disagree:\n\n"
+        f"{joined}"
+    )
+    return _generate(f"{system_prompt}\n\n{human_message}")
 
-    if not context.strip():
+
+def summarize_transcript_lines(lines: List[str], user_name: str) -> str:
+    """Summarize a transcript, map-reducing over parallel chunks when it is too long for one call"""
+    if not lines:
         return ""
 
     system_prompt = load_summary_prompt(user_name)
-    human_message = f"Based on this chat, generate the structured summary:\n\n{context.strip()}"
-    
-    # Combine system and human message for Gemini
-    full_prompt = f"{system_prompt}\n\n{human_message}"
+    chunks = chunk_transcript_lines(lines, Config.SUMMARY_CHUNK_TOKENS)
 
-    # Initialize Gemini model
-    model = genai.GenerativeModel('gemini-2.5-pro')
-    
-    # Configure generation parameters
-    generation_config = genai.types.GenerationConfig(
-        max_output_tokens=2048,
-        temperature=0.4,
-    )
+    if len(chunks) == 1:
+        return _summarize_transcript(system_prompt, chunks[0])
 
-    response = model.generate_content(
-        full_prompt,
-        generation_config=generation_config
-    )
-    
-    return response.text.strip()
+    print(f"🧩 Summarizing {len(lines)} messages in {len(chunks)} parallel chunks")
+    with ThreadPoolExecutor(max_workers=Config.SUMMARY_MAP_WORKERS) as executor:
+        partial_summaries = list(executor.map(lambda chunk: _summarize_transcript(system_prompt, chunk), chunks))
+
+    return _reduce_summaries(system_prompt, partial_summaries)
+
+
+def summarize_from_scratch(chats: list, user_name: str) -> str:
+    return summarize_transcript_lines(format_transcript_lines(chats), user_name)
 
 
-# Creates a new Global Summary
+def enforce_summary_token_cap(summary: str) -> str:
+    """Compress a summary automatically once it grows past SUMMARY_TOKEN_CAP"""
+    if not summary:
+        return summary
+    summary_tokens = _get_token_service().safe_token_count(summary)
+    if summary_tokens <= Config.SUMMARY_TOKEN_CAP:
+        return summary
+    print(f"🗜️ Summary is {summary_tokens} tokens (cap {Config.SUMMARY_TOKEN_CAP}), compressing...")
+    return compress_summary(summary)
+
+
+def _chats_after_checkpoint_query(user_id: str, character_id: str, summary_doc: Optional[dict]) -> dict:
+    query = {
+        "userId": user_id,
+        "characterId": character_id
+    }
+    if summary_doc and summary_doc.get("lastSummarizedMessageId"):
+        last_timestamp = summary_doc.get("lastSummarizedTimestamp")
+        last_id = summary_doc["lastSummarizedMessageId"]
+        # Dual-read: the checkpoint and chats may hold string or BSON date timestamps
+        query["$or"] = [
+            timestamp_after_filter(last_timestamp),
+            {"$and": [timestamp_equals_filter(last_timestamp), {"_id": {"$gt": last_id}}]}
+        ]
+    return query
+
+
+# Creates (or extends from its checkpoint) the Global Summary
 def create_global_summary(user_id: str, character_id: str):
 
     now = datetime.utcnow()
@@ -102,28 +203,54 @@ def create_global_summary(user_id: str, character_id: str):
     user = db.users.find_one({"_id": user_id}) or {}
     user_name = user.get("userName", "User")
 
-    chats = list(db.chats.find({
-        "userId": user_id,
-        "characterId": character_id
-    }).sort("timestamp", 1))
-    print(f"{len(chats)} chats fetched")
-
-    summary_text = summarize_from_scratch(chats, user_name)
-    if not summary_text:
-        return
-    
     existing_summary = db.summaries.find_one({
         "userId":user_id,
         "characterId":character_id
     })
 
+    # Only read chats newer than the last summarized message, streaming the cursor
+    chats_cursor = db.chats.find(
+        _chats_after_checkpoint_query(user_id, character_id, existing_summary),
+        {"sender": 1, "message": 1, "timestamp": 1}
+    ).sort([("timestamp", 1), ("_id", 1)])
+
+    lines = []
+    last_chat = None
+    for chat in chats_cursor:
+        lines.extend(format_transcript_lines([chat]))
+        last_chat = chat
+    print(f"{len(lines)} new chats fetched since last checkpoint")
+
+    if last_chat is None:
+        return existing_summary.get("summary") if existing_summary else None
+
+    new_summary = summarize_transcript_lines(lines, user_name)
+    if existing_summary and existing_summary.get("summary") and new_summary:
+        summary_text = summarize_incremental(existing_summary["summary"], new_summary, user_name)
+    else:
+        summary_text = new_summary
+
+    checkpoint = {
+        "lastSummarizedMessageId": last_chat["_id"],
+        "lastSummarizedTimestamp": last_chat.get("timestamp"),
+        "updatedAt": now
+    }
+
+    if not summary_text:
+        # Nothing summarizable (e.g. only media messages); still advance the checkpoint
+        if existing_summary:
+            db.summaries.update_one({"_id": existing_summary["_id"]}, {"$set": checkpoint})
+        return existing_summary.get("summary") if existing_summary else None
+
+    summary_text = enforce_summary_token_cap(summary_text)
+
     if existing_summary:
         db.summaries.find_one_and_update(
             {"_id":existing_summary["_id"]},
             {
                 "$set":{
                     "summary":summary_text,
-                    "updatedAt":now
+                    **checkpoint
                 }
             },
             return_document=ReturnDocument.AFTER
@@ -135,15 +262,31 @@ def create_global_summary(user_id: str, character_id: str):
             "userId": user_id,
             "characterId": character_id,
             "summary": summary_text,
-            "updatedAt": now
+            **checkpoint
         })
         print("✅ Created new global summary.")
     return summary_text
 
 # Extract Summary for the New Message
 def update_summary_with_new_message(user_id: str, character_id: str, new_message: str):
+    return update_summary_with_new_messages(user_id, character_id, [{"message": new_message}])
+
+
+# Extract Summary for a batch of new messages (one Gemini call per batch)
+def update_summary_with_new_messages(user_id: str, character_id: str, new_messages: List[dict]):
+    """
+    Fold a batch of new messages into the global summary with a single incremental call
+
+    Each item is a chat-like dict with "message" and optionally "_id"/"timestamp";
+    the last item carrying an "_id" becomes the new summarization checkpoint.
+    """
+    messages_text = "\n".join(
+        (item.get("message") or "").strip() for item in new_messages if (item.get("message") or "").strip()
+    )
+    if not messages_text:
+        return None
 
-    print(f"Generating Summary for{new_message}")
+    print(f"Generating Summary for {len(new_messages)} new message(s)")
 
     now = datetime.utcnow()
 
@@ -158,52 +301,38 @@ def update_summary_with_new_message(user_id: str, character_id: str, new_message
 
     if not summary_doc:
         print("📄 No summary exists. Creating a new one.")
-        create_global_summary(user_id, character_id)
-        return
+        return create_global_summary(user_id, character_id)
 
     updated_summary = summarize_incremental(
         previous_summary=summary_doc["summary"],
-        new_message=new_message,
+        new_message=messages_text,
         user_name=user_name
     )
+    updated_summary = enforce_summary_token_cap(updated_summary)
+
+    update_fields = {
+        "summary": updated_summary,
+        "updatedAt": now
+    }
+    last_with_id = next((item for item in reversed(new_messages) if item.get("_id")), None)
+    if last_with_id:
+        last_id = last_with_id["_id"]
+        update_fields["lastSummarizedMessageId"] = ObjectId(last_id) if isinstance(last_id, str) and ObjectId.is_valid(last_id) else last_id
+        update_fields["lastSummarizedTimestamp"] = last_with_id.get("timestamp")
 
     db.summaries.update_one(
         {"_id": summary_doc["_id"]},
-        {
-            "$set": {
-                "summary": updated_summary,
-                "updatedAt": now
-            }
-        }
+        {"$set": update_fields}
     )
     # print("✅ Global summary updated.", updated_summary)
     return updated_summary
 
 # Compress Summary
 def compress_summary(summary: str) -> str:
-    prompt_path = os.path.join("app", "system_prompt", "compressSummary.md")
-
-    if not os.path.exists(prompt_path):
-        raise FileNotFoundError(f"Prompt file not found at: {prompt_path}")
-
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        system_prompt = f.read().strip()
+    system_prompt = _read_prompt_file("compressSummary.md").strip()
 
     full_prompt = f"{system_prompt}\n\n{summary}"
 
-    # Initialize Gemini model
-    model = genai.GenerativeModel('gemini-2.5-pro')
-    
-    # Configure generation parameters
-    generation_config = genai.types.GenerationConfig(
-        max_output_tokens=1024,
-        temperature=0.3,
-    )
-
-    response = model.generate_content(
-        full_prompt,
-        generation_config=generation_config
-    )
-    
-    print(f"🧠 Compressed Summary: {response.text}")
-    return response.text.strip()
\ No newline at end of file
+    compressed = _generate(full_prompt, max_output_tokens=1024, temperature=0.3)
+    print(f"🧠 Compressed Summary: {compressed}")
+    return compressed
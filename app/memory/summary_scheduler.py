@@ -0,0 +1,143 @@
+# app/memory/summary_scheduler.py
+import heapq
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.memory.summary import update_summary_with_new_messages
+
+
+class SummaryScheduler:
+    """
+    Debounces incremental summary updates per conversation
+
+    New messages are buffered per (user, character) and flushed as one incremental
+    summary call after `debounce_seconds`, or immediately once `max_batch_messages`
+    are pending. Debounce deadlines live in one heap served by a single timer thread,
+    and jobs run on a pool of `max_concurrent_jobs` threads. At most one job runs per
+    conversation and at most `max_queued_jobs` wait for a worker; a conversation that
+    finds the queue full keeps its messages and retries after another debounce period.
+    """
+
+    def __init__(
+        self,
+        debounce_seconds: Optional[float] = None,
+        max_batch_messages: Optional[int] = None,
+        max_concurrent_jobs: Optional[int] = None,
+        max_queued_jobs: Optional[int] = None
+    ):
+        self.debounce_seconds = Config.SUMMARY_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.max_batch_messages = Config.SUMMARY_BATCH_MAX_MESSAGES if max_batch_messages is None else max_batch_messages
+        max_concurrent_jobs = Config.SUMMARY_MAX_CONCURRENT_JOBS if max_concurrent_jobs is None else max_concurrent_jobs
+        max_queued_jobs = Config.SUMMARY_MAX_QUEUED_JOBS if max_queued_jobs is None else max_queued_jobs
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="summary")
+        self._job_slots = threading.BoundedSemaphore(max_concurrent_jobs + max_queued_jobs)
+        self._pending: Dict[Tuple[str, str], List[dict]] = {}
+        self._deadlines: Dict[Tuple[str, str], float] = {}
+        self._heap: List[Tuple[float, Tuple[str, str]]] = []
+        self._timer_thread: Optional[threading.Thread] = None
+        self._running: set = set()
+
+    def schedule(self, user_id: str, character_id: str, chat: dict) -> None:
+        """Queue a new chat message (dict with "message" and optionally "_id"/"timestamp")"""
+        if not (chat.get("message") or "").strip():
+            return
+
+        key = (str(user_id), str(character_id))
+        with self._lock:
+            pending = self._pending.setdefault(key, [])
+            pending.append(chat)
+
+            if len(pending) >= self.max_batch_messages:
+                self._cancel_timer(key)
+                flush_now = True
+            else:
+                flush_now = False
+                if key not in self._deadlines:
+                    self._start_timer(key)
+
+        if flush_now:
+            self._start_job(key)
+
+    def flush(self, user_id: str, character_id: str) -> None:
+        """Flush a conversation's pending messages right away"""
+        key = (str(user_id), str(character_id))
+        with self._lock:
+            self._cancel_timer(key)
+        self._start_job(key)
+
+    def pending_count(self, user_id: str, character_id: str) -> int:
+        with self._lock:
+            return len(self._pending.get((str(user_id), str(character_id)), []))
+
+    def _start_timer(self, key: Tuple[str, str]) -> None:
+        # Caller must hold self._lock
+        deadline = time.monotonic() + self.debounce_seconds
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if self._timer_thread is None:
+            self._timer_thread = threading.Thread(target=self._timer_loop, name="summary-timer", daemon=True)
+            self._timer_thread.start()
+        self._wakeup.notify()
+
+    def _cancel_timer(self, key: Tuple[str, str]) -> None:
+        # Caller must hold self._lock; the heap entry is skipped once its deadline is gone
+        self._deadlines.pop(key, None)
+
+    def _timer_loop(self) -> None:
+        while True:
+            with self._lock:
+                due_keys = []
+                while not due_keys:
+                    now = time.monotonic()
+                    while self._heap and (self._heap[0][0] <= now or self._deadlines.get(self._heap[0][1]) != self._heap[0][0]):
+                        deadline, key = heapq.heappop(self._heap)
+                        if self._deadlines.get(key) == deadline:
+                            del self._deadlines[key]
+                            due_keys.append(key)
+                    if not due_keys:
+                        self._wakeup.wait(self._heap[0][0] - now if self._heap else None)
+
+            for key in due_keys:
+                self._start_job(key)
+
+    def _start_job(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            # A running job for this conversation picks up new messages when it finishes
+            if key in self._running or not self._pending.get(key):
+                return
+            if not self._job_slots.acquire(blocking=False):
+                print(f"⏳ Summary queue full, retrying {key[0]}/{key[1]} in {self.debounce_seconds:.0f}s")
+                if key not in self._deadlines:
+                    self._start_timer(key)
+                return
+            batch = self._pending.pop(key)
+            self._running.add(key)
+
+        self._executor.submit(self._run_job, key, batch)
+
+    def _run_job(self, key: Tuple[str, str], batch: List[dict]) -> None:
+        user_id, character_id = key
+        try:
+            print(f"📝 Updating summary for {user_id}/{character_id} with {len(batch)} coalesced message(s)")
+            update_summary_with_new_messages(user_id, character_id, batch)
+        except Exception as e:
+            print(f"❌ Summary update failed for {user_id}/{character_id}: {e}")
+            traceback.print_exc()
+        finally:
+            self._job_slots.release()
+            with self._lock:
+                self._running.discard(key)
+                # Messages that arrived while we were running get their own debounce window
+                if self._pending.get(key) and key not in self._deadlines:
+                    self._start_timer(key)
+
+
+# Shared scheduler so the concurrency cap applies process-wide
+summary_scheduler = SummaryScheduler()
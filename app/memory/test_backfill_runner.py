@@ -0,0 +1,79 @@
+# app/memory/test_backfill_runner.py
+import pytest
+
+from app.memory import backfill_runner
+from app.memory.backfill_runner import SharedRateLimiter
+
+
+class FakeTime:
+    """Stands in for the time module: sleeping moves the clock forward"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(backfill_runner, "time", clock)
+    return clock
+
+
+def test_calls_are_evenly_spaced(clock):
+    limiter = SharedRateLimiter(rate=60, per_seconds=60)
+
+    waits = [limiter.acquire() for _ in range(3)]
+
+    assert waits == [0.0, 1.0, 1.0]
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_cost_reserves_several_slots(clock):
+    limiter = SharedRateLimiter(rate=120, per_seconds=60)
+
+    assert limiter.acquire(cost=3) == 0.0
+    assert limiter.acquire() == pytest.approx(1.5)
+
+
+def test_idle_time_is_not_banked(clock):
+    limiter = SharedRateLimiter(rate=60, per_seconds=60)
+    limiter.acquire()
+
+    clock.now += 30
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 1.0
+
+
+def test_zero_rate_disables_limiting(clock):
+    limiter = SharedRateLimiter(rate=0)
+
+    assert [limiter.acquire(cost=5) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_rate_limited_memory_charges_both_budgets(clock):
+    class FakeMemory:
+        def add(self, *args, **kwargs):
+            return {"results": []}
+
+        def search(self, query, **kwargs):
+            return {"results": [query]}
+
+    gemini = SharedRateLimiter(rate=60, per_seconds=60)
+    qdrant = SharedRateLimiter(rate=120, per_seconds=60)
+    memory = backfill_runner.RateLimitedMemory(FakeMemory(), gemini, qdrant)
+
+    memory.add("hello", user_id="u1")
+    memory.add("again", user_id="u1")
+
+    # The second add waits for the three Gemini slots taken by the first
+    assert memory.rate_limited_seconds == pytest.approx(backfill_runner.GEMINI_CALLS_PER_ADD * 1.0)
+    assert memory.search("q") == {"results": ["q"]}
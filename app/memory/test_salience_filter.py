@@ -0,0 +1,53 @@
+# app/memory/test_salience_filter.py
+import pytest
+
+from app.memory.salience_filter import SalienceFilter
+
+
+@pytest.fixture
+def salience():
+    return SalienceFilter(threshold=0.5)
+
+
+@pytest.mark.parametrize("message", ["", "   ", None, "ok", "haha lol", "hmm okay", "😂😂😂", "ok 👍"])
+def test_low_information_messages_are_skipped(salience, message):
+    assert salience.should_memorize(message) is False
+
+
+@pytest.mark.parametrize("message", [
+    "My sister's birthday is on 14 March",
+    "I got a new job at Google",
+    "I love painting",
+    "where do you live?",
+])
+def test_personal_facts_are_kept(salience, message):
+    assert salience.should_memorize(message) is True
+
+
+def test_fallback_replies_are_skipped(salience):
+    assert salience.should_memorize("Sorry, I'm having trouble connecting to my memory right now", sender="AI") is False
+    assert salience.should_memorize("⚠️ Claude API failed to generate a response", sender="AI") is False
+
+
+def test_long_messages_are_kept_without_scoring(salience):
+    salience.threshold = 1.1  # Unreachable, so only the length rule can keep it
+    message = "we went hiking near the lake yesterday and the weather turned quickly into heavy rain"
+    assert salience.should_memorize(message) is True
+
+
+def test_threshold_decides_ambiguous_messages():
+    message = "what are you doing"
+    assert SalienceFilter(threshold=0.4).should_memorize(message) is True
+    assert SalienceFilter(threshold=0.6).should_memorize(message) is False
+
+
+def test_stats_count_seen_and_skipped(salience):
+    for message in ["ok", "I love painting", "lol", "My dog is called Bruno"]:
+        salience.should_memorize(message)
+
+    assert salience.get_stats() == {
+        "messages_seen": 4,
+        "messages_skipped": 2,
+        "skip_rate": 0.5,
+        "threshold": 0.5,
+    }
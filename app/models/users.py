@@ -1,5 +1,6 @@
 from datetime import datetime
 from app.services.db import db
+from app.utility.context_cache import context_cache
 from bson.objectid import ObjectId
 
 def create_user(data):
@@ -21,10 +22,14 @@ def get_user_by_mobile(mobile_number):
 
 def update_user(user_id, update_data):
     update_data["updatedAt"] = datetime.utcnow()
-    return db.users.update_one(
+    result = db.users.update_one(
         {"_id":ObjectId(user_id)},
         {"$set":update_data}
     )
+    # Cached reply context holds the profile and the system prompt compiled from it
+    context_cache.invalidate_user(user_id, "user")
+    context_cache.invalidate_user(user_id, "system_prompt:")
+    return result
 
 def get_user_by_id(user_id):
     try:
@@ -1,13 +1,18 @@
 # app/routes/chat.py
+import json
 import traceback
 from datetime import datetime
 from app.services.db import db
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from bson import ObjectId
 from app.memory.memory_service import MemoryService
 from app.services.db import db
 from app.utility.performance_logger import PerformanceLogger
 from app.models.users import get_user_by_id
+from app.services.session_store import session_store
+from app.services.daily_stats import daily_stats
+from app.utility.timestamps import format_chat_timestamp, parse_chat_timestamp
+from app.utility.chat_cursor import chat_keyset_filter, decode_chat_cursor, encode_chat_cursor
 
 chat_bp = Blueprint("chat", __name__)
 
@@ -32,6 +37,14 @@ def delete_recent_chats():
         chat_ids_to_delete = [chat["_id"] for chat in recent_chats]
 
         result = db.chats.delete_many({"_id": {"$in": chat_ids_to_delete}})
+        if result.deleted_count:
+            # Deleting chats can shrink or split sessions and changes the daily rollups
+            if session_store.writes_enabled():
+                session_store.rebuild_user(user_id)
+            deleted_times = [parse_chat_timestamp(chat.get("timestamp")) for chat in recent_chats]
+            deleted_days = [moment.date() for moment in deleted_times if moment is not None]
+            if deleted_days:
+                daily_stats.rebuild_range(min(deleted_days), max(deleted_days), user_id=str(user_id))
         return jsonify({"deletedCount": result.deleted_count}), 200
 
     except Exception as e:
@@ -45,18 +58,48 @@ def delete_chat_by_id(chat_id):
         if not ObjectId.is_valid(chat_id):
             return jsonify({"error": "Invalid chat ID"}), 400
 
-        result = db.chats.delete_one({"_id": ObjectId(chat_id)})
+        chat = db.chats.find_one_and_delete({"_id": ObjectId(chat_id)}, {"userId": 1, "timestamp": 1})
 
-        if result.deleted_count == 0:
+        if not chat:
             return jsonify({"message": "Chat not found"}), 404
 
+        # Deleting a chat can shrink or split its session and changes its day's rollup
+        if session_store.writes_enabled():
+            session_store.rebuild_user(chat["userId"])
+        chat_time = parse_chat_timestamp(chat.get("timestamp"))
+        if chat_time is not None:
+            daily_stats.rebuild_range(chat_time.date(), chat_time.date(), user_id=chat["userId"])
+
         return jsonify({"message": "Chat deleted successfully"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+# Fields a chat export may project; _id and timestamp are always returned (they form the cursor)
+CHAT_EXPORT_FIELDS = ("userId", "characterId", "sender", "message", "image_url", "audio_url")
+CHAT_EXPORT_DEFAULT_LIMIT = 100
+CHAT_EXPORT_MAX_LIMIT = 1000
+
+
+def _serialize_chat(chat):
+    return {**chat, "_id": str(chat["_id"]), "timestamp": format_chat_timestamp(chat.get("timestamp"))}
+
+
 @chat_bp.route('/get-chats/<user_id>', methods=['GET'])
 def get_chats_by_user(user_id):
+    """
+    A user's chats, latest first, paginated by a (timestamp, _id) cursor
+
+    Query params:
+        limit: chats per page (max 1000; default 100 once `cursor` is given)
+        cursor: the `next` value of the previous page
+
+    Without `limit` and `cursor` the whole history is returned in one response (with
+    `next` null), as before pagination existed. New clients should pass `limit`.
+        fields: comma-separated subset of CHAT_EXPORT_FIELDS (default: all fields)
+        format: `ndjson` streams every chat after `cursor` (up to `limit` if given),
+                one JSON object per line, while the query is still running
+    """
     try:
         # Check if user exists
         user = get_user_by_id(user_id)
@@ -66,20 +109,64 @@ def get_chats_by_user(user_id):
                 "error": "User ID is invalid or user not found"
             }), 404
 
-        # Query only by userId
+        stream = request.args.get('format') == 'ndjson'
+        limit = request.args.get('limit', type=int)
+        if limit is None and not stream and request.args.get('cursor'):
+            limit = CHAT_EXPORT_DEFAULT_LIMIT
+        if limit is not None:
+            limit = max(1, min(limit, CHAT_EXPORT_MAX_LIMIT))
+
+        projection = None
+        if request.args.get('fields'):
+            fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in CHAT_EXPORT_FIELDS]
+            if unknown:
+                return jsonify({
+                    "success": False,
+                    "error": f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(CHAT_EXPORT_FIELDS)}"
+                }), 400
+            projection = {field: 1 for field in fields + ["timestamp"]}
+
         query = {"userId": str(user_id)}
+        if request.args.get('cursor'):
+            try:
+                query.update(chat_keyset_filter(decode_chat_cursor(request.args['cursor'])))
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+
+        # Latest first; _id breaks ties so the cursor is a strict position
+        chats = db.chats.find(query, projection).sort([("timestamp", -1), ("_id", -1)])
+
+        if limit is None and not stream:
+            # Legacy clients that don't know about cursors get every chat
+            page = list(chats)
+            return jsonify({
+                "success":True,
+                "count": len(page),
+                "data": [_serialize_chat(chat) for chat in page],
+                "next": None
+            }), 200
+
+        if stream:
+            if limit is not None:
+                chats = chats.limit(limit)
+
+            def generate():
+                for chat in chats.batch_size(500):
+                    yield json.dumps(_serialize_chat(chat), default=str) + "\n"
 
-        # Fetch chats sorted by timestamp (latest first)
-        chats = list(db.chats.find(query).sort("timestamp", -1))
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson"), 200
 
-        # Convert ObjectId to string for JSON
-        for chat in chats:
-            chat["_id"] = str(chat["_id"])
+        # Fetch one extra chat to know whether another page exists
+        page = list(chats.limit(limit + 1))
+        has_more = len(page) > limit
+        page = page[:limit]
 
         return jsonify({
             "success":True,
-            "count": len(chats),
-            "data": chats
+            "count": len(page),
+            "data": [_serialize_chat(chat) for chat in page],
+            "next": encode_chat_cursor(page[-1]) if has_more else None
         }), 200
 
     except Exception as e:
@@ -0,0 +1,128 @@
+import json
+import queue
+from typing import Callable, Iterator, Optional
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.services.job_engine import TERMINAL_STATUSES, job_engine, serialize_job
+
+jobs_bp = Blueprint("jobs", __name__)
+
+SSE_KEEPALIVE_SECONDS = 15
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Cache-Control'
+}
+
+
+def stream_job_events(job_id: str, format_event: Optional[Callable[[dict], Optional[dict]]] = None) -> Iterator[str]:
+    """
+    Server-Sent Events for a job, ending once it finishes
+
+    Starts with a {"type": "snapshot"} of the job document, then relays the engine's
+    events. `format_event` can reshape events for an existing client (None drops one).
+    """
+    format_event = format_event or (lambda event: event)
+
+    def sse(event: dict) -> str:
+        payload = format_event(event)
+        return f"data: {json.dumps(payload, default=str)}\n\n" if payload else ""
+
+    # Subscribe before reading the snapshot so nothing falls in between
+    events = job_engine.subscribe(job_id)
+    try:
+        job = job_engine.get(job_id)
+        if not job:
+            yield sse({"type": "failed", "jobId": job_id, "error": "Job not found"})
+            return
+        yield sse({"type": "snapshot", "jobId": job_id, "job": serialize_job(job)})
+        if job["status"] in TERMINAL_STATUSES:
+            return
+
+        while True:
+            try:
+                event = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                job = job_engine.get(job_id)
+                if job["status"] in TERMINAL_STATUSES:
+                    yield sse({"type": "snapshot", "jobId": job_id, "job": serialize_job(job)})
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            yield sse(event)
+            if event["type"] in TERMINAL_STATUSES:
+                return
+    finally:
+        job_engine.unsubscribe(job_id, events)
+
+
+@jobs_bp.route("/", methods=["POST"])
+def create_job():
+    """Start a job: {"type": "categorize_users" | "memory_backfill" | "memory_backfill_parallel", "params": {...}}"""
+    data = request.get_json(silent=True) or {}
+    job_type = data.get("type")
+    if not job_type:
+        return jsonify({"success": False, "error": "type is required", "types": job_engine.job_types()}), 400
+
+    try:
+        job = job_engine.submit(job_type, data.get("params") or {})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({"success": True, "job": serialize_job(job)}), 202
+
+
+@jobs_bp.route("/", methods=["GET"])
+def list_jobs():
+    try:
+        limit = min(int(request.args.get("limit", 20)), 100)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+
+    jobs = job_engine.list(request.args.get("type"), limit)
+    return jsonify({"success": True, "count": len(jobs), "data": [serialize_job(job) for job in jobs]}), 200
+
+
+@jobs_bp.route("/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_engine.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": serialize_job(job)}), 200
+
+
+@jobs_bp.route("/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if not job_engine.get(job_id):
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    job = job_engine.cancel(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job is not running"}), 409
+    return jsonify({"success": True, "job": serialize_job(job)}), 200
+
+
+@jobs_bp.route("/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    if not job_engine.get(job_id):
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    job = job_engine.resume(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Only cancelled, failed or interrupted jobs can be resumed"}), 409
+    return jsonify({"success": True, "job": serialize_job(job)}), 202
+
+
+@jobs_bp.route("/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    if not job_engine.get(job_id):
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    return Response(
+        stream_with_context(stream_job_events(job_id)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
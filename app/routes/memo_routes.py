@@ -2,13 +2,25 @@
 import traceback
 from datetime import datetime
 from app.services.db import db
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from bson import ObjectId
 from app.memory.memory_service import MemoryService
+from app.memory.backfill import (
+    CHAT_ORDER,
+    chat_pair_query,
+    clear_backfill_position,
+    iter_chat_batches,
+    load_backfill_position,
+    process_chat_batch,
+    save_backfill_position,
+)
+from app.utility.chat_cursor import encode_chat_cursor
+from app.routes.jobs import SSE_HEADERS, stream_job_events
+from app.services.job_engine import job_engine
+from app.services.job_handlers import DEFAULT_BACKFILL_CHARACTER_ID
+from app.memory.salience_filter import salience_filter
 from app.utility.performance_logger import PerformanceLogger
 from app.models.users import get_user_by_id
-import json
-import time
 
 memo_bp = Blueprint("memo", __name__)
 
@@ -119,12 +131,17 @@ def process_all_chats_in_batches():
     """
     Automatically process ALL chats in batches (1-50, 51-100, 101-150, etc.) until all chats are processed
     
+    Batches are read with keyset pagination and the position is saved after each one, so
+    by default a run continues after the last chat a previous run added to memory.
+    
     Expected JSON payload:
     {
         "userId": "user123",
         "characterId": "char456",
         "batchSize": 50,      // optional, default 50 (chats per batch)
-        "subBatchSize": 10    // optional, default 10 (for processing sub-batches)
+        "subBatchSize": 10,   // optional, default 10 (for processing sub-batches)
+        "resume": true,       // optional, default true (false starts over from the first chat)
+        "cursor": "..."       // optional, start after this cursor instead of the saved position
     }
     """
     logger = PerformanceLogger()
@@ -142,6 +159,7 @@ def process_all_chats_in_batches():
         character_id = data.get("characterId")
         batch_size = data.get("batchSize", 50)  # Number of chats per batch
         sub_batch_size = data.get("subBatchSize", 10)  # Sub-batch size for processing
+        resume = data.get("resume", True)
         
         # Validate required fields
         if not user_id or not character_id:
@@ -150,36 +168,44 @@ def process_all_chats_in_batches():
                 "error": "userId and characterId are required"
             }), 400
         
+        if not resume:
+            clear_backfill_position(user_id, character_id)
+        start_cursor = data.get("cursor") or load_backfill_position(user_id, character_id)
+        
+        # Chats left to process after the starting position
+        try:
+            remaining_query = chat_pair_query(user_id, character_id, after=start_cursor)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
         logger.log_step("Validate request data")
         
         # Initialize memory service
         memory_service = MemoryService()
         
-        # Build query for fetching chats
-        query = {
-            "userId": str(user_id), 
-            "characterId": str(character_id)
-        }
-        
         # Get total count of chats
-        total_chats = db.chats.count_documents(query)
+        total_chats = db.chats.count_documents(remaining_query)
         logger.log_step("Count total chats")
         
         if total_chats == 0:
             return jsonify({
                 "success": True,
-                "message": "No chats found for this user-character pair",
+                "message": "No chats found for this user-character pair" if not start_cursor else "No new chats since the last run",
                 "stats": {
                     "total_chats": 0,
                     "processed_chats": 0,
-                    "batches_processed": 0
+                    "batches_processed": 0,
+                    "resumed_from": start_cursor
                 }
             })
         
         # Calculate number of batches needed
         total_batches = (total_chats + batch_size - 1) // batch_size  # Ceiling division
         
-        print(f"🚀 Starting automatic batch processing:")
+        print(f"🚀 Starting automatic batch processing{' (resuming)' if start_cursor else ''}:")
         print(f"   📊 Total chats: {total_chats}")
         print(f"   📦 Batch size: {batch_size}")
         print(f"   🔄 Total batches: {total_batches}")
@@ -189,25 +215,14 @@ def process_all_chats_in_batches():
         total_processed = 0
         total_failed = 0
         batch_results = []
+        next_cursor = start_cursor
+        start_index = 1
         
-        for batch_num in range(1, total_batches + 1):
-            start_index = (batch_num - 1) * batch_size + 1
-            end_index = min(batch_num * batch_size, total_chats)
+        for batch_num, chats in enumerate(iter_chat_batches(user_id, character_id, batch_size, after=start_cursor), 1):
+            end_index = start_index + len(chats) - 1
             
             print(f"\n📦 Processing batch {batch_num}/{total_batches}: chats {start_index}-{end_index}")
             
-            # Calculate actual range to fetch
-            actual_start = start_index - 1  # Convert to 0-based index
-            actual_count = end_index - actual_start
-            
-            # Fetch chats in this batch
-            chats_cursor = db.chats.find(query).sort("timestamp", 1).skip(actual_start).limit(actual_count)
-            chats = list(chats_cursor)
-            
-            if not chats:
-                print(f"   ⚠️  No chats found in batch {batch_num}")
-                continue
-            
             # Process chats in sub-batches
             batch_processed = 0
             batch_failed = 0
@@ -215,13 +230,17 @@ def process_all_chats_in_batches():
             
             for i in range(0, len(chats), sub_batch_size):
                 sub_batch = chats[i:i + sub_batch_size]
-                sub_batch_results = _process_chat_batch(memory_service, user_id, character_id, sub_batch)
+                sub_batch_results = process_chat_batch(memory_service, user_id, character_id, sub_batch)
                 batch_processed += sub_batch_results["processed"]
                 batch_failed += sub_batch_results["failed"]
                 sub_batch_count += 1
                 
                 print(f"   📋 Sub-batch {sub_batch_count}: {sub_batch_results['processed']} processed, {sub_batch_results['failed']} failed")
             
+            # Save the position so an interrupted run picks up after this batch
+            next_cursor = encode_chat_cursor(chats[-1])
+            save_backfill_position(user_id, character_id, next_cursor, batch_processed, batch_failed)
+            
             # Update totals
             total_processed += batch_processed
             total_failed += batch_failed
@@ -236,6 +255,7 @@ def process_all_chats_in_batches():
                 "sub_batches": sub_batch_count
             }
             batch_results.append(batch_result)
+            start_index = end_index + 1
             
             print(f"   ✅ Batch {batch_num} completed: {batch_processed} processed, {batch_failed} failed")
         
@@ -250,15 +270,17 @@ def process_all_chats_in_batches():
         
         return jsonify({
             "success": True,
-            "message": f"Successfully processed all {total_chats} chats in {total_batches} batches",
+            "message": f"Successfully processed all {start_index - 1} chats in {len(batch_results)} batches",
             "stats": {
-                "total_chats": total_chats,
-                "total_batches": total_batches,
+                "total_chats": start_index - 1,
+                "total_batches": len(batch_results),
                 "batch_size": batch_size,
                 "sub_batch_size": sub_batch_size,
                 "total_processed": total_processed,
                 "total_failed": total_failed,
-                "total_memories": final_stats.get("total_memories", 0)
+                "total_memories": final_stats.get("total_memories", 0),
+                "resumed_from": start_cursor,
+                "next_cursor": next_cursor
             },
             "batch_results": batch_results
         }), 200
@@ -279,13 +301,17 @@ def process_batch_chats():
     """
     Process a specific batch of chats (1-50) and store them in Qdrant using Mem0
     
+    Pass the returned nextCursor as "cursor" to fetch the following batch without an
+    offset scan; startIndex is then ignored and endIndex - startIndex + 1 chats are read.
+    
     Expected JSON payload:
     {
         "userId": "user123",
         "characterId": "char456",
         "startIndex": 1,     // optional, default 1
         "endIndex": 50,      // optional, default 50
-        "batchSize": 10      // optional, default 10 (for processing sub-batches)
+        "batchSize": 10,     // optional, default 10 (for processing sub-batches)
+        "cursor": "..."      // optional, continue after a previous call's nextCursor
     }
     """
     logger = PerformanceLogger()
@@ -304,6 +330,7 @@ def process_batch_chats():
         start_index = data.get("startIndex", 1)
         end_index = data.get("endIndex", 50)
         batch_size = data.get("batchSize", 10)
+        cursor = data.get("cursor")
         
         # Validate required fields
         if not user_id or not character_id:
@@ -319,54 +346,40 @@ def process_batch_chats():
                 "error": "Invalid indices: startIndex must be >= 1 and endIndex must be >= startIndex"
             }), 400
         
+        try:
+            query = chat_pair_query(user_id, character_id, after=cursor)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
         logger.log_step("Validate request data")
         
         # Initialize memory service
         memory_service = MemoryService()
         
-        # Build query for fetching chats
-        query = {
-            "userId": str(user_id), 
-            "characterId": str(character_id)
-        }
-        
-        # Get total count of chats
-        total_chats = db.chats.count_documents(query)
-        logger.log_step("Count total chats")
-        
-        if total_chats == 0:
-            return jsonify({
-                "success": True,
-                "message": "No chats found for this user-character pair",
-                "stats": {
-                    "total_chats": 0,
-                    "processed_chats": 0,
-                    "requested_range": f"{start_index}-{end_index}"
-                }
-            })
+        # Fetch chats in the specified range, ordered by timestamp (oldest first).
+        # With a cursor the range starts right after it; otherwise one offset is skipped.
+        requested_count = end_index - start_index + 1
+        chats_cursor = db.chats.find(query).sort(CHAT_ORDER)
+        if not cursor:
+            chats_cursor = chats_cursor.skip(start_index - 1)
+        chats = list(chats_cursor.limit(requested_count))
         
-        # Calculate actual range to fetch
-        actual_start = max(0, start_index - 1)  # Convert to 0-based index
-        actual_end = min(total_chats, end_index)
-        actual_count = actual_end - actual_start
+        logger.log_step(f"Fetch {len(chats)} chats from range {start_index}-{end_index}")
         
-        if actual_count <= 0:
+        if not chats:
             return jsonify({
                 "success": True,
                 "message": f"No chats in requested range {start_index}-{end_index}",
                 "stats": {
-                    "total_chats": total_chats,
                     "processed_chats": 0,
-                    "requested_range": f"{start_index}-{end_index}"
+                    "requested_range": f"{start_index}-{end_index}",
+                    "next_cursor": None
                 }
             })
         
-        # Fetch chats in the specified range, ordered by timestamp (oldest first)
-        chats_cursor = db.chats.find(query).sort("timestamp", 1).skip(actual_start).limit(actual_count)
-        chats = list(chats_cursor)
-        
-        logger.log_step(f"Fetch {len(chats)} chats from range {start_index}-{end_index}")
-        
         # Process chats in sub-batches
         processed_count = 0
         failed_count = 0
@@ -374,7 +387,7 @@ def process_batch_chats():
         
         for i in range(0, len(chats), batch_size):
             batch = chats[i:i + batch_size]
-            batch_results = _process_chat_batch(memory_service, user_id, character_id, batch)
+            batch_results = process_chat_batch(memory_service, user_id, character_id, batch)
             processed_count += batch_results["processed"]
             failed_count += batch_results["failed"]
             batch_count += 1
@@ -389,13 +402,14 @@ def process_batch_chats():
             "success": True,
             "message": f"Successfully processed chats {start_index}-{end_index}",
             "stats": {
-                "total_chats_in_db": total_chats,
+                "total_chats_in_db": db.chats.count_documents(chat_pair_query(user_id, character_id)),
                 "requested_range": f"{start_index}-{end_index}",
                 "chats_fetched": len(chats),
                 "processed_chats": processed_count,
                 "failed_chats": failed_count,
                 "sub_batches_processed": batch_count,
-                "total_memories": final_stats.get("total_memories", 0)
+                "total_memories": final_stats.get("total_memories", 0),
+                "next_cursor": encode_chat_cursor(chats[-1]) if len(chats) == requested_count else None
             }
         }), 200
         
@@ -437,7 +451,8 @@ def get_memory_stats():
         
         return jsonify({
             "success": True,
-            "stats": stats
+            "stats": stats,
+            "salience_filter": salience_filter.get_stats()
         }), 200
         
     except Exception as e:
@@ -699,155 +714,27 @@ def add_memory():
         }), 500
 
 
-def _process_chat_batch(memory_service: MemoryService, user_id: str, character_id: str, batch: list) -> dict:
-    """
-    Process a batch of chats and add them to memory
-    
-    Args:
-        memory_service: MemoryService instance
-        user_id: User ID
-        character_id: Character ID
-        batch: List of chat documents
-    
-    Returns:
-        dict: Results with processed and failed counts
-    """
-    processed = 0
-    failed = 0
-    
-    for chat in batch:
-        try:
-            message = chat.get("message", "").strip()
-            sender = chat.get("sender", "").strip()
-            
-            # Skip empty messages or invalid senders
-            if not message or sender not in ["user", "ai"]:
-                continue
-            
-            # Add to memory
-            success = memory_service.add_message_to_memory(user_id, character_id, message, sender)
-            
-            if success:
-                processed += 1
-            else:
-                failed += 1
-                
-        except Exception as e:
-            print(f"❌ Error processing chat {chat.get('_id', 'unknown')}: {e}")
-            failed += 1
-    
-    return {
-        "processed": processed,
-        "failed": failed
-    }
-
-
-def _process_user_character_batches(user_id: str, character_id: str, batch_size: int, sub_batch_size: int) -> dict:
-    """
-    Process all chats for a specific user-character pair using the existing working logic
-    
-    Args:
-        user_id: User ID
-        character_id: Character ID
-        batch_size: Number of chats per batch
-        sub_batch_size: Sub-batch size for processing
-    
-    Returns:
-        dict: Results with processed, failed, and memory counts
-    """
-    try:
-        # Initialize memory service
-        memory_service = MemoryService()
-        
-        # Build query for fetching chats
-        query = {
-            "userId": str(user_id), 
-            "characterId": str(character_id)
-        }
-        
-        # Get total count of chats
-        total_chats = db.chats.count_documents(query)
-        
-        if total_chats == 0:
-            return {
-                "total_processed": 0,
-                "total_failed": 0,
-                "total_memories": 0,
-                "total_batches": 0
-            }
-        
-        # Calculate number of batches needed
-        total_batches = (total_chats + batch_size - 1) // batch_size
-        
-        # Process all batches
-        total_processed = 0
-        total_failed = 0
-        
-        for batch_num in range(1, total_batches + 1):
-            start_index = (batch_num - 1) * batch_size + 1
-            end_index = min(batch_num * batch_size, total_chats)
-            
-            # Calculate actual range to fetch
-            actual_start = start_index - 1  # Convert to 0-based index
-            actual_count = end_index - actual_start
-            
-            # Fetch chats in this batch
-            chats_cursor = db.chats.find(query).sort("timestamp", 1).skip(actual_start).limit(actual_count)
-            chats = list(chats_cursor)
-            
-            if not chats:
-                continue
-            
-            # Process chats in sub-batches
-            batch_processed = 0
-            batch_failed = 0
-            
-            for i in range(0, len(chats), sub_batch_size):
-                sub_batch = chats[i:i + sub_batch_size]
-                sub_batch_results = _process_chat_batch(memory_service, user_id, character_id, sub_batch)
-                batch_processed += sub_batch_results["processed"]
-                batch_failed += sub_batch_results["failed"]
-            
-            total_processed += batch_processed
-            total_failed += batch_failed
-        
-        # Get final memory stats
-        final_stats = memory_service.get_memory_stats(user_id, character_id)
-        
-        return {
-            "total_processed": total_processed,
-            "total_failed": total_failed,
-            "total_memories": final_stats.get("total_memories", 0),
-            "total_batches": total_batches
-        }
-        
-    except Exception as e:
-        print(f"❌ Error processing user-character batches: {e}")
-        return {
-            "total_processed": 0,
-            "total_failed": 0,
-            "total_memories": 0,
-            "total_batches": 0
-        }
-
-
 @memo_bp.route("/webhook/process-all-users", methods=["POST"])
 def webhook_process_all_users():
     """
     Webhook endpoint to process ALL users in batches with real-time progress updates
     
     This endpoint will:
-    1. Fetch all users from the database
-    2. For each user, get all their characters
-    3. Process all chats for each user-character pair in batches
-    4. Send real-time progress updates via Server-Sent Events (SSE)
+    1. Start a "memory_backfill" background job over the users
+    2. Process all chats of each user with the character in batches (one user per checkpoint)
+    3. Stream the job's progress as Server-Sent Events (SSE)
+    
+    The job keeps running if the client disconnects; it can be followed, cancelled and
+    resumed through /api/jobs/<job_id> (the id is sent in the "start" event).
     
     Expected JSON payload:
     {
         "batchSize": 50,      // optional, default 50 (chats per batch)
         "subBatchSize": 10,   // optional, default 10 (for processing sub-batches)
         "maxUsers": 100,      // optional, default 100 (limit number of users to process)
-        "startFromUser": 4    // optional, default 1 (start processing from this user index)
+        "startFromUser": 4,   // optional, default 1 (start processing from this user index)
+        "characterId": "...", // optional, defaults to the default backfill character
+        "resume": true        // optional, default true (false re-adds chats from the first one)
     }
     """
     
@@ -856,142 +743,69 @@ def webhook_process_all_users():
     batch_size = data.get("batchSize", 50)
     sub_batch_size = data.get("subBatchSize", 10)
     max_users = data.get("maxUsers", 100)
-    start_from_user = data.get("startFromUser", 1)
+    start_from_user = max(int(data.get("startFromUser", 1)), 1)
+    character_id = data.get("characterId", DEFAULT_BACKFILL_CHARACTER_ID)
     
-    def generate_progress_updates():
-        """Generator function for Server-Sent Events"""
-        try:
-            # Send initial status
-            if start_from_user > 1:
-                yield f"data: {json.dumps({'type': 'start', 'message': f'Starting batch processing from user {start_from_user}...', 'start_from_user': start_from_user, 'timestamp': datetime.now().isoformat()})}\n\n"
-            else:
-                yield f"data: {json.dumps({'type': 'start', 'message': 'Starting batch processing for all users...', 'timestamp': datetime.now().isoformat()})}\n\n"
-            
-            # Fetch all users
-            yield f"data: {json.dumps({'type': 'fetch_users', 'message': 'Fetching all users from database...', 'timestamp': datetime.now().isoformat()})}\n\n"
-            
-            # Fetch all users and apply start_from_user offset
-            users_cursor = db.users.find({}).limit(max_users + start_from_user - 1)
-            all_users = list(users_cursor)
-            
-            # Skip users before start_from_user
-            if start_from_user > 1:
-                users = all_users[start_from_user - 1:]
-                skipped_users = start_from_user - 1
-            else:
-                users = all_users
-                skipped_users = 0
-            
-            total_users = len(users)
-            total_all_users = len(all_users)
-            
-            if skipped_users > 0:
-                yield f"data: {json.dumps({'type': 'users_fetched', 'message': f'Fetched {total_users} users (skipped first {skipped_users} users)', 'total_users': total_users, 'skipped_users': skipped_users, 'start_from_user': start_from_user, 'timestamp': datetime.now().isoformat()})}\n\n"
-            else:
-                yield f"data: {json.dumps({'type': 'users_fetched', 'message': f'Fetched {total_users} users', 'total_users': total_users, 'timestamp': datetime.now().isoformat()})}\n\n"
-            
-            if total_users == 0:
-                yield f"data: {json.dumps({'type': 'complete', 'message': 'No users found in database', 'timestamp': datetime.now().isoformat()})}\n\n"
-                return
-            
-            # Process each user using the existing working function
-            total_processed_users = 0
-            total_processed_chats = 0
-            total_failed_chats = 0
-            total_memories_created = 0
-            
-            # Hardcoded character ID
-            hardcoded_character_id = "688210873496b5e441480d22"
-            character_name = "Hardcoded Character"
-            
-            for user_index, user in enumerate(users, start_from_user):
-                user_id = str(user.get("_id"))
-                user_name = user.get("userName", "Unknown User")
-                
-                # Send user start status
-                yield f"data: {json.dumps({'type': 'user_start', 'message': f'Processing user {user_index}/{total_all_users}: {user_name}', 'user_id': user_id, 'user_name': user_name, 'user_index': user_index, 'total_users': total_users, 'total_all_users': total_all_users, 'timestamp': datetime.now().isoformat()})}\n\n"
-                
-                # Process user with hardcoded character ID
-                user_processed_chats = 0
-                user_failed_chats = 0
-                
-                yield f"data: {json.dumps({'type': 'character_start', 'message': f'Processing with hardcoded character: {character_name}', 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'timestamp': datetime.now().isoformat()})}\n\n"
-                
-                # Call the working API endpoint for this user-character pair
-                try:
-                    import requests
-                    
-                    # Call the working API endpoint
-                    api_url = f"http://localhost:5000/api/memo/process-all-chats-batches"
-                    payload = {
-                        "userId": user_id,
-                        "characterId": hardcoded_character_id,
-                        "batchSize": batch_size,
-                        "subBatchSize": sub_batch_size
-                    }
-                    
-                    yield f"data: {json.dumps({'type': 'api_call', 'message': f'Calling API for {character_name}...', 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    
-                    # Make the API call
-                    response = requests.post(api_url, json=payload, timeout=300)  # 5 minute timeout
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        
-                        character_processed = result.get("stats", {}).get("total_processed", 0)
-                        character_failed = result.get("stats", {}).get("total_failed", 0)
-                        character_memories = result.get("stats", {}).get("total_memories", 0)
-                        batches_processed = result.get("stats", {}).get("total_batches", 0)
-                        
-                        # Send batch progress updates
-                        for batch_num in range(1, batches_processed + 1):
-                            yield f"data: {json.dumps({'type': 'batch_progress', 'message': f'Processed batch {batch_num}/{batches_processed} for {character_name}', 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'batch_num': batch_num, 'total_batches': batches_processed, 'timestamp': datetime.now().isoformat()})}\n\n"
-                            time.sleep(0.1)  # Small delay
-                        
-                        user_processed_chats += character_processed
-                        user_failed_chats += character_failed
-                        total_memories_created += character_memories
-                        
-                        # Send character completion status
-                        yield f"data: {json.dumps({'type': 'character_complete', 'message': f'Completed character {character_name}: {character_processed} processed, {character_failed} failed, {character_memories} memories', 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'processed': character_processed, 'failed': character_failed, 'memories': character_memories, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    else:
-                        error_msg = f"API call failed for {character_name}: HTTP {response.status_code}"
-                        yield f"data: {json.dumps({'type': 'error', 'message': error_msg, 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'timestamp': datetime.now().isoformat()})}\n\n"
-                        continue
-                    
-                except requests.exceptions.Timeout:
-                    error_msg = f"Timeout processing character {character_name}"
-                    yield f"data: {json.dumps({'type': 'error', 'message': error_msg, 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    continue
-                except Exception as e:
-                    error_msg = f"Error processing character {character_name}: {str(e)}"
-                    yield f"data: {json.dumps({'type': 'error', 'message': error_msg, 'user_id': user_id, 'user_name': user_name, 'character_id': hardcoded_character_id, 'character_name': character_name, 'timestamp': datetime.now().isoformat()})}\n\n"
-                    continue
-                
-                total_processed_chats += user_processed_chats
-                total_failed_chats += user_failed_chats
-                total_processed_users += 1
-                
-                # Send user completion status
-                yield f"data: {json.dumps({'type': 'user_complete', 'message': f'Completed user {user_name}: {user_processed_chats} chats processed, {user_failed_chats} failed', 'user_id': user_id, 'user_name': user_name, 'processed': user_processed_chats, 'failed': user_failed_chats, 'user_index': user_index, 'total_users': total_users, 'total_all_users': total_all_users, 'timestamp': datetime.now().isoformat()})}\n\n"
-            
-            # Send final completion status
-            yield f"data: {json.dumps({'type': 'complete', 'message': f'All users processed successfully!', 'summary': {'total_users': total_users, 'processed_users': total_processed_users, 'total_chats_processed': total_processed_chats, 'total_chats_failed': total_failed_chats, 'total_memories_created': total_memories_created, 'start_from_user': start_from_user, 'skipped_users': skipped_users}, 'timestamp': datetime.now().isoformat()})}\n\n"
-            
-        except Exception as e:
-            error_msg = f"Error in webhook processing: {str(e)}"
-            print(f"❌ {error_msg}")
-            traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'message': error_msg, 'timestamp': datetime.now().isoformat()})}\n\n"
+    try:
+        job = job_engine.submit("memory_backfill", {
+            "batch_size": batch_size,
+            "sub_batch_size": sub_batch_size,
+            "max_users": max_users,
+            "start_index": start_from_user - 1,
+            "character_id": character_id,
+            "resume": data.get("resume", True)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+    job_id = str(job["_id"])
+    
+    def summary(job_doc: dict) -> dict:
+        progress, totals = job_doc.get("progress", {}), job_doc.get("totals", {})
+        return {
+            "job_id": job_id,
+            "total_users": progress.get("total", 0),
+            "processed_users": progress.get("succeeded", 0),
+            "failed_users": progress.get("failed", 0),
+            "total_chats_processed": totals.get("chats_processed", 0),
+            "total_chats_failed": totals.get("chats_failed", 0),
+            "total_memories_created": totals.get("memories", 0),
+            "start_from_user": start_from_user,
+            "skipped_users": start_from_user - 1
+        }
+    
+    def to_progress_update(event: dict):
+        """Map job events onto the progress events the webhook has always sent"""
+        timestamp = event.get("timestamp", datetime.now().isoformat())
+        event_type = event["type"]
+        
+        if event_type == "snapshot":
+            job_doc = event["job"]
+            if job_doc["status"] == "completed":
+                return {'type': 'complete', 'message': 'All users processed successfully!', 'summary': summary(job_doc), 'timestamp': timestamp}
+            if job_doc["status"] in ("cancelled", "failed", "interrupted"):
+                return {'type': 'error', 'message': f"Job {job_doc['status']}: {job_doc.get('error', '')}".rstrip(": "), 'job_id': job_id, 'timestamp': timestamp}
+            return {'type': 'start', 'message': f'Starting batch processing from user {start_from_user}...', 'job_id': job_id, 'start_from_user': start_from_user, 'timestamp': timestamp}
+        if event_type == "start":
+            progress = event["progress"]
+            return {'type': 'users_fetched', 'message': f"Fetched {progress['total']} users ({event['remaining']} to process)", 'total_users': progress['total'], 'skipped_users': start_from_user - 1, 'start_from_user': start_from_user, 'timestamp': timestamp}
+        if event_type == "item_start":
+            return {'type': 'user_start', 'message': f"Processing user {event['itemId']}", 'user_id': event['itemId'], 'user_name': event['user_name'], 'character_id': character_id, 'timestamp': timestamp}
+        if event_type == "item":
+            result = event["result"]
+            details = {'user_id': event['itemId'], 'user_name': result.get('user_name'), 'processed': result.get('chats_processed', 0), 'failed': result.get('chats_failed', 0), 'memories': result.get('memories', 0), 'timestamp': timestamp}
+            if result.get("status") == "failed":
+                return {'type': 'user_failed', 'message': f"Failed user {result.get('user_name')}: {result.get('error', 'unknown error')}", **details}
+            return {'type': 'user_complete', 'message': f"Completed user {result.get('user_name')}: {details['processed']} chats processed, {details['failed']} failed", **details}
+        if event_type == "completed":
+            return {'type': 'complete', 'message': 'All users processed successfully!', 'summary': summary({"progress": event["progress"], "totals": event["totals"]}), 'timestamp': timestamp}
+        if event_type in ("cancelled", "failed", "interrupted"):
+            return {'type': 'error', 'message': f"Job {event_type}: {event.get('error', '')}".rstrip(": "), 'job_id': job_id, 'timestamp': timestamp}
+        return None
     
     # Return Server-Sent Events response
     return Response(
-        generate_progress_updates(),
+        stream_with_context(stream_job_events(job_id, to_progress_update)),
         mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Cache-Control'
-        }
+        headers=SSE_HEADERS
     )
@@ -2,107 +2,15 @@ from flask import Blueprint, request, jsonify
 import requests
 import os
 import time
-import tempfile
-import subprocess
 from datetime import datetime
 from app.config import Config
 from app.services.aws_bucket import handle_voice_upload
 from app.socket.controller.chat_controller import save_user_message
-from app.memory.memory_service import MemoryService
+from app.utility.audio_conversion import convert_to_wav
 
 # Create blueprint
 speech_to_text_bp = Blueprint('speech_to_text', __name__)
 
-def convert_opus_to_wav(opus_data):
-    """
-    Convert Opus audio data to WAV format using FFmpeg
-    
-    Args:
-        opus_data (bytes): Raw Opus audio data
-        
-    Returns:
-        bytes: WAV audio data
-        
-    Raises:
-        Exception: If conversion fails
-    """
-    print(f"🔄 Starting Opus to WAV conversion...")
-    conversion_start_time = time.time()
-    
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(suffix='.opus', delete=False) as opus_temp:
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as wav_temp:
-            try:
-                # Write opus data to temporary file
-                opus_temp.write(opus_data)
-                opus_temp.flush()
-                opus_temp_path = opus_temp.name
-                wav_temp_path = wav_temp.name
-                
-                print(f"📁 Temporary Opus file: {opus_temp_path}")
-                print(f"📁 Temporary WAV file: {wav_temp_path}")
-                
-                # FFmpeg command to convert Opus to WAV
-                # Using specific parameters for Azure Speech Services compatibility
-                ffmpeg_cmd = [
-                    'ffmpeg',
-                    '-i', opus_temp_path,           # Input Opus file
-                    '-ar', '16000',                 # Sample rate: 16kHz (recommended for speech)
-                    '-ac', '1',                     # Mono channel
-                    '-sample_fmt', 's16',           # 16-bit signed integer
-                    '-f', 'wav',                    # Output format WAV
-                    '-y',                           # Overwrite output file
-                    wav_temp_path                   # Output WAV file
-                ]
-                
-                print(f"🎵 FFmpeg command: {' '.join(ffmpeg_cmd)}")
-                
-                # Execute FFmpeg conversion
-                result = subprocess.run(
-                    ffmpeg_cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # 30 second timeout
-                )
-                
-                if result.returncode != 0:
-                    print(f"❌ FFmpeg conversion failed!")
-                    print(f"📤 FFmpeg stdout: {result.stdout}")
-                    print(f"📥 FFmpeg stderr: {result.stderr}")
-                    raise Exception(f"FFmpeg conversion failed: {result.stderr}")
-                
-                # Read converted WAV data
-                with open(wav_temp_path, 'rb') as wav_file:
-                    wav_data = wav_file.read()
-                
-                conversion_time = time.time() - conversion_start_time
-                print(f"✅ Opus to WAV conversion successful in {conversion_time:.2f}s")
-                print(f"📊 Original Opus size: {len(opus_data)} bytes")
-                print(f"📊 Converted WAV size: {len(wav_data)} bytes")
-                
-                return wav_data
-                
-            except subprocess.TimeoutExpired:
-                print(f"⏰ FFmpeg conversion timed out")
-                raise Exception("Audio conversion timed out")
-            except FileNotFoundError:
-                print(f"❌ FFmpeg not found. Please install FFmpeg")
-                raise Exception("FFmpeg not installed. Please install FFmpeg to convert audio files.")
-            except Exception as e:
-                print(f"❌ Conversion error: {str(e)}")
-                raise Exception(f"Audio conversion failed: {str(e)}")
-            finally:
-                # Clean up temporary files
-                try:
-                    if os.path.exists(opus_temp_path):
-                        os.unlink(opus_temp_path)
-                        print(f"🗑️ Cleaned up temporary Opus file")
-                    if os.path.exists(wav_temp_path):
-                        os.unlink(wav_temp_path)
-                        print(f"🗑️ Cleaned up temporary WAV file")
-                except Exception as cleanup_error:
-                    print(f"⚠️ Failed to clean up temporary files: {cleanup_error}")
-
 def detect_audio_format(file_data):
     """
     Detect audio format based on file header/magic bytes
@@ -139,9 +47,10 @@ def transcribe_audio():
     2. Uploads to S3 in voice-notes folder
     3. Detects audio format and converts Opus to WAV if needed
     4. Uses Azure Speech Services for transcription
-    5. Adds transcribed text to memory service
-    6. Saves user message (only audio_url, not text)
-    7. Returns the transcribed text + file URL
+    5. Saves user message (only audio_url, not text)
+    6. Returns the transcribed text + file URL
+
+    The transcribed text goes to memory with the AI reply it prompts (get_claude_reply).
     """
     start_time = time.time()
     request_id = f"req_{int(time.time() * 1000)}"
@@ -215,7 +124,7 @@ def transcribe_audio():
             print(f"🔄 Opus format detected - conversion to WAV required")
             try:
                 conversion_start = time.time()
-                audio_data_for_upload = convert_opus_to_wav(original_audio_data)
+                audio_data_for_upload = convert_to_wav(original_audio_data)
                 conversion_time = time.time() - conversion_start
                 content_type = 'audio/wav'
                 # Change filename extension to .wav
@@ -238,7 +147,7 @@ def transcribe_audio():
             try:
                 print(f"🔄 Attempting conversion to WAV...")
                 conversion_start = time.time()
-                audio_data_for_upload = convert_opus_to_wav(original_audio_data)
+                audio_data_for_upload = convert_to_wav(original_audio_data)
                 conversion_time = time.time() - conversion_start
                 content_type = 'audio/wav'
                 # Change filename extension to .wav
@@ -319,22 +228,9 @@ def transcribe_audio():
                 print(f"⏱️ Audio Duration: {duration} microseconds")
                 print(f"📍 Audio Offset: {offset} microseconds")
 
-                # ✅ Step 1: Add message to memory
-                print(f"🧠 Adding message to memory service...")
-                memory_start_time = time.time()
-                try:
-                    MemoryService().add_message_to_memory(
-                        user_id,
-                        character_id,
-                        transcribed_text,
-                        "User"
-                    )
-                    memory_time = time.time() - memory_start_time
-                    print(f"✅ Voice message added to memory in {memory_time:.2f}s: {transcribed_text[:50]}...")
-                except Exception as e:
-                    print(f"⚠️ Memory service failed: {e}")
+                # The transcription reaches memory with the reply's conversation turn (get_claude_reply)
 
-                # ✅ Step 2: Save user message with ONLY audio_url
+                # ✅ Save user message with ONLY audio_url
                 print(f"💾 Saving user message to database...")
                 db_start_time = time.time()
                 try:
@@ -357,7 +253,6 @@ def transcribe_audio():
                     print(f"   - Audio Conversion: {conversion_time:.2f}s")
                 print(f"   - S3 Upload (WAV): {s3_upload_time:.2f}s")
                 print(f"   - Azure Processing: {azure_processing_time:.2f}s")
-                print(f"   - Memory Service: {memory_time:.2f}s")
                 print(f"   - Database Save: {db_time:.2f}s")
 
                 # ✅ Final API response
@@ -9,7 +9,7 @@ from werkzeug.datastructures import FileStorage
 from app.config import Config
 from app.services.aws_bucket import handle_speech_audio_upload
 from app.socket.controller.chat_controller import save_ai_message
-from app.memory.memory_service import MemoryService
+from app.utility.timestamps import chat_timestamp_for_storage
 
 # Create blueprint
 text_to_speech_bp = Blueprint('text_to_speech', __name__)
@@ -39,9 +39,10 @@ def synthesize_speech():
     1. Accepts text input with user_id and character_id
     2. Uses Azure Speech Services to convert text to speech
     3. Uploads generated audio to S3 in speech-audio folder
-    4. Adds text to memory service
-    5. Saves message to database with audio URL
-    6. Returns the audio URL and synthesis details
+    4. Saves message to database with audio URL
+    5. Returns the audio URL and synthesis details
+
+    The text is an AI reply, which get_claude_reply has already written to memory.
     """
     start_time = time.time()
     request_id = f"tts_req_{int(time.time() * 1000)}"
@@ -185,37 +186,29 @@ def synthesize_speech():
                 "message": str(e)
             }), 500
 
-        # ✅ Add message to memory service
-        print(f"🧠 Adding message to memory service...")
-        memory_start_time = time.time()
-        try:
-            MemoryService().add_message_to_memory(
-                user_id,
-                character_id,
-                text,
-                "Assistant"  # This is an AI-generated response
-            )
-            memory_time = time.time() - memory_start_time
-            print(f"✅ TTS message added to memory in {memory_time:.2f}s: {text[:50]}...")
-        except Exception as e:
-            print(f"⚠️ Memory service failed: {e}")
+        # The text is the AI reply, already in memory as part of its conversation turn
 
         # ✅ Save message to database (only audio URL, no text)
         print(f"💾 Saving TTS audio to database...")
         db_start_time = time.time()
         try:
-            timestamp = datetime.utcnow().isoformat()
+            created_at = datetime.utcnow()
             message_data = {
                 "userId": str(user_id),
                 "characterId": str(character_id),
                 "sender": "ai",
                 "audio_url": file_url,  # Only save audio URL
-                "timestamp": timestamp
+                "timestamp": chat_timestamp_for_storage(created_at)
             }
             
             from app.services.db import db
+            from app.services.session_store import session_store
+            from app.services.daily_stats import daily_stats
             result = db.chats.insert_one(message_data)
             message_data["_id"] = str(result.inserted_id)
+            message_data["timestamp"] = created_at.isoformat()
+            session_store.record_chat(user_id, created_at, "ai")
+            daily_stats.record_chat(user_id, created_at, "ai")
             
             db_time = time.time() - db_start_time
             print(f"✅ TTS audio saved to database (audio_url only) in {db_time:.2f}s")
@@ -228,7 +221,6 @@ def synthesize_speech():
         print(f"📊 Performance breakdown:")
         print(f"   - Speech Synthesis: {synthesis_time:.2f}s")
         print(f"   - S3 Upload: {s3_upload_time:.2f}s")
-        print(f"   - Memory Service: {memory_time:.2f}s")
         print(f"   - Database Save: {db_time:.2f}s")
 
         # ✅ Final API response
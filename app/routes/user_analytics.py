@@ -3,13 +3,23 @@ from pymongo import MongoClient
 from datetime import datetime, timedelta
 from collections import defaultdict
 from bson import ObjectId
+import numpy as np
 from app.config import Config
 from app.services.db import db
+from app.services.sessionization import sessionize_users, timestamp_to_date
+from app.services.session_store import session_store
+from app.services.cohort_analytics import load_weekly_activity
+from app.services.daily_stats import daily_stats
+from app.utility.timestamps import format_chat_timestamp, timestamp_range_filter
+from app.utility.response_cache import cached_response, date_param_end, parse_day
 
 user_analytics_bp = Blueprint('user_analytics', __name__)
 
 def parse_timestamp(timestamp_str):
     """Parse timestamp string to datetime object"""
+    if isinstance(timestamp_str, datetime):
+        # Chats written since the BSON date migration already carry a datetime
+        return timestamp_str
     try:
         # Handle the format "2025-07-24T16:04:09.193708"
         return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
@@ -113,220 +123,167 @@ def get_day_categorization(user_id, date_str, day_sessions):
             "sub_category": "N/A"
         }
 
-def calculate_user_sessions(user_id, session_gap_minutes=30):
-    """Calculate sessions for a specific user based on continuous chat activity"""
-    
-    # Get all chats for the user, sorted by timestamp
-    chats = list(db.chats.find(
-        {"userId": user_id}
-    ).sort("timestamp", 1))
-    
-    if not chats:
-        return {
-            "userId": user_id,
-            "totalChats": 0,
-            "totalSessions": 0,
-            "sessions": [],
-            "totalDurationMinutes": 0
-        }
-    
-    sessions = []
-    session_gap_seconds = session_gap_minutes * 60
-    
-    current_session_chats = []
-    
-    for i, chat in enumerate(chats):
-        chat_time = parse_timestamp(chat["timestamp"])
-        
-        if i == 0:
-            # First chat starts the first session
-            current_session_chats = [chat]
-        else:
-            # Check gap between current chat and previous chat
-            prev_chat_time = parse_timestamp(chats[i-1]["timestamp"])
-            time_gap = (chat_time - prev_chat_time).total_seconds()
-            
-            if time_gap <= session_gap_seconds:
-                # Continue current session
-                current_session_chats.append(chat)
-            else:
-                # Gap is too large, finalize current session and start new one
-                if current_session_chats:
-                    sessions.append(current_session_chats)
-                
-                # Start new session with current chat
-                current_session_chats = [chat]
-    
-    # Don't forget the last session
-    if current_session_chats:
-        sessions.append(current_session_chats)
-    
-    # Format sessions for response
-    formatted_sessions = []
-    total_duration = 0
-    
-    for session_idx, session_chats in enumerate(sessions):
-        if not session_chats:
-            continue
-            
-        start_time = parse_timestamp(session_chats[0]["timestamp"])
-        end_time = parse_timestamp(session_chats[-1]["timestamp"])
-        
-        # Calculate session duration (from first chat to last chat)
-        session_duration = (end_time - start_time).total_seconds() / 60
-        
-        formatted_chats = []
-        for chat in session_chats:
-            formatted_chats.append({
-                "chatId": str(chat["_id"]),
-                "message": chat.get("message", ""),
-                "timestamp": chat["timestamp"],
-                "sender": chat.get("sender", "")
-            })
-        
-        # Get categorization data for this session
-        session_categorization = get_session_categorization(user_id, session_idx + 1)
-        
-        formatted_session = {
-            "sessionId": session_idx + 1,
-            "startTime": start_time.isoformat(),
-            "endTime": end_time.isoformat(),
-            "chatCount": len(session_chats),
-            "durationMinutes": round(session_duration, 2),
-            "categorization": session_categorization
-        }
-        
-        formatted_sessions.append(formatted_session)
-        total_duration += session_duration
-    
+def get_users_session_categorizations(user_ids):
+    """Get session categorizations for many users in one query: {user_id: {session_id: categorization}}"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    categorizations = {user_id: {} for user_id in user_ids}
+    if not user_ids:
+        return categorizations
+
+    try:
+        cursor = db.categorizations.find(
+            {"user_id": {"$in": user_ids}},
+            {"user_id": 1, "sessions.session_id": 1, "sessions.primary_category": 1, "sessions.sub_category": 1}
+        )
+        for user_categorization in cursor:
+            categorizations[user_categorization["user_id"]] = {
+                session.get("session_id"): {
+                    "primary_category": session.get("primary_category", "Not Categorized"),
+                    "sub_category": session.get("sub_category", "N/A")
+                }
+                for session in user_categorization.get("sessions") or []
+            }
+    except Exception:
+        pass
+
+    return categorizations
+
+def get_user_session_categorizations(user_id):
+    """Get all session categorizations of a user in one query, keyed by session id"""
+    return get_users_session_categorizations([user_id])[str(user_id)]
+
+def lookup_session_categorization(categorizations, *session_ids):
+    """Pick a session's categorization out of get_user_session_categorizations() output
+
+    Accepts several ids so stable session ids can fall back to the legacy 1-based position.
+    """
+    for session_id in session_ids:
+        if session_id in categorizations:
+            return categorizations[session_id]
     return {
-        "userId": user_id,
-        "totalChats": len(chats),
-        "totalSessions": len(sessions),
-        "sessions": formatted_sessions,
-        "totalDurationMinutes": round(total_duration, 2)
+        "primary_category": "Not Categorized",
+        "sub_category": "N/A"
     }
 
-def calculate_user_sessions_with_chats(user_id, session_gap_minutes=30):
-    """Calculate sessions for a specific user with detailed chat information"""
-    
-    # Get all chats for the user, sorted by timestamp
-    chats = list(db.chats.find(
-        {"userId": user_id}
-    ).sort("timestamp", 1))
-    
-    if not chats:
-        return {
-            "userId": user_id,
-            "totalChats": 0,
-            "totalSessions": 0,
-            "sessions": [],
-            "totalDurationMinutes": 0
-        }
-    
-    sessions = []
-    session_gap_seconds = session_gap_minutes * 60
-    
-    current_session_chats = []
-    
-    for i, chat in enumerate(chats):
-        chat_time = parse_timestamp(chat["timestamp"])
-        
-        if i == 0:
-            # First chat starts the first session
-            current_session_chats = [chat]
-        else:
-            # Check gap between current chat and previous chat
-            prev_chat_time = parse_timestamp(chats[i-1]["timestamp"])
-            time_gap = (chat_time - prev_chat_time).total_seconds()
-            
-            if time_gap <= session_gap_seconds:
-                # Continue current session
-                current_session_chats.append(chat)
-            else:
-                # Gap is too large, finalize current session and start new one
-                if current_session_chats:
-                    sessions.append(current_session_chats)
-                
-                # Start new session with current chat
-                current_session_chats = [chat]
-    
-    # Don't forget the last session
-    if current_session_chats:
-        sessions.append(current_session_chats)
-    
-    # Format sessions for response with detailed chat information
-    formatted_sessions = []
-    total_duration = 0
-    
-    for session_idx, session_chats in enumerate(sessions):
-        if not session_chats:
-            continue
-            
-        start_time = parse_timestamp(session_chats[0]["timestamp"])
-        end_time = parse_timestamp(session_chats[-1]["timestamp"])
-        
-        # Calculate session duration (from first chat to last chat)
-        session_duration = (end_time - start_time).total_seconds() / 60
-        
-        # Format chat details for this session
-        formatted_chats = []
-        user_message_count = 0
-        bot_message_count = 0
-        
-        for chat in session_chats:
-            sender = chat.get("sender", "User")
-            if sender.lower() == "user":
-                user_message_count += 1
-            else:
-                bot_message_count += 1
-                
-            formatted_chats.append({
-                "chatId": str(chat["_id"]),
-                "message": chat.get("message", ""),
-                "sender": sender
-            })
-        
-        # Calculate session statistics
-        total_characters = sum(len(chat.get("message", "")) for chat in session_chats)
-        avg_message_length = total_characters / len(session_chats) if session_chats else 0
-        
-        # Get categorization data for this session
-        session_categorization = get_session_categorization(user_id, session_idx + 1)
-        
-        formatted_session = {
-            "sessionId": session_idx + 1,
-            "startTime": start_time.isoformat(),
-            "endTime": end_time.isoformat(),
-            "chatCount": len(session_chats),
-            "userMessages": user_message_count,
-            "botMessages": bot_message_count,
-            "durationMinutes": round(session_duration, 2),
-            "chats": formatted_chats,  # Include all chat details
-            "categorization": session_categorization
-        }
-        
-        formatted_sessions.append(formatted_session)
-        total_duration += session_duration
-    
+def format_chat(chat):
     return {
+        "chatId": str(chat["_id"]),
+        "message": chat.get("message", ""),
+        "sender": chat.get("sender", "User")
+    }
+
+def format_stored_session(row, categorizations, chats=None):
+    """Format a precomputed `sessions` row like the computed session payloads"""
+    session_duration = (row["endTime"] - row["startTime"]).total_seconds() / 60
+    formatted_session = {
+        "sessionId": str(row["_id"]),
+        "sessionNumber": row.get("sessionNumber"),
+        "startTime": row["startTime"].isoformat(),
+        "endTime": row["endTime"].isoformat(),
+        "chatCount": row["chatCount"],
+        "durationMinutes": round(session_duration, 2),
+        "categorization": lookup_session_categorization(categorizations, str(row["_id"]), row.get("sessionNumber"))
+    }
+    if chats is not None:
+        formatted_session.update({
+            "userMessages": row.get("userMessages", 0),
+            "botMessages": row.get("botMessages", 0),
+            "chats": [format_chat(chat) for chat in chats]
+        })
+    return formatted_session
+
+def format_computed_session(session, categorizations, include_chats=False):
+    """Format a session produced by sessionize_users()"""
+    session_duration = (session["endTime"] - session["startTime"]).total_seconds() / 60
+    formatted_session = {
+        "sessionId": session["sessionIndex"],
+        "startTime": session["startTime"].isoformat(),
+        "endTime": session["endTime"].isoformat(),
+        "chatCount": session["chatCount"],
+        "durationMinutes": round(session_duration, 2),
+        "categorization": lookup_session_categorization(categorizations, session["sessionIndex"])
+    }
+    if include_chats:
+        formatted_session.update({
+            "userMessages": session["userMessages"],
+            "botMessages": session["botMessages"],
+            "chats": session["chats"]  # Include all chat details
+        })
+    return formatted_session
+
+def summarize_user_sessions(user_id, formatted_sessions, include_chats=False):
+    """Build the per-user sessions payload from formatted sessions"""
+    total_chats = sum(session["chatCount"] for session in formatted_sessions)
+    total_duration = sum(session["durationMinutes"] for session in formatted_sessions)
+    total_sessions = len(formatted_sessions)
+
+    result = {
         "userId": user_id,
-        "totalChats": len(chats),
-        "totalSessions": len(sessions),
+        "totalChats": total_chats,
+        "totalSessions": total_sessions,
         "sessions": formatted_sessions,
-        "totalDurationMinutes": round(total_duration, 2),
-        "avgSessionDuration": round(total_duration / len(sessions), 2) if sessions else 0,
-        "avgChatsPerSession": round(len(chats) / len(sessions), 2) if sessions else 0
+        "totalDurationMinutes": round(total_duration, 2)
     }
+    if include_chats:
+        result.update({
+            "avgSessionDuration": round(total_duration / total_sessions, 2) if total_sessions else 0,
+            "avgChatsPerSession": round(total_chats / total_sessions, 2) if total_sessions else 0
+        })
+    return result
+
+def calculate_users_sessions(user_ids, session_gap_minutes=None, include_chats=False):
+    """
+    Calculate sessions for a batch of users with a constant number of queries
+
+    Sessions come from the precomputed `sessions` collection when it serves this gap
+    (default SESSION_GAP_MINUTES), otherwise from one sessionization aggregation over all
+    users. Categorizations are fetched once for the batch and matched in memory.
+    Returns {user_id: sessions payload}.
+    """
+    if session_gap_minutes is None:
+        session_gap_minutes = Config.SESSION_GAP_MINUTES
+    user_ids = [str(user_id) for user_id in user_ids]
+    categorizations = get_users_session_categorizations(user_ids)
+    results = {}
+
+    if session_store.is_current_for(session_gap_minutes):
+        rows_by_user = session_store.get_users_sessions(user_ids)
+        chats_by_session = session_store.attach_chats_for_users(rows_by_user) if include_chats else {}
+        for user_id in user_ids:
+            formatted_sessions = [
+                format_stored_session(row, categorizations[user_id], chats_by_session.get(row["_id"]) if include_chats else None)
+                for row in rows_by_user.get(user_id, [])
+            ]
+            results[user_id] = summarize_user_sessions(user_id, formatted_sessions, include_chats)
+        return results
+
+    # Sessionization runs in Mongo; only session boundaries and counts come back unless chats are requested
+    sessions_by_user = sessionize_users(user_ids, session_gap_minutes, include_chats)
+    for user_id in user_ids:
+        formatted_sessions = [
+            format_computed_session(session, categorizations[user_id], include_chats)
+            for session in sessions_by_user.get(user_id, [])
+        ]
+        results[user_id] = summarize_user_sessions(user_id, formatted_sessions, include_chats)
+    return results
+
+def calculate_user_sessions(user_id, session_gap_minutes=None):
+    """Calculate sessions for a specific user based on continuous chat activity"""
+    return calculate_users_sessions([user_id], session_gap_minutes)[str(user_id)]
+
+def calculate_user_sessions_with_chats(user_id, session_gap_minutes=None):
+    """Calculate sessions for a specific user with detailed chat information"""
+    return calculate_users_sessions([user_id], session_gap_minutes, include_chats=True)[str(user_id)]
 
 
 @user_analytics_bp.route('/sessions', methods=['GET'])
+@cached_response()
 def get_all_users_sessions():
 
     """
     API 1: Get all users with their session analysis
     Query params:
-    - session_gap: minutes between chats to consider new session (default: 30)
+    - session_gap: minutes between chats to consider new session (default: SESSION_GAP_MINUTES, 30)
     - user_id: specific user ID (optional)
     - include_chats: include detailed chat information in sessions (default: false)
     - limit: limit number of users returned (optional)
@@ -335,7 +292,7 @@ def get_all_users_sessions():
     """
     
     try:
-        session_gap = int(request.args.get('session_gap', 60))
+        session_gap = int(request.args.get('session_gap', Config.SESSION_GAP_MINUTES))
         specific_user_id = request.args.get('user_id')
         include_chats = request.args.get('include_chats', 'false').lower() == 'true'
         limit = request.args.get('limit')
@@ -398,14 +355,15 @@ def get_all_users_sessions():
         users = list(users_query)
         all_users_sessions = []
         
+        # Sessionize the whole page at once instead of querying per user and per session
+        sessions_by_user = calculate_users_sessions(
+            [str(user["_id"]) for user in users],
+            session_gap,
+            include_chats
+        )
+        
         for user in users:
-            user_id = str(user["_id"])
-            
-            # Use appropriate function based on include_chats parameter
-            if include_chats:
-                user_session_data = calculate_user_sessions_with_chats(user_id, session_gap)
-            else:
-                user_session_data = calculate_user_sessions(user_id, session_gap)
+            user_session_data = sessions_by_user[str(user["_id"])]
             
             # Add user info
             user_session_data.update({
@@ -447,34 +405,46 @@ def get_all_users_sessions():
 
 # Additional endpoint for getting detailed session information for a specific session
 @user_analytics_bp.route('/session-details', methods=['GET'])
+@cached_response()
 def get_session_details():
     """
     Get detailed information for a specific session
     Query params:
     - user_id: required
-    - session_id: session number (1-based index)
-    - session_gap: minutes between chats to consider new session (default: 30)
+    - session_id: stable session id, or session number (1-based index)
+    - session_gap: minutes between chats to consider new session (default: SESSION_GAP_MINUTES, 30)
     """
     
     try:
         user_id = request.args.get('user_id')
         session_id = request.args.get('session_id')
-        session_gap = int(request.args.get('session_gap', 30))
+        session_gap = int(request.args.get('session_gap', Config.SESSION_GAP_MINUTES))
         
         if not user_id or not session_id:
             return jsonify({"error": "user_id and session_id are required"}), 400
         
-        session_id = int(session_id)
-        
-        # Get user sessions with chats
-        user_session_data = calculate_user_sessions_with_chats(user_id, session_gap)
-        
-        # Find the specific session
         target_session = None
-        for session in user_session_data["sessions"]:
-            if session["sessionId"] == session_id:
-                target_session = session
-                break
+        
+        if ObjectId.is_valid(session_id):
+            # Stable id from the sessions collection: read just that row and its chats
+            row = session_store.get_session(session_id)
+            if row and row["userId"] == user_id:
+                target_session = format_stored_session(
+                    row,
+                    get_user_session_categorizations(user_id),
+                    session_store.get_session_chats(row)
+                )
+        else:
+            session_id = int(session_id)
+            
+            # Get user sessions with chats
+            user_session_data = calculate_user_sessions_with_chats(user_id, session_gap)
+            
+            # Find the specific session
+            for session in user_session_data["sessions"]:
+                if session["sessionId"] == session_id or session.get("sessionNumber") == session_id:
+                    target_session = session
+                    break
         
         if not target_session:
             return jsonify({"error": f"Session {session_id} not found for user {user_id}"}), 404
@@ -495,34 +465,44 @@ def get_session_details():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def get_user_activity_days(user_id, days_back=30):
-    """Get days when user was active (had chats)"""
+def get_users_activity_days(days_back=30, user_ids=None):
+    """
+    Get the days each user was active (had chats) with one aggregation
+
+    Returns {user_id: sorted list of dates}; chats are grouped by (user, day) in Mongo.
+    """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days_back)
     
-    # Get all chats for user in the date range
-    chats = db.chats.find({
-        "userId": user_id,
-        "timestamp": {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
-    })
-    
-    active_days = set()
-    for chat in chats:
-        chat_date = parse_timestamp(chat["timestamp"]).date()
-        active_days.add(chat_date)
+    match = timestamp_range_filter(start_date, end_date)
+    if user_ids is not None:
+        match["userId"] = {"$in": list(user_ids)}
     
-    return sorted(list(active_days))
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "userId": "$userId",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": timestamp_to_date()}}
+            }
+        }},
+        {"$match": {"_id.day": {"$ne": None}}},
+        {"$group": {"_id": "$_id.userId", "days": {"$addToSet": "$_id.day"}}}
+    ]
+    
+    activity_days = {}
+    for row in db.chats.aggregate(pipeline, allowDiskUse=True):
+        activity_days[row["_id"]] = sorted(
+            datetime.strptime(day, '%Y-%m-%d').date() for day in row["days"]
+        )
+    return activity_days
 
+def get_user_activity_days(user_id, days_back=30):
+    """Get days when user was active (had chats)"""
+    return get_users_activity_days(days_back, [user_id]).get(user_id, [])
 
-def categorize_user_activity(user_id):
-    """Categorize user as daily/weekly/monthly active"""
-    
-    # Get activity for last 30 days
-    active_days = get_user_activity_days(user_id, 30)
-    
+def categorize_activity_days(active_days):
+    """Categorize a list of active dates (last 30 days) as daily/weekly/monthly active"""
     if not active_days:
         return "inactive"
     
@@ -544,7 +524,14 @@ def categorize_user_activity(user_id):
     else:
         return "inactive"
 
+def categorize_user_activity(user_id):
+    """Categorize user as daily/weekly/monthly active"""
+    
+    # Get activity for last 30 days
+    return categorize_activity_days(get_user_activity_days(user_id, 30))
+
 @user_analytics_bp.route('/activity-analysis', methods=['GET'])
+@cached_response()
 def get_users_activity_analysis():
     """
     API 2: Get user activity analysis (Daily/Weekly/Monthly Active Users)
@@ -558,7 +545,24 @@ def get_users_activity_analysis():
         include_sessions = request.args.get('include_sessions', 'false').lower() == 'true'
         
         # Get all users
-        users = list(db.users.find())
+        users = list(db.users.find({}, {"userName": 1, "mobileNumber": 1, "age": 1, "gender": 1}))
+        
+        # Active days per user over the last 30 days, and all-time chat counts, each in one pass
+        if daily_stats.reads_enabled():
+            today = datetime.now().date()
+            activity_days = daily_stats.get_active_days(today - timedelta(days=30), today)
+            chat_counts = daily_stats.get_total_chats()
+        else:
+            activity_days = get_users_activity_days(30)
+            chat_counts = {
+                row["_id"]: row["count"]
+                for row in db.chats.aggregate([{"$group": {"_id": "$userId", "count": {"$sum": 1}}}], allowDiskUse=True)
+            }
+        week_start = (datetime.now() - timedelta(days=7)).date()
+        
+        sessions_by_user = {}
+        if include_sessions:
+            sessions_by_user = calculate_users_sessions([str(user["_id"]) for user in users])
         
         categorized_users = {
             "daily_active": [],
@@ -569,16 +573,10 @@ def get_users_activity_analysis():
         
         for user in users:
             user_id = str(user["_id"])
+            active_days = activity_days.get(user_id, [])
             
             # Get user activity category
-            activity_category = categorize_user_activity(user_id)
-            
-            # Get recent activity stats
-            active_days_7 = len(get_user_activity_days(user_id, 7))
-            active_days_30 = len(get_user_activity_days(user_id, 30))
-            
-            # Get total chats
-            total_chats = db.chats.count_documents({"userId": user_id})
+            activity_category = categorize_activity_days(active_days)
             
             user_data = {
                 "userId": user_id,
@@ -586,15 +584,15 @@ def get_users_activity_analysis():
                 "mobileNumber": user.get("mobileNumber"),
                 "age": user.get("age"),
                 "gender": user.get("gender"),
-                "totalChats": total_chats,
-                "activeDaysLast7": active_days_7,
-                "activeDaysLast30": active_days_30,
-                "lastActiveDay": max(get_user_activity_days(user_id, 30)) if get_user_activity_days(user_id, 30) else None
+                "totalChats": chat_counts.get(user_id, 0),
+                "activeDaysLast7": len([day for day in active_days if day >= week_start]),
+                "activeDaysLast30": len(active_days),
+                "lastActiveDay": active_days[-1] if active_days else None
             }
             
             # Include session data if requested
             if include_sessions:
-                session_data = calculate_user_sessions(user_id)
+                session_data = sessions_by_user[user_id]
                 user_data.update({
                     "totalSessions": session_data["totalSessions"],
                     "totalDurationMinutes": session_data["totalDurationMinutes"],
@@ -635,6 +633,7 @@ def get_users_activity_analysis():
         return jsonify({"error": str(e)}), 500
     
 @user_analytics_bp.route('/daily-stats', methods=['GET'])
+@cached_response(range_end=lambda args: parse_day(args.get('date')) or datetime.now().date())
 def get_daily_user_stats():
     """Get daily user statistics for specific dates"""
     
@@ -647,64 +646,69 @@ def get_daily_user_stats():
         start_time = datetime.combine(target_date, datetime.min.time())
         end_time = datetime.combine(target_date, datetime.max.time())
         
-        # Find all chats on this date
-        daily_chats = list(db.chats.find({
-            "timestamp": {
-                "$gte": start_time.isoformat(),
-                "$lte": end_time.isoformat()
-            }
-        }))
-        
-        # Get unique users who chatted on this date
-        active_user_ids = list(set(chat["userId"] for chat in daily_chats))
+        if daily_stats.reads_enabled():
+            per_user_stats = [
+                {
+                    "_id": row["userId"],
+                    "chatsToday": row["chatCount"],
+                    "firstChatTime": row["firstChatTime"],
+                    "lastChatTime": row["lastChatTime"]
+                }
+                for row in daily_stats.get_day(date_str)
+            ]
+        else:
+            # Count each user's chats of the day in Mongo instead of loading them. A day can
+            # mix string and date timestamps mid-migration, so compare them as dates
+            per_user_stats = list(db.chats.aggregate([
+                {"$match": timestamp_range_filter(start_time, end_time)},
+                {"$group": {
+                    "_id": "$userId",
+                    "chatsToday": {"$sum": 1},
+                    "firstChatTime": {"$min": timestamp_to_date()},
+                    "lastChatTime": {"$max": timestamp_to_date()}
+                }}
+            ], allowDiskUse=True))
+        
+        total_chats_today = sum(stats["chatsToday"] for stats in per_user_stats)
+        
+        # Get user details in one query
+        user_object_ids = [ObjectId(stats["_id"]) for stats in per_user_stats if ObjectId.is_valid(stats["_id"])]
+        users_by_id = {
+            str(user["_id"]): user
+            for user in db.users.find({"_id": {"$in": user_object_ids}}, {"userName": 1, "mobileNumber": 1})
+        }
         
-        # Get user details
         active_users = []
-        for user_id in active_user_ids:
-            user = db.users.find_one({"_id": ObjectId(user_id)})
+        for stats in per_user_stats:
+            user = users_by_id.get(stats["_id"])
             if user:
-                user_chats_today = [chat for chat in daily_chats if chat["userId"] == user_id]
-                
                 active_users.append({
-                    "userId": user_id,
+                    "userId": stats["_id"],
                     "userName": user.get("userName"),
                     "mobileNumber": user.get("mobileNumber"),
-                    "chatsToday": len(user_chats_today),
-                    "firstChatTime": min(chat["timestamp"] for chat in user_chats_today),
-                    "lastChatTime": max(chat["timestamp"] for chat in user_chats_today)
+                    "chatsToday": stats["chatsToday"],
+                    "firstChatTime": format_chat_timestamp(stats["firstChatTime"]),
+                    "lastChatTime": format_chat_timestamp(stats["lastChatTime"])
                 })
         
         return jsonify({
             "success": True,
             "date": date_str,
             "totalActiveUsers": len(active_users),
-            "totalChatsToday": len(daily_chats),
+            "totalChatsToday": total_chats_today,
             "activeUsers": sorted(active_users, key=lambda x: x["chatsToday"], reverse=True)
         })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def calculate_user_day_wise_analytics(user_id, start_date=None, end_date=None):
-    """Calculate day-wise analytics for a specific user"""
-    
-    # Set default date range if not provided
-    if not end_date:
-        end_date = datetime.now()
-    if not start_date:
-        start_date = end_date - timedelta(days=30)  # Default to last 30 days
-    
-    # Ensure start_date is before end_date
-    if start_date > end_date:
-        start_date, end_date = end_date, start_date
+def calculate_daily_data_from_chats(user_id, start_date, end_date):
+    """Group a user's chats in the date range by day, with session-based duration per day"""
     
     # Get all chats for the user in the date range
     chats = list(db.chats.find({
         "userId": user_id,
-        "timestamp": {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
+        **timestamp_range_filter(start_date, end_date)
     }).sort("timestamp", 1))
     
     # Group chats by day
@@ -727,15 +731,15 @@ def calculate_user_day_wise_analytics(user_id, start_date=None, end_date=None):
         # Initialize day data
         if daily_data[date_str]["date"] is None:
             daily_data[date_str]["date"] = date_str
-            daily_data[date_str]["firstChatTime"] = chat["timestamp"]
+            daily_data[date_str]["firstChatTime"] = format_chat_timestamp(chat["timestamp"])
         
         # Update day data
         daily_data[date_str]["chatCount"] += 1
-        daily_data[date_str]["lastChatTime"] = chat["timestamp"]
+        daily_data[date_str]["lastChatTime"] = format_chat_timestamp(chat["timestamp"])
         daily_data[date_str]["chats"].append({
             "chatId": str(chat["_id"]),
             "message": chat.get("message", ""),
-            "timestamp": chat["timestamp"],
+            "timestamp": format_chat_timestamp(chat["timestamp"]),
             "sender": chat.get("sender", "User")
         })
         
@@ -789,8 +793,44 @@ def calculate_user_day_wise_analytics(user_id, start_date=None, end_date=None):
         # Store session information for categorization
         day_data["sessions"] = sessions
     
+    return daily_data
+
+def calculate_daily_data_from_rollups(user_id, start_date, end_date):
+    """Read per-day stats of a user from the user_daily_stats rollup"""
+    return {
+        row["date"]: {
+            "date": row["date"],
+            "chatCount": row["chatCount"],
+            "durationMinutes": round(row.get("sessionMinutes", 0), 2),
+            "firstChatTime": row["firstChatTime"],
+            "lastChatTime": row["lastChatTime"],
+            "userMessages": row.get("userMessages", 0),
+            "botMessages": row.get("botMessages", 0)
+        }
+        for row in daily_stats.get_user_days(user_id, start_date.date(), end_date.date())
+    }
+
+def calculate_user_day_wise_analytics(user_id, start_date=None, end_date=None):
+    """Calculate day-wise analytics for a specific user"""
+    
+    # Set default date range if not provided
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)  # Default to last 30 days
+    
+    # Ensure start_date is before end_date
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    
+    # Per-day counts and durations come from the rollup when it is enabled
+    if daily_stats.reads_enabled():
+        daily_data = calculate_daily_data_from_rollups(user_id, start_date, end_date)
+    else:
+        daily_data = calculate_daily_data_from_chats(user_id, start_date, end_date)
+    
     # Get user's full session data for categorization mapping
-    user_session_data = calculate_user_sessions(user_id, 30)
+    user_session_data = calculate_user_sessions(user_id)
     
     # Convert to list and sort by date
     daily_analytics = []
@@ -866,10 +906,7 @@ def calculate_user_day_wise_analytics_with_chats(user_id, start_date=None, end_d
     # Get all chats for the user in the date range
     chats = list(db.chats.find({
         "userId": user_id,
-        "timestamp": {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
+        **timestamp_range_filter(start_date, end_date)
     }).sort("timestamp", 1))
     
     # Group chats by day
@@ -892,15 +929,15 @@ def calculate_user_day_wise_analytics_with_chats(user_id, start_date=None, end_d
         # Initialize day data
         if daily_data[date_str]["date"] is None:
             daily_data[date_str]["date"] = date_str
-            daily_data[date_str]["firstChatTime"] = chat["timestamp"]
+            daily_data[date_str]["firstChatTime"] = format_chat_timestamp(chat["timestamp"])
         
         # Update day data
         daily_data[date_str]["chatCount"] += 1
-        daily_data[date_str]["lastChatTime"] = chat["timestamp"]
+        daily_data[date_str]["lastChatTime"] = format_chat_timestamp(chat["timestamp"])
         daily_data[date_str]["chats"].append({
             "chatId": str(chat["_id"]),
             "message": chat.get("message", ""),
-            "timestamp": chat["timestamp"],
+            "timestamp": format_chat_timestamp(chat["timestamp"]),
             "sender": chat.get("sender", "User")
         })
         
@@ -955,7 +992,7 @@ def calculate_user_day_wise_analytics_with_chats(user_id, start_date=None, end_d
         day_data["sessions"] = sessions
     
     # Get user's full session data for categorization mapping
-    user_session_data = calculate_user_sessions(user_id, 30)
+    user_session_data = calculate_user_sessions(user_id)
     
     # Convert to list and sort by date
     daily_analytics = []
@@ -1008,6 +1045,7 @@ def calculate_user_day_wise_analytics_with_chats(user_id, start_date=None, end_d
     }
 
 @user_analytics_bp.route('/day-wise-analytics', methods=['GET'])
+@cached_response(range_end=lambda args: date_param_end('end_date')(args) if args.get('filter') == 'custom' else None)
 def get_user_day_wise_analytics():
     """
     Get day-wise analytics for a specific user with filtering options
@@ -1190,113 +1228,78 @@ def calculate_weekly_cohort_analytics(start_date=None, end_date=None, filter_mon
                 "registrationWeek": week_key
             })
     
+    # Stream every cohort user's chats once into a (user, week) activity matrix
+    end_week = get_week_start_date(end_date.date())
+    cohort_user_ids = [user["userId"] for cohort_users in weekly_cohorts.values() for user in cohort_users]
+    first_cohort_week = min(
+        (datetime.strptime(cohort_week, '%Y-%m-%d').date() for cohort_week in weekly_cohorts),
+        default=end_week
+    )
+    activity = load_weekly_activity(cohort_user_ids, first_cohort_week, end_week)
+    
     # Now calculate weekly progress for each cohort
     cohort_analytics = []
     
     for cohort_week, cohort_users in weekly_cohorts.items():
         cohort_week_date = datetime.strptime(cohort_week, '%Y-%m-%d').date()
         
-        # Calculate how many weeks to track from registration week to end_date
-        weeks_to_track = []
-        current_week = cohort_week_date
-        end_week = get_week_start_date(end_date.date())
+        # Weeks to track run from the registration week to end_date
+        first_column = activity.week_index(cohort_week_date)
+        last_column = activity.week_index(end_week)
+        rows = np.array([activity.user_index[user["userId"]] for user in cohort_users], dtype=np.int64)
+        
+        cohort_chats = activity.chats[rows, first_column:last_column + 1]
+        cohort_duration = activity.duration[rows, first_column:last_column + 1]
         
-        while current_week <= end_week:
-            weeks_to_track.append(current_week)
-            current_week += timedelta(days=7)
+        # Column-wise metrics for every tracked week at once
+        active_users_per_week = (cohort_chats > 0).sum(axis=0)
+        chats_per_week = cohort_chats.sum(axis=0)
+        duration_per_week = cohort_duration.sum(axis=0)
         
-        # Calculate analytics for each user in this cohort for each week
         cohort_weekly_data = []
         
-        for week_idx, week_start in enumerate(weeks_to_track):
+        for week_idx in range(cohort_chats.shape[1]):
+            week_start = cohort_week_date + timedelta(days=7 * week_idx)
             week_end = week_start + timedelta(days=6)
-            week_key = f"week_{week_idx + 1}"
             week_label = f"Week {week_idx + 1} ({week_start.strftime('%m/%d')} - {week_end.strftime('%m/%d')})"
             
+            active_users = int(active_users_per_week[week_idx])
+            total_chats = int(chats_per_week[week_idx])
+            total_duration = float(duration_per_week[week_idx])
+            
             week_data = {
                 "weekNumber": week_idx + 1,
                 "weekLabel": week_label,
                 "weekStart": week_start.strftime('%Y-%m-%d'),
                 "weekEnd": week_end.strftime('%Y-%m-%d'),
-                "activeUsers": 0,
-                "totalChats": 0,
-                "totalDurationMinutes": 0,
-                "avgChatsPerActiveUser": 0,
-                "avgDurationPerActiveUser": 0,
+                "activeUsers": active_users,
+                "totalChats": total_chats,
+                "totalDurationMinutes": round(total_duration, 2),
+                "avgChatsPerActiveUser": round(total_chats / active_users, 2) if active_users else 0,
+                "avgDurationPerActiveUser": round(total_duration / active_users, 2) if active_users else 0,
                 "userDetails": []
             }
             
-            # Calculate metrics for each user in this cohort for this specific week
-            for user in cohort_users:
-                user_id = user["userId"]
-                
-                # Get chats for this user in this specific week
-                week_chats = list(db.chats.find({
-                    "userId": user_id,
-                    "timestamp": {
-                        "$gte": datetime.combine(week_start, datetime.min.time()).isoformat(),
-                        "$lte": datetime.combine(week_end, datetime.max.time()).isoformat()
-                    }
-                }).sort("timestamp", 1))
-                
-                if week_chats:
-                    week_data["activeUsers"] += 1
-                    week_data["totalChats"] += len(week_chats)
-                    
-                    # Calculate session duration for this week
-                    session_duration = 0
-                    if len(week_chats) > 1:
-                        # Group chats into sessions
-                        session_gap_seconds = 30 * 60  # 30 minutes
-                        sessions = []
-                        current_session = [week_chats[0]]
-                        
-                        for i in range(1, len(week_chats)):
-                            current_chat_time = parse_timestamp(week_chats[i]["timestamp"])
-                            prev_chat_time = parse_timestamp(week_chats[i-1]["timestamp"])
-                            time_gap = (current_chat_time - prev_chat_time).total_seconds()
-                            
-                            if time_gap <= session_gap_seconds:
-                                current_session.append(week_chats[i])
-                            else:
-                                sessions.append(current_session)
-                                current_session = [week_chats[i]]
-                        
-                        if current_session:
-                            sessions.append(current_session)
-                        
-                        # Calculate total duration from all sessions
-                        for session in sessions:
-                            if len(session) > 1:
-                                session_start = parse_timestamp(session[0]["timestamp"])
-                                session_end = parse_timestamp(session[-1]["timestamp"])
-                                session_duration += (session_end - session_start).total_seconds() / 60
-                    
-                    week_data["totalDurationMinutes"] += session_duration
-                    
-                    # Add user details for this week
-                    week_data["userDetails"].append({
-                        "userId": user_id,
-                        "userName": user["userName"],
-                        "chatsThisWeek": len(week_chats),
-                        "durationThisWeek": round(session_duration, 2),
-                        "firstChatThisWeek": week_chats[0]["timestamp"] if week_chats else None,
-                        "lastChatThisWeek": week_chats[-1]["timestamp"] if week_chats else None
-                    })
-            
-            # Calculate averages
-            if week_data["activeUsers"] > 0:
-                week_data["avgChatsPerActiveUser"] = round(week_data["totalChats"] / week_data["activeUsers"], 2)
-                week_data["avgDurationPerActiveUser"] = round(week_data["totalDurationMinutes"] / week_data["activeUsers"], 2)
+            column = first_column + week_idx
+            for user_position in np.flatnonzero(cohort_chats[:, week_idx]).tolist():
+                user = cohort_users[user_position]
+                key = (int(rows[user_position]), column)
+                week_data["userDetails"].append({
+                    "userId": user["userId"],
+                    "userName": user["userName"],
+                    "chatsThisWeek": int(cohort_chats[user_position, week_idx]),
+                    "durationThisWeek": round(float(cohort_duration[user_position, week_idx]), 2),
+                    "firstChatThisWeek": activity.first_chat.get(key),
+                    "lastChatThisWeek": activity.last_chat.get(key)
+                })
             
-            week_data["totalDurationMinutes"] = round(week_data["totalDurationMinutes"], 2)
             cohort_weekly_data.append(week_data)
         
         # Calculate cohort summary statistics
         total_users_in_cohort = len(cohort_users)
-        max_active_users = max([week["activeUsers"] for week in cohort_weekly_data]) if cohort_weekly_data else 0
-        total_chats_all_weeks = sum([week["totalChats"] for week in cohort_weekly_data])
-        total_duration_all_weeks = sum([week["totalDurationMinutes"] for week in cohort_weekly_data])
+        max_active_users = int(active_users_per_week.max()) if active_users_per_week.size else 0
+        total_chats_all_weeks = int(chats_per_week.sum())
+        total_duration_all_weeks = float(duration_per_week.sum())
         
         cohort_analytics.append({
             "cohortWeek": cohort_week,
@@ -1326,6 +1329,7 @@ def calculate_weekly_cohort_analytics(start_date=None, end_date=None, filter_mon
 
 
 @user_analytics_bp.route('/weekly-cohort-analytics', methods=['GET'])
+@cached_response(range_end=lambda args: date_param_end('filter_month')(args) if args.get('filter_month') else date_param_end('end_date')(args))
 def get_weekly_cohort_analytics():
     """
     API: Get weekly cohort analytics showing user progress over time
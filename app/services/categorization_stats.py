@@ -0,0 +1,192 @@
+# app/services/categorization_stats.py
+"""
+Categorization statistics computed by MongoDB aggregation
+
+Sessions are unwound and grouped per (user, category) on the server, so only per-user
+counts and scores (and, for the global view, the final rankings) come back instead of
+whole categorization documents.
+"""
+from typing import List, Optional
+
+from app.services.db import db
+
+HIGH_DISTRESS_THRESHOLD = 30
+RANKING_SIZE = 20
+TOP_DISTRESSED_USERS = 10
+
+
+def _percentage(part, whole) -> dict:
+    return {"$round": [{"$multiply": [{"$divide": [part, whole]}, 100]}, 2]}
+
+
+def _scores_by_name(field: str) -> dict:
+    """{name: score} object from a [{name, count, score}] array"""
+    return {"$arrayToObject": {"$map": {"input": f"${field}", "in": {"k": "$$this.name", "v": "$$this.score"}}}}
+
+
+def _page_stages(skip: int, limit: int) -> List[dict]:
+    return [{"$sort": {"_id": 1}}, {"$skip": skip}, {"$limit": limit}]
+
+
+def user_breakdown_stages() -> List[dict]:
+    """
+    Stages turning categorization documents into one summary per user with sessions
+
+    Output fields: user_id, user_name, processed_at, total_sessions, total_chats,
+    categories and sub_categories ([{name, count, score}], most common first, sub-categories
+    without "N/A"), emotional_distress_count, emotional_distress_score, majority_category
+    and majority_subcategory.
+    """
+    is_category = {"$eq": ["$_id.kind", "category"]}
+    return [
+        {"$project": {
+            "user_id": 1, "user_name": 1, "processed_at": 1,
+            "sessions.primary_category": 1, "sessions.sub_category": 1, "sessions.chat_count": 1
+        }},
+        {"$unwind": "$sessions"},
+        # Each session counts once for its category and once for its sub-category
+        {"$project": {
+            "user_id": 1, "user_name": 1, "processed_at": 1,
+            "chats": {"$ifNull": ["$sessions.chat_count", 0]},
+            "labels": [
+                {"kind": "category", "name": {"$ifNull": ["$sessions.primary_category", "Other"]}},
+                {"kind": "sub_category", "name": {"$ifNull": ["$sessions.sub_category", "N/A"]}},
+            ]
+        }},
+        {"$unwind": "$labels"},
+        {"$match": {"$or": [{"labels.kind": "category"}, {"labels.name": {"$nin": ["N/A", ""]}}]}},
+        {"$group": {
+            "_id": {"doc": "$_id", "kind": "$labels.kind", "name": "$labels.name"},
+            "user_id": {"$first": "$user_id"},
+            "user_name": {"$first": "$user_name"},
+            "processed_at": {"$first": "$processed_at"},
+            "count": {"$sum": 1},
+            "chats": {"$sum": "$chats"}
+        }},
+        {"$sort": {"_id.doc": 1, "count": -1, "_id.name": 1}},
+        {"$group": {
+            "_id": "$_id.doc",
+            "user_id": {"$first": "$user_id"},
+            "user_name": {"$first": "$user_name"},
+            "processed_at": {"$first": "$processed_at"},
+            "total_sessions": {"$sum": {"$cond": [is_category, "$count", 0]}},
+            "total_chats": {"$sum": {"$cond": [is_category, "$chats", 0]}},
+            "emotional_distress_count": {"$sum": {"$cond": [
+                {"$and": [is_category, {"$eq": ["$_id.name", "Emotional Distress"]}]}, "$count", 0
+            ]}},
+            "labels": {"$push": {"kind": "$_id.kind", "name": "$_id.name", "count": "$count"}}
+        }},
+        {"$project": {
+            "_id": 0, "user_id": 1, "user_name": 1, "processed_at": 1,
+            "total_sessions": 1, "total_chats": 1, "emotional_distress_count": 1,
+            "categories": {"$map": {
+                "input": {"$filter": {"input": "$labels", "cond": {"$eq": ["$$this.kind", "category"]}}},
+                "in": {"name": "$$this.name", "count": "$$this.count", "score": _percentage("$$this.count", "$total_sessions")}
+            }},
+            "sub_categories": {"$map": {
+                "input": {"$filter": {"input": "$labels", "cond": {"$eq": ["$$this.kind", "sub_category"]}}},
+                "in": {"name": "$$this.name", "count": "$$this.count", "score": _percentage("$$this.count", "$total_sessions")}
+            }}
+        }},
+        {"$addFields": {
+            "emotional_distress_score": _percentage("$emotional_distress_count", "$total_sessions"),
+            "majority_category": {"$ifNull": [{"$arrayElemAt": ["$categories.name", 0]}, "Other"]},
+            "majority_subcategory": {"$ifNull": [{"$arrayElemAt": ["$sub_categories.name", 0]}, "N/A"]}
+        }},
+    ]
+
+
+def user_categorization_stats(user_id: str) -> Optional[dict]:
+    """Summary of one user's sessions (None if the user has no categorized sessions)"""
+    results = list(db.categorizations.aggregate([{"$match": {"user_id": user_id}}, *user_breakdown_stages()]))
+    return results[0] if results else None
+
+
+def users_categorization_stats(skip: int, limit: int) -> List[dict]:
+    """Score summaries for a page of categorization documents, highest emotional distress first"""
+    return list(db.categorizations.aggregate([
+        *_page_stages(skip, limit),
+        *user_breakdown_stages(),
+        {"$sort": {"emotional_distress_score": -1, "user_id": 1}},
+        {"$project": {
+            "user_id": 1,
+            "total_sessions": 1,
+            "processed_at": 1,
+            "primary_category_scores": _scores_by_name("categories"),
+            "sub_category_scores": _scores_by_name("sub_categories"),
+            "most_common_category": {"$arrayElemAt": ["$categories.name", 0]},
+            "emotional_distress_score": 1
+        }},
+    ]))
+
+
+def global_categorization_stats(skip: int, limit: int) -> dict:
+    """
+    Global counts and rankings over a page of categorization documents
+
+    Users are counted once, under their majority category and sub-category. Returns
+    documents (in the page), summary, primary_categories / sub_categories ([{_id, count}]),
+    high_distress_users, top_distressed_users and the by_* rankings.
+    """
+    documents = max(0, min(limit, db.categorizations.count_documents({}) - skip))
+
+    def ranking(sort_field: str) -> List[dict]:
+        return [{"$sort": {sort_field: -1, "user_id": 1}}, {"$limit": RANKING_SIZE}]
+
+    user_stat_projection = {"$project": {
+        "user_id": 1,
+        "user_name": {"$ifNull": ["$user_name", "Unknown"]},
+        "total_sessions": 1,
+        "total_chats": 1,
+        "category_percentages": _scores_by_name("categories"),
+        "subcategory_percentages": _scores_by_name("sub_categories"),
+        "emotional_distress_percentage": "$emotional_distress_score",
+        "majority_category": 1,
+        "majority_subcategory": 1,
+        "most_common_category": "$majority_category",  # Keep for backward compatibility
+        "most_common_subcategory": "$majority_subcategory"  # Keep for backward compatibility
+    }}
+    high_distress = {"$match": {"emotional_distress_percentage": {"$gt": HIGH_DISTRESS_THRESHOLD}}}
+
+    result = next(db.categorizations.aggregate([
+        *_page_stages(skip, limit),
+        *user_breakdown_stages(),
+        user_stat_projection,
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": None,
+                "users": {"$sum": 1},
+                "total_sessions": {"$sum": "$total_sessions"},
+                "total_chats": {"$sum": "$total_chats"},
+                "avg_emotional_distress_percentage": {"$avg": "$emotional_distress_percentage"}
+            }}],
+            "primary_categories": [
+                {"$group": {"_id": "$majority_category", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "sub_categories": [
+                {"$match": {"majority_subcategory": {"$ne": "N/A"}}},
+                {"$group": {"_id": "$majority_subcategory", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "high_distress_users": [high_distress, {"$count": "count"}],
+            "top_distressed_users": [
+                high_distress,
+                {"$sort": {"emotional_distress_percentage": -1, "user_id": 1}},
+                {"$limit": TOP_DISTRESSED_USERS},
+                {"$project": {"user_id": 1, "user_name": 1, "emotional_distress_percentage": 1, "total_sessions": 1}},
+            ],
+            "by_emotional_distress": ranking("emotional_distress_percentage"),
+            "by_session_count": ranking("total_sessions"),
+            "by_chat_count": ranking("total_chats"),
+        }},
+    ]), {})
+
+    summary = (result.get("summary") or [{}])[0]
+    high_distress_users = result.get("high_distress_users") or [{}]
+    return {
+        **result,
+        "documents": documents,
+        "summary": summary,
+        "high_distress_users": high_distress_users[0].get("count", 0)
+    }
@@ -1,6 +1,7 @@
+import threading
 import traceback
 from bson import ObjectId
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from app.services.db import db
 from app.memory.memory_service import MemoryService
@@ -8,7 +9,8 @@ from app.utility.image_service import ImageService
 from app.system_prompt.prompt_service import PromptService
 from app.utility.token_service import TokenService
 from app.services.gemini import GeminiService
-from app.utility.claude_reply import fetch_recent_chats
+from app.utility.claude_reply import fetch_recent_chat_lines, fetch_unanswered_user_messages, last_user_message, RECENT_CHATS_LIMIT
+from app.utility.context_cache import context_cache
 from app.socket.controller.chat_controller import save_ai_message
 
 class ChatService:
@@ -34,6 +36,96 @@ class ChatService:
             print(f"❌ Failed to fetch user: {e}")
             return None
     
+    def _get_user(self, user_id: str, character_id: str) -> Optional[Dict]:
+        """Fetch user, preferring the per-conversation context cache"""
+        user = context_cache.get(user_id, character_id, "user")
+        if user is None:
+            user = self._get_user_from_db(user_id)
+            if user is not None:
+                context_cache.set(user_id, character_id, "user", user)
+        return user
+    
+    def _get_system_prompt(self, user_id: str, character_id: str, character_name: str, user: Optional[Dict]) -> str:
+        """Load the compiled (user-specific) system prompt, preferring the context cache"""
+        cache_key = f"system_prompt:{character_name.lower()}"
+        system_prompt = context_cache.get(user_id, character_id, cache_key)
+        if system_prompt is None:
+            system_prompt = self.prompt_service.load_system_prompt(character_name, user)
+            context_cache.set(user_id, character_id, cache_key, system_prompt)
+        return system_prompt
+    
+    def _get_recent_chat_lines(self, user_id: str, character_id: str) -> List[str]:
+        """Fetch the recent chat window, preferring the context cache (kept current on every chat insert)"""
+        recent_lines = context_cache.get(user_id, character_id, "recent_chats")
+        if recent_lines is None:
+            recent_lines = fetch_recent_chat_lines(user_id, character_id, limit=RECENT_CHATS_LIMIT)
+            context_cache.set(user_id, character_id, "recent_chats", recent_lines)
+        return recent_lines
+    
+    def _get_recent_chats(self, user_id: str, character_id: str) -> str:
+        """The recent chat window as prompt text"""
+        try:
+            recent_lines = self._get_recent_chat_lines(user_id, character_id)
+        except Exception as e:
+            print(f"Error fetching recent chats: {e}")
+            return "Error retrieving chat history."
+        return "\n".join(recent_lines) if recent_lines else "No previous messages found."
+    
+    def _search_memories(self, user_id: str, character_id: str, message: str) -> str:
+        return self.memory_service.search_relevant_memories(user_id, character_id, message, limit=15)
+    
+    def _get_relevant_memories(self, user_id: str, character_id: str, prompt: str) -> str:
+        """Memory search for the prompt, reusing a prefetched search made for the same message"""
+        prefetched = context_cache.get(user_id, character_id, "memories")
+        if prefetched is not None:
+            # One use only: the reply adds memories, so a later identical message searches again
+            context_cache.invalidate(user_id, character_id, "memories")
+            query, memories = prefetched
+            if query == prompt.strip():
+                print("⚡ Using prefetched memory search")
+                return memories
+        return self._search_memories(user_id, character_id, prompt)
+    
+    def _turn_user_messages(self, user_id: str, character_id: str, prompt: str) -> List[str]:
+        """User messages a reply answers: all those sent since the last AI reply, and the prompt"""
+        try:
+            messages = fetch_unanswered_user_messages(user_id, character_id)
+        except Exception as e:
+            print(f"⚠️ Failed to fetch unanswered messages: {e}")
+            messages = []
+        if prompt and prompt.strip() not in messages:
+            messages.append(prompt.strip())
+        return messages
+    
+    def prefetch_context(
+        self, 
+        user_id: str, 
+        character_id: str, 
+        character_name: Optional[str] = None
+    ) -> None:
+        """
+        Warm the per-conversation caches so the first reply of a session is not built cold
+
+        Besides the user, system prompt and recent chats, runs the memory search for the
+        newest user message in the recent window. get_claude_reply uses it when that is the
+        message it answers, e.g. one sent just before the app was closed or resent on reconnect.
+        """
+        try:
+            user = self._get_user(user_id, character_id)
+            if character_name:
+                self._get_system_prompt(user_id, character_id, character_name, user)
+            message = last_user_message(self._get_recent_chat_lines(user_id, character_id))
+            if message:
+                context_cache.set(
+                    user_id,
+                    character_id,
+                    "memories",
+                    (message.strip(), self._search_memories(user_id, character_id, message))
+                )
+            print(f"🔥 Context prefetched for user {user_id} / character {character_id}")
+        except Exception as e:
+            print(f"⚠️ Context prefetch failed: {e}")
+    
     def get_claude_reply(
         self, 
         prompt: str, 
@@ -44,21 +136,24 @@ class ChatService:
     ) -> Dict:
         """Main method to get AI reply with memory integration"""
         
+        turn_memorized = False
+        turn_user_messages = [prompt]
         try:
+            # Read before the reply is saved, while these messages are still unanswered
+            turn_user_messages = self._turn_user_messages(user_id, character_id, prompt)
+            
             print(f"🚀 Starting chat for user {user_id} with character {character_name}")
             
             # --- Fetch user ---
-            user = self._get_user_from_db(user_id)
+            user = self._get_user(user_id, character_id)
             print(f"✅ User fetched: {user.get('userName', 'Unknown') if user else 'Not found'}")
             
             # --- Load system prompt ---
-            system_prompt = self.prompt_service.load_system_prompt(character_name, user)
+            system_prompt = self._get_system_prompt(user_id, character_id, character_name, user)
             print(f"✅ System prompt loaded for character: {character_name}")
             
             # --- STEP 1: Search for relevant memories (no summary, only relevant context) ---
-            relevant_memories = self.memory_service.search_relevant_memories(
-                user_id, character_id, prompt, limit=15
-            )
+            relevant_memories = self._get_relevant_memories(user_id, character_id, prompt)
             print(f"🔍 Memory search completed")
             
             # Log the memory context that will be fed to LLM
@@ -71,7 +166,7 @@ class ChatService:
             print("=" * 80)
             
             # --- STEP 3: Fetch recent chats (limited to 20) ---
-            recent_chats_text = fetch_recent_chats(user_id, character_id, limit=20)
+            recent_chats_text = self._get_recent_chats(user_id, character_id)
             print(f"📝 Recent chats fetched (limit: 20)")
             
             # --- STEP 4: Create timestamp info for context ---
@@ -189,13 +284,10 @@ class ChatService:
             # --- Process AI reply ---
             ai_tokens = self.token_service.safe_token_count(ai_reply)
             
-            # --- STEP 4: Add AI response to memory ---
-            self.memory_service.add_message_to_memory(user_id, character_id, ai_reply, "AI")
-            print(f"💾 AI response added to memory")
-            
-            # --- STEP 5: Update memory with conversation context ---
-            self.memory_service.update_memory_from_conversation(user_id, character_id, prompt, ai_reply)
-            print(f"🔄 Memory updated with conversation context")
+            # --- STEP 4: Write the whole turn (user messages + AI) to memory in one add ---
+            self.memory_service.add_conversation_turn(user_id, character_id, turn_user_messages, ai_reply)
+            turn_memorized = True
+            print(f"💾 Conversation turn added to memory")
             
             # --- Save AI message ---
             ai_message_data = save_ai_message(user_id, character_id, ai_reply)
@@ -237,7 +329,11 @@ class ChatService:
             detailed_error = f"{error_message}\n\nError: {str(e)}"
             
             print(f"❌ Error in chat processing: {str(e)}")
-            
+
+            # The user message is only memorized as part of a turn, so keep it even without a reply
+            if not turn_memorized:
+                self.memory_service.add_conversation_turn(user_id, character_id, turn_user_messages)
+
             error_message_data = save_ai_message(user_id, character_id, error_message)
             
             return {
@@ -250,6 +346,21 @@ class ChatService:
             }
 
 
+_chat_service: Optional[ChatService] = None
+_chat_service_lock = threading.Lock()
+
+
+def get_chat_service() -> ChatService:
+    """Return the shared ChatService so Mem0 and Gemini clients are initialized once per process"""
+    global _chat_service
+    if _chat_service is None:
+        # Socket handlers call this from several threads; only one may build the clients
+        with _chat_service_lock:
+            if _chat_service is None:
+                _chat_service = ChatService()
+    return _chat_service
+
+
 # Factory function to maintain backward compatibility
 def get_claude_reply(
     prompt: str, 
@@ -259,5 +370,14 @@ def get_claude_reply(
     image_url: Optional[str] = None
 ) -> Dict:
     """Factory function to maintain backward compatibility with existing code"""
-    chat_service = ChatService()
-    return chat_service.get_claude_reply(prompt, user_id, character_name, character_id, image_url)
\ No newline at end of file
+    chat_service = get_chat_service()
+    return chat_service.get_claude_reply(prompt, user_id, character_name, character_id, image_url)
+
+
+def prefetch_conversation_context(
+    user_id: str, 
+    character_id: str, 
+    character_name: Optional[str] = None
+) -> None:
+    """Warm reply context for a conversation (run in the background when a chat is opened)"""
+    get_chat_service().prefetch_context(str(user_id), str(character_id), character_name)
\ No newline at end of file
@@ -0,0 +1,141 @@
+# app/services/cohort_analytics.py
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import Config
+from app.services.daily_stats import daily_stats
+from app.services.db import db
+from app.utility.timestamps import format_chat_timestamp, parse_chat_timestamp, timestamp_range_filter
+
+SECONDS_PER_WEEK = 7 * 24 * 60 * 60
+
+
+class WeeklyActivityMatrix:
+    """
+    Per-user, per-week chat activity for a set of users, built from one pass over chats
+
+    `chats[u, w]` and `duration[u, w]` hold the chat count and session minutes of user u
+    in week w (week 0 starts on `first_week`). Session minutes follow the analytics
+    convention: chats of the same user and week are in one session while the gap between
+    consecutive chats is at most `session_gap_minutes`, and a session lasts from its first
+    to its last chat.
+
+    `load_from_rollups` fills the same matrices from `user_daily_stats` instead, where
+    session minutes are summed per day, so a session running past midnight loses its gaps
+    across midnight.
+    """
+
+    def __init__(self, user_ids: List[str], first_week: date, last_week: date, session_gap_minutes: int = 30):
+        self.user_ids = list(user_ids)
+        self.user_index = {user_id: idx for idx, user_id in enumerate(self.user_ids)}
+        self.first_week = first_week
+        self.week_count = (last_week - first_week).days // 7 + 1
+        self.session_gap_seconds = session_gap_minutes * 60
+
+        shape = (len(self.user_ids), max(self.week_count, 0))
+        self.chats = np.zeros(shape, dtype=np.int64)
+        self.duration = np.zeros(shape, dtype=np.float64)
+        self.first_chat: Dict[tuple, str] = {}
+        self.last_chat: Dict[tuple, str] = {}
+
+    def week_index(self, week_start: date) -> int:
+        return (week_start - self.first_week).days // 7
+
+    def load(self) -> "WeeklyActivityMatrix":
+        """Stream the users' chats in the tracked weeks once and fill the matrices"""
+        if not self.user_ids or self.week_count <= 0:
+            return self
+
+        origin = datetime.combine(self.first_week, datetime.min.time())
+        range_end = origin + timedelta(weeks=self.week_count)
+
+        cursor = db.chats.find(
+            {
+                "userId": {"$in": self.user_ids},
+                **timestamp_range_filter(origin, range_end, end_inclusive=False),
+            },
+            {"_id": 0, "userId": 1, "timestamp": 1}
+        ).sort([("userId", 1), ("timestamp", 1)])
+
+        user_rows, offsets, raw_timestamps = [], [], []
+        for chat in cursor:
+            chat_time = parse_chat_timestamp(chat.get("timestamp"))
+            if chat_time is None:
+                continue
+            user_rows.append(self.user_index[chat["userId"]])
+            offsets.append((chat_time - origin).total_seconds())
+            raw_timestamps.append(format_chat_timestamp(chat["timestamp"]))
+
+        if not user_rows:
+            return self
+
+        users = np.asarray(user_rows, dtype=np.int64)
+        seconds = np.asarray(offsets, dtype=np.float64)
+        weeks = np.floor_divide(seconds, SECONDS_PER_WEEK).astype(np.int64)
+
+        np.add.at(self.chats, (users, weeks), 1)
+
+        # A chat continues the previous chat's session if both belong to the same user and
+        # week and the gap is within the threshold; session minutes are the sum of those gaps
+        gaps = np.diff(seconds)
+        continues = (users[1:] == users[:-1]) & (weeks[1:] == weeks[:-1]) & (gaps <= self.session_gap_seconds)
+        np.add.at(self.duration, (users[1:], weeks[1:]), np.where(continues, gaps, 0.0) / 60)
+
+        # Chats are sorted by (user, time), so bucket boundaries give first/last chat per week
+        bucket = users * self.week_count + weeks
+        boundaries = np.flatnonzero(np.diff(bucket)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(bucket)])) - 1
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            key = (int(users[start]), int(weeks[start]))
+            self.first_chat[key] = raw_timestamps[start]
+            self.last_chat[key] = raw_timestamps[end]
+
+        return self
+
+    def load_from_rollups(self) -> "WeeklyActivityMatrix":
+        """Fill the matrices from the users' daily rollup rows in the tracked weeks"""
+        if not self.user_ids or self.week_count <= 0:
+            return self
+
+        last_day = self.first_week + timedelta(weeks=self.week_count) - timedelta(days=1)
+        cursor = db.user_daily_stats.find(
+            {
+                "userId": {"$in": self.user_ids},
+                "date": {"$gte": self.first_week.strftime('%Y-%m-%d'), "$lte": last_day.strftime('%Y-%m-%d')},
+            },
+            {"_id": 0, "userId": 1, "date": 1, "chatCount": 1, "sessionMinutes": 1, "firstChatTime": 1, "lastChatTime": 1}
+        ).sort([("userId", 1), ("date", 1)])
+
+        for row in cursor:
+            day = datetime.strptime(row["date"], '%Y-%m-%d').date()
+            key = (self.user_index[row["userId"]], self.week_index(day))
+            self.chats[key] += row["chatCount"]
+            self.duration[key] += row.get("sessionMinutes", 0)
+            # Rows are in date order, so the first row of a week holds its first chat
+            self.first_chat.setdefault(key, row["firstChatTime"])
+            self.last_chat[key] = row["lastChatTime"]
+
+        return self
+
+
+def load_weekly_activity(
+    user_ids: List[str],
+    first_week: date,
+    last_week: date,
+    session_gap_minutes: Optional[int] = None
+) -> WeeklyActivityMatrix:
+    """
+    Build the weekly activity matrix for the given users and weeks (inclusive Monday dates)
+
+    Reads the daily rollups when DAILY_STATS_ROLLUP_READS_ENABLED is on and they are kept
+    for this session gap (default SESSION_GAP_MINUTES), otherwise scans chats.
+    """
+    if session_gap_minutes is None:
+        session_gap_minutes = Config.SESSION_GAP_MINUTES
+    matrix = WeeklyActivityMatrix(user_ids, first_week, last_week, session_gap_minutes)
+    if daily_stats.reads_enabled() and session_gap_minutes == daily_stats.gap_minutes:
+        return matrix.load_from_rollups()
+    return matrix.load()
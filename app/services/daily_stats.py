@@ -0,0 +1,218 @@
+# app/services/daily_stats.py
+import traceback
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from pymongo import ReplaceOne
+
+from app.config import Config
+from app.services.db import db
+from app.services.sessionization import timestamp_to_date
+from app.utility.timestamps import format_chat_timestamp, parse_chat_timestamp, timestamp_range_filter
+
+
+def _day_key(user_id: str, day: str) -> str:
+    return f"{user_id}:{day}"
+
+
+class DailyStatsRollup:
+    """
+    Incrementally maintained `user_daily_stats` collection
+
+    One row per (user, day) with chat count, user/bot message counts, first and last chat
+    times and session minutes (sum of gaps of at most SESSION_GAP_MINUTES between
+    consecutive chats of the day), matching the day-wise analytics.
+    """
+
+    def __init__(self, gap_minutes: Optional[int] = None):
+        self.gap_minutes = Config.SESSION_GAP_MINUTES if gap_minutes is None else gap_minutes
+        self.collection = db.user_daily_stats
+
+    def record_chat(self, user_id: str, timestamp: Union[str, datetime], sender: Optional[str] = None) -> None:
+        """Fold a newly inserted chat into its (user, day) row"""
+        try:
+            chat_time = parse_chat_timestamp(timestamp)
+            raw_timestamp = format_chat_timestamp(timestamp)
+            day = chat_time.strftime('%Y-%m-%d')
+            is_user = (sender or "User").lower() == "user"
+            gap_ms = self.gap_minutes * 60 * 1000
+            since_last = {"$subtract": [chat_time, "$lastChatAt"]}
+
+            # Single pipeline update so concurrent inserts for the same day stay consistent.
+            # Chats arriving out of order still count, but only in-order gaps add session minutes.
+            self.collection.update_one(
+                {"_id": _day_key(user_id, day)},
+                [{"$set": {
+                    "userId": str(user_id),
+                    "date": day,
+                    "chatCount": {"$add": [{"$ifNull": ["$chatCount", 0]}, 1]},
+                    "userMessages": {"$add": [{"$ifNull": ["$userMessages", 0]}, int(is_user)]},
+                    "botMessages": {"$add": [{"$ifNull": ["$botMessages", 0]}, int(not is_user)]},
+                    "sessionMinutes": {"$add": [
+                        {"$ifNull": ["$sessionMinutes", 0]},
+                        {"$cond": [
+                            {"$and": [
+                                {"$ne": [{"$ifNull": ["$lastChatAt", None]}, None]},
+                                {"$gte": [since_last, 0]},
+                                {"$lte": [since_last, gap_ms]},
+                            ]},
+                            {"$divide": [since_last, 60000]},
+                            0,
+                        ]},
+                    ]},
+                    "firstChatTime": {"$cond": [
+                        {"$or": [{"$eq": [{"$ifNull": ["$firstChatAt", None]}, None]}, {"$lt": [chat_time, "$firstChatAt"]}]},
+                        raw_timestamp,
+                        "$firstChatTime",
+                    ]},
+                    "lastChatTime": {"$cond": [
+                        {"$or": [{"$eq": [{"$ifNull": ["$lastChatAt", None]}, None]}, {"$gte": [chat_time, "$lastChatAt"]}]},
+                        raw_timestamp,
+                        "$lastChatTime",
+                    ]},
+                    "firstChatAt": {"$min": ["$firstChatAt", chat_time]},
+                    "lastChatAt": {"$max": ["$lastChatAt", chat_time]},
+                    "updatedAt": datetime.utcnow(),
+                }}],
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to update daily stats for user {user_id}: {e}")
+            traceback.print_exc()
+
+    def rebuild_range(
+        self,
+        start_date: date,
+        end_date: date,
+        user_id: Optional[str] = None,
+        chunk_days: int = 7
+    ) -> int:
+        """
+        Recompute rows for days in [start_date, end_date] from chats
+
+        Used for the initial backfill and to repair a range (late or deleted chats).
+        Works through the range `chunk_days` at a time to keep each write batch small.
+        Returns the number of (user, day) rows written.
+        """
+        written = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            written += self._rebuild_chunk(chunk_start, chunk_end, user_id)
+            chunk_start = chunk_end + timedelta(days=1)
+        return written
+
+    def _rebuild_chunk(self, start_date: date, end_date: date, user_id: Optional[str] = None) -> int:
+        start_time = datetime.combine(start_date, datetime.min.time())
+        end_time = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        gap_ms = self.gap_minutes * 60 * 1000
+
+        match = timestamp_range_filter(start_time, end_time, end_inclusive=False)
+        if user_id:
+            match["userId"] = str(user_id)
+
+        pipeline = [
+            {"$match": match},
+            {"$project": {"userId": 1, "sender": 1, "timestamp": 1, "ts": timestamp_to_date()}},
+            {"$match": {"ts": {"$ne": None}}},
+            {"$set": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ts"}}}},
+            {"$setWindowFields": {
+                "partitionBy": {"userId": "$userId", "day": "$day"},
+                "sortBy": {"ts": 1},
+                "output": {"prevTs": {"$shift": {"output": "$ts", "by": -1}}},
+            }},
+            {"$set": {"gapMs": {"$cond": [
+                {"$and": [
+                    {"$ne": ["$prevTs", None]},
+                    {"$lte": [{"$subtract": ["$ts", "$prevTs"]}, gap_ms]},
+                ]},
+                {"$subtract": ["$ts", "$prevTs"]},
+                0,
+            ]}}},
+            {"$sort": {"userId": 1, "day": 1, "ts": 1}},
+            {"$group": {
+                "_id": {"userId": "$userId", "day": "$day"},
+                "chatCount": {"$sum": 1},
+                "userMessages": {
+                    "$sum": {"$cond": [{"$eq": [{"$toLower": {"$ifNull": ["$sender", "User"]}}, "user"]}, 1, 0]}
+                },
+                "sessionMs": {"$sum": "$gapMs"},
+                "firstChatAt": {"$first": "$ts"},
+                "lastChatAt": {"$last": "$ts"},
+                "firstChatTime": {"$first": "$timestamp"},
+                "lastChatTime": {"$last": "$timestamp"},
+            }},
+        ]
+
+        delete_filter = {"date": {"$gte": start_date.strftime('%Y-%m-%d'), "$lte": end_date.strftime('%Y-%m-%d')}}
+        if user_id:
+            delete_filter["userId"] = str(user_id)
+
+        operations = []
+        rebuilt_ids = []
+        now = datetime.utcnow()
+        for row in db.chats.aggregate(pipeline, allowDiskUse=True):
+            row_user_id, day = row["_id"]["userId"], row["_id"]["day"]
+            rebuilt_ids.append(_day_key(row_user_id, day))
+            operations.append(ReplaceOne(
+                {"_id": rebuilt_ids[-1]},
+                {
+                    "userId": row_user_id,
+                    "date": day,
+                    "chatCount": row["chatCount"],
+                    "userMessages": row["userMessages"],
+                    "botMessages": row["chatCount"] - row["userMessages"],
+                    "sessionMinutes": row["sessionMs"] / 60000,
+                    "firstChatTime": format_chat_timestamp(row["firstChatTime"]),
+                    "lastChatTime": format_chat_timestamp(row["lastChatTime"]),
+                    "firstChatAt": row["firstChatAt"],
+                    "lastChatAt": row["lastChatAt"],
+                    "updatedAt": now,
+                },
+                upsert=True,
+            ))
+
+        # Drop rows for days that no longer have chats, then write the recomputed ones
+        self.collection.delete_many({**delete_filter, "_id": {"$nin": rebuilt_ids}})
+        for batch_start in range(0, len(operations), 1000):
+            self.collection.bulk_write(operations[batch_start:batch_start + 1000], ordered=False)
+
+        return len(operations)
+
+    def get_user_days(self, user_id: str, start_date: date, end_date: date) -> List[dict]:
+        """Rollup rows of a user for days in [start_date, end_date], oldest first"""
+        return list(self.collection.find({
+            "userId": str(user_id),
+            "date": {"$gte": start_date.strftime('%Y-%m-%d'), "$lte": end_date.strftime('%Y-%m-%d')},
+        }).sort("date", 1))
+
+    def get_day(self, day: str) -> List[dict]:
+        """Rollup rows of every user active on a day"""
+        return list(self.collection.find({"date": day}))
+
+    def get_active_days(self, start_date: date, end_date: date) -> Dict[str, List[date]]:
+        """Active days per user for days in [start_date, end_date]: {user_id: sorted dates}"""
+        active_days: Dict[str, List[date]] = {}
+        cursor = self.collection.find(
+            {"date": {"$gte": start_date.strftime('%Y-%m-%d'), "$lte": end_date.strftime('%Y-%m-%d')}},
+            {"_id": 0, "userId": 1, "date": 1}
+        ).sort([("userId", 1), ("date", 1)])
+        for row in cursor:
+            active_days.setdefault(row["userId"], []).append(datetime.strptime(row["date"], '%Y-%m-%d').date())
+        return active_days
+
+    def get_total_chats(self) -> Dict[str, int]:
+        """All-time chat count per user"""
+        return {
+            row["_id"]: row["count"]
+            for row in self.collection.aggregate([{"$group": {"_id": "$userId", "count": {"$sum": "$chatCount"}}}])
+        }
+
+    @staticmethod
+    def reads_enabled() -> bool:
+        """Whether analytics should read rollups instead of scanning chats (on after backfill-daily-stats)"""
+        return Config.DAILY_STATS_ROLLUP_READS_ENABLED
+
+
+# Shared rollup used by the chat controller, analytics routes and manage.py
+daily_stats = DailyStatsRollup()
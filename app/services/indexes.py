@@ -0,0 +1,228 @@
+# app/services/indexes.py
+import threading
+import traceback
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.config import Config
+from app.services.db import db
+from app.utility.timestamps import timestamp_range_filter
+
+
+# Indexes the app's hot queries rely on, per collection.
+# Builds are idempotent: existing indexes with the same name and keys are left alone.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "chats": [
+        # Conversation history, recent-context fetch, summary checkpoints (timestamp, _id)
+        IndexModel(
+            [("userId", ASCENDING), ("characterId", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+            name="user_character_timestamp",
+            background=True,
+        ),
+        # Per-user analytics ranges, sessionization, cohorts, chat export pages (timestamp, _id)
+        IndexModel(
+            [("userId", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+            name="user_timestamp_id",
+            background=True,
+        ),
+        # Day-level scans across all users (daily stats, rollup rebuilds)
+        IndexModel([("timestamp", ASCENDING)], name="timestamp", background=True),
+    ],
+    "users": [
+        IndexModel(
+            [("mobileNumber", ASCENDING)],
+            name="mobile_number_unique",
+            background=True,
+            unique=True,
+            partialFilterExpression={"mobileNumber": {"$type": "string"}},
+        ),
+        IndexModel(
+            [("email", ASCENDING)],
+            name="email_unique",
+            background=True,
+            unique=True,
+            partialFilterExpression={"email": {"$type": "string"}},
+        ),
+        IndexModel([("createdAt", ASCENDING)], name="created_at", background=True),
+    ],
+    "summaries": [
+        IndexModel([("userId", ASCENDING), ("characterId", ASCENDING)], name="user_character_unique", unique=True, background=True),
+    ],
+    "categorizations": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True, background=True),
+    ],
+    "sessions": [
+        IndexModel([("userId", ASCENDING), ("gapMinutes", ASCENDING), ("startTime", ASCENDING)], name="user_gap_start", background=True),
+        IndexModel([("userId", ASCENDING), ("gapMinutes", ASCENDING), ("endTime", ASCENDING)], name="user_gap_end", background=True),
+    ],
+    "user_daily_stats": [
+        IndexModel([("userId", ASCENDING), ("date", ASCENDING)], name="user_date", background=True),
+        IndexModel([("date", ASCENDING)], name="date", background=True),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("heartbeatAt", ASCENDING)], name="status_heartbeat", background=True),
+        IndexModel([("type", ASCENDING), ("createdAt", DESCENDING)], name="type_created", background=True),
+    ],
+    "job_checkpoints": [
+        IndexModel([("jobId", ASCENDING), ("status", ASCENDING)], name="job_status", background=True),
+    ],
+}
+
+
+def ensure_indexes(collections: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """
+    Create the declared indexes
+
+    Index models are declared with background=True, which older servers honour and
+    MongoDB 4.2+ ignores (its builds only lock briefly at start and end).
+
+    A failing index (e.g. duplicates blocking a unique index) is reported and skipped
+    so the remaining indexes still get built.
+    """
+    report = {}
+    for collection_name in collections or INDEXES:
+        collection = db[collection_name]
+        created, failed = [], {}
+        for index in INDEXES[collection_name]:
+            name = index.document["name"]
+            try:
+                collection.create_indexes([index])
+                created.append(name)
+            except OperationFailure as e:
+                failed[name] = str(e)
+                print(f"⚠️ Could not build index {collection_name}.{name}: {e}")
+        report[collection_name] = {"ensured": created, "failed": failed}
+        print(f"🗂️ Indexes on {collection_name}: {len(created)} ensured, {len(failed)} failed")
+    return report
+
+
+def start_background_index_build() -> Optional[threading.Thread]:
+    """Ensure indexes in a daemon thread at startup, when enabled in config"""
+    if not Config.ENSURE_INDEXES_ON_STARTUP or db is None:
+        return None
+
+    def run():
+        try:
+            ensure_indexes()
+        except Exception as e:
+            print(f"❌ Index build failed: {e}")
+            traceback.print_exc()
+
+    thread = threading.Thread(target=run, name="ensure-indexes", daemon=True)
+    thread.start()
+    return thread
+
+
+def _sample_ids() -> dict:
+    """Real ids to plug into the query shapes so the planner sees realistic filters"""
+    chat = db.chats.find_one({}, {"userId": 1, "characterId": 1}) or {}
+    user = db.users.find_one({}, {"mobileNumber": 1, "email": 1}) or {}
+    return {
+        "userId": chat.get("userId", ""),
+        "characterId": chat.get("characterId", ""),
+        "mobileNumber": user.get("mobileNumber", ""),
+        "email": user.get("email", ""),
+    }
+
+
+def _query_shapes(sample: dict) -> List[dict]:
+    """The app's known query shapes: name, collection, filter and optional sort"""
+    return [
+        {
+            "name": "conversation history",
+            "collection": "chats",
+            "filter": {"userId": sample["userId"], "characterId": sample["characterId"]},
+            "sort": [("timestamp", ASCENDING)],
+        },
+        {
+            "name": "recent chats for reply context",
+            "collection": "chats",
+            "filter": {"userId": sample["userId"], "characterId": sample["characterId"]},
+            "sort": [("timestamp", -1)],
+        },
+        {
+            "name": "user chat export",
+            "collection": "chats",
+            "filter": {"userId": sample["userId"]},
+            "sort": [("timestamp", -1), ("_id", -1)],
+        },
+        {
+            "name": "day of chats (daily stats)",
+            "collection": "chats",
+            "filter": timestamp_range_filter(datetime(2025, 1, 1), datetime(2025, 1, 2), end_inclusive=False),
+            "sort": None,
+        },
+        {
+            "name": "user by mobile number",
+            "collection": "users",
+            "filter": {"mobileNumber": sample["mobileNumber"]},
+            "sort": None,
+        },
+        {
+            "name": "user by email",
+            "collection": "users",
+            "filter": {"email": sample["email"]},
+            "sort": None,
+        },
+        {
+            "name": "conversation summary",
+            "collection": "summaries",
+            "filter": {"userId": sample["userId"], "characterId": sample["characterId"]},
+            "sort": None,
+        },
+        {
+            "name": "user categorizations",
+            "collection": "categorizations",
+            "filter": {"user_id": sample["userId"]},
+            "sort": None,
+        },
+        {
+            "name": "user sessions",
+            "collection": "sessions",
+            "filter": {"userId": sample["userId"], "gapMinutes": Config.SESSION_GAP_MINUTES},
+            "sort": [("startTime", ASCENDING)],
+        },
+        {
+            "name": "user daily stats",
+            "collection": "user_daily_stats",
+            "filter": {"userId": sample["userId"], "date": {"$gte": "2025-01-01"}},
+            "sort": [("date", ASCENDING)],
+        },
+    ]
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_query_shapes() -> List[dict]:
+    """Run explain() on every known query shape and flag the ones planned as collection scans"""
+    results = []
+    for shape in _query_shapes(_sample_ids()):
+        cursor = db[shape["collection"]].find(shape["filter"])
+        if shape["sort"]:
+            cursor = cursor.sort(shape["sort"])
+        try:
+            winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        except (OperationFailure, KeyError) as e:
+            results.append({"name": shape["name"], "collection": shape["collection"], "error": str(e)})
+            continue
+
+        stages = _plan_stages(winning_plan)
+        results.append({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "stages": stages,
+            "collectionScan": "COLLSCAN" in stages,
+            "inMemorySort": "SORT" in stages,
+        })
+    return results
@@ -0,0 +1,420 @@
+# app/services/job_engine.py
+"""
+In-process background jobs with state persisted in Mongo
+
+A job type lists the items it works on (e.g. user ids) and processes them in chunks on a
+worker pool. Every finished item is checkpointed in `job_checkpoints`, so a cancelled,
+failed or interrupted job resumes with only the items that are not done yet. Progress is
+kept on the `jobs` document and published to in-process subscribers (SSE) and to the
+Socket.IO room "job:<id>".
+
+Each job records the process that owns it, so a restarted process can tell its
+predecessor's jobs from jobs still running in other processes, and a cancel sent to any
+process reaches the owner through the job's status in Mongo.
+"""
+import os
+import queue
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import Config
+from app.services.db import db
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+RESUMABLE_STATUSES = ("cancelled", "failed", "interrupted")
+TERMINAL_STATUSES = ("completed", "cancelled", "failed", "interrupted")
+ITEM_STATUSES = ("success", "skipped", "failed")
+
+
+class JobContext:
+    """What a job type's process_items sees: params, cancellation and custom progress events"""
+
+    def __init__(self, engine: "JobEngine", job_id: str, params: dict, cancel_event: threading.Event):
+        self.engine = engine
+        self.job_id = job_id
+        self.params = params
+        self.cancel_event = cancel_event
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def emit(self, event_type: str, **data) -> None:
+        self.engine.publish(self.job_id, {"type": event_type, **data})
+
+
+class JobType(NamedTuple):
+    """
+    name: job type stored on the job document
+    list_items(params) -> item ids, in a stable order
+    process_items(context, item_ids) -> {item_id: {"status": "success" | "skipped" | "failed", ...}}
+        Numeric values in an item result are summed into the job's `totals`.
+    chunk_size: items handed to one process_items call
+    """
+    name: str
+    list_items: Callable[[dict], List[str]]
+    process_items: Callable[[JobContext, List[str]], Dict[str, dict]]
+    chunk_size: int = 1
+
+
+def serialize_job(job: dict) -> dict:
+    """JSON-friendly view of a job document"""
+    payload = {**job, "_id": str(job["_id"])}
+    for field in ("createdAt", "startedAt", "finishedAt", "heartbeatAt", "cancelRequestedAt"):
+        if isinstance(payload.get(field), datetime):
+            payload[field] = payload[field].isoformat()
+    return payload
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobEngine:
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = Config.JOB_WORKERS if max_workers is None else max_workers
+        # Unique per engine instance, so a restarted process never mistakes old jobs for its own
+        self.owner = {"host": socket.gethostname(), "pid": os.getpid(), "boot": uuid.uuid4().hex}
+        self.jobs = db.jobs
+        self.checkpoints = db.job_checkpoints
+        self.socketio = None
+        self._types: Dict[str, JobType] = {}
+        self._lock = threading.Lock()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._subscribers: Dict[str, List[queue.Queue]] = {}
+
+    # --- setup -----------------------------------------------------------------
+
+    def register(self, job_type: JobType) -> None:
+        self._types[job_type.name] = job_type
+
+    def attach_socketio(self, socketio) -> None:
+        self.socketio = socketio
+
+    def job_types(self) -> List[str]:
+        return sorted(self._types)
+
+    # --- queries -----------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[dict]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        return self.jobs.find_one({"_id": ObjectId(job_id)})
+
+    def list(self, job_type: Optional[str] = None, limit: int = 20) -> List[dict]:
+        query = {"type": job_type} if job_type else {}
+        return list(self.jobs.find(query).sort("createdAt", -1).limit(limit))
+
+    # --- lifecycle -----------------------------------------------------------------
+
+    def submit(self, job_type: str, params: Optional[dict] = None) -> dict:
+        """Create a job and start it in the background; raises ValueError for an unknown type"""
+        if job_type not in self._types:
+            raise ValueError(f"Unknown job type {job_type!r}. Known types: {', '.join(self.job_types())}")
+
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "params": params or {},
+            "status": "queued",
+            "createdAt": now,
+            "heartbeatAt": now,
+            "progress": {"total": 0, "processed": 0, "succeeded": 0, "failed": 0, "skipped": 0},
+            "totals": {},
+            "runs": 0,
+            "owner": self.owner,
+        }
+        job["_id"] = self.jobs.insert_one(job).inserted_id
+        self._start(str(job["_id"]))
+        return job
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Ask a job to stop after its in-flight chunks; returns the updated job (None if not active)"""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+
+        if event is None:
+            job = self.get(job_id)
+            if job and job["status"] in ACTIVE_STATUSES and self._is_orphaned(job):
+                # Nobody is running it any more (e.g. left over from a restart): cancel it outright
+                return self.jobs.find_one_and_update(
+                    {"_id": job["_id"], "status": {"$in": list(ACTIVE_STATUSES)}},
+                    {"$set": {"status": "cancelled", "cancelRequestedAt": datetime.utcnow(), "finishedAt": datetime.utcnow()}},
+                    return_document=ReturnDocument.AFTER
+                )
+            # Otherwise another process owns it and sees the status at its next checkpoint
+        else:
+            event.set()
+
+        job = self.jobs.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$in": ["queued", "running"]}},
+            {"$set": {"status": "cancelling", "cancelRequestedAt": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            self.publish(job_id, {"type": "status", "status": "cancelling"})
+        return job
+
+    def resume(self, job_id: str) -> Optional[dict]:
+        """Restart a cancelled, failed or interrupted job from its checkpoints"""
+        job = self.jobs.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$in": list(RESUMABLE_STATUSES)}},
+            {"$set": {"status": "queued", "heartbeatAt": datetime.utcnow(), "owner": self.owner}, "$unset": {"error": "", "finishedAt": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            self._start(job_id)
+        return job
+
+    def _is_orphaned(self, job: dict) -> bool:
+        """Whether no live process runs an active job"""
+        owner = job.get("owner") or {}
+        if owner.get("boot") == self.owner["boot"]:
+            return False
+        if owner.get("host") == self.owner["host"]:
+            # Same machine: the owner is gone if it was a previous run of this process or has exited
+            return owner.get("pid") == self.owner["pid"] or not _process_alive(owner.get("pid", 0))
+        # Another machine: only a missing heartbeat tells
+        stale_before = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+        return job.get("heartbeatAt", stale_before) <= stale_before
+
+    def recover(self) -> int:
+        """
+        Handle active jobs that no live process owns any more
+
+        A job is orphaned when its owner was an earlier process on this machine (even one
+        restarted seconds ago), or, for another machine, when it has sent no heartbeat for
+        JOB_STALE_SECONDS. Orphans are resumed when JOBS_RESUME_ON_STARTUP is set, otherwise
+        marked interrupted so they can be resumed through the API. Returns how many were found.
+        """
+        active_jobs = self.jobs.find(
+            {"status": {"$in": list(ACTIVE_STATUSES)}},
+            {"_id": 1, "status": 1, "owner": 1, "heartbeatAt": 1}
+        )
+        orphaned = [job for job in active_jobs if self._is_orphaned(job)]
+        for job in orphaned:
+            job_id = str(job["_id"])
+            # A cancel that was never honoured ends as cancelled rather than interrupted
+            status = "cancelled" if job["status"] == "cancelling" else "interrupted"
+            updated = self.jobs.update_one(
+                {"_id": job["_id"], "status": job["status"]},
+                {"$set": {"status": status, "finishedAt": datetime.utcnow()}}
+            )
+            if updated.modified_count and status == "interrupted" and Config.JOBS_RESUME_ON_STARTUP:
+                self.resume(job_id)
+        if orphaned:
+            print(f"♻️ Found {len(orphaned)} interrupted job(s)" + (" - resuming" if Config.JOBS_RESUME_ON_STARTUP else ""))
+        return len(orphaned)
+
+    # --- events -----------------------------------------------------------------
+
+    def subscribe(self, job_id: str) -> queue.Queue:
+        events: queue.Queue = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(events)
+        return events
+
+    def unsubscribe(self, job_id: str, events: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            if events in subscribers:
+                subscribers.remove(events)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def publish(self, job_id: str, event: dict) -> None:
+        event = {"jobId": job_id, "timestamp": datetime.utcnow().isoformat(), **event}
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, []))
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                pass  # A stalled subscriber misses events rather than blocking the job
+        if self.socketio is not None:
+            try:
+                self.socketio.emit("job_progress", event, to=f"job:{job_id}")
+            except Exception as e:
+                print(f"⚠️ Failed to emit job progress over Socket.IO: {e}")
+
+    # --- execution -----------------------------------------------------------------
+
+    def _start(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._cancel_events:
+                return
+            self._cancel_events[job_id] = threading.Event()
+        threading.Thread(target=self._run, args=(job_id,), name=f"job-{job_id}", daemon=True).start()
+
+    def _progress_from_checkpoints(self, object_id: ObjectId) -> dict:
+        counts = {row["_id"]: row["count"] for row in self.checkpoints.aggregate([
+            {"$match": {"jobId": object_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ])}
+        return {
+            "processed": sum(counts.values()),
+            "succeeded": counts.get("success", 0),
+            "failed": counts.get("failed", 0),
+            "skipped": counts.get("skipped", 0),
+        }
+
+    def _run(self, job_id: str) -> None:
+        object_id = ObjectId(job_id)
+        cancel_event = self._cancel_events[job_id]
+        try:
+            job = self.jobs.find_one_and_update(
+                {"_id": object_id, "status": "queued"},
+                {
+                    "$set": {"status": "running", "startedAt": datetime.utcnow(), "heartbeatAt": datetime.utcnow(), "owner": self.owner},
+                    "$inc": {"runs": 1}
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                return
+            job_type = self._types[job["type"]]
+
+            # Failed items are retried on every run; done and skipped ones are not
+            self.checkpoints.delete_many({"jobId": object_id, "status": "failed"})
+            done = set(self.checkpoints.distinct("itemId", {"jobId": object_id}))
+            items = [str(item) for item in job_type.list_items(job["params"])]
+            remaining = [item for item in items if item not in done]
+
+            progress = {"total": len(items), **self._progress_from_checkpoints(object_id)}
+            self.jobs.update_one({"_id": object_id}, {"$set": {"progress": progress}})
+            self.publish(job_id, {
+                "type": "start",
+                "jobType": job["type"],
+                "status": "running",
+                "run": job["runs"],
+                "remaining": len(remaining),
+                "progress": progress
+            })
+
+            context = JobContext(self, job_id, job["params"], cancel_event)
+            chunks = [remaining[i:i + job_type.chunk_size] for i in range(0, len(remaining), job_type.chunk_size)]
+            self._process_chunks(object_id, job_type, context, chunks, progress)
+
+            status = "cancelled" if cancel_event.is_set() else "completed"
+            self._release(job_id)
+            job = self.jobs.find_one_and_update(
+                {"_id": object_id},
+                {"$set": {"status": status, "finishedAt": datetime.utcnow(), "heartbeatAt": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            self.publish(job_id, {
+                "type": status,
+                "status": status,
+                "progress": job["progress"],
+                "totals": job.get("totals", {})
+            })
+            print(f"🏁 Job {job_id} ({job['type']}) {status}: {job['progress']}")
+
+        except Exception as e:
+            traceback.print_exc()
+            self._release(job_id)
+            self.jobs.update_one(
+                {"_id": object_id},
+                {"$set": {"status": "failed", "error": str(e), "finishedAt": datetime.utcnow()}}
+            )
+            self.publish(job_id, {"type": "failed", "status": "failed", "error": str(e)})
+        finally:
+            self._release(job_id)
+
+    def _release(self, job_id: str) -> None:
+        # Before a job's final status is written, so it can be resumed as soon as that lands
+        with self._lock:
+            self._cancel_events.pop(job_id, None)
+
+    def _process_chunks(self, object_id, job_type: JobType, context: JobContext, chunks: List[List[str]], progress: dict):
+        job_id = str(object_id)
+        pending_chunks = list(reversed(chunks))
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"job-{job_id}") as executor:
+            while pending_chunks or in_flight:
+                # Keep the pool busy, but stop handing out work once cancellation is requested
+                while pending_chunks and len(in_flight) < self.max_workers and not context.is_cancelled():
+                    chunk = pending_chunks.pop()
+                    in_flight[executor.submit(job_type.process_items, context, chunk)] = chunk
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, timeout=Config.JOB_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                job = self.jobs.find_one_and_update(
+                    {"_id": object_id},
+                    {"$set": {"heartbeatAt": datetime.utcnow()}},
+                    projection={"status": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+                self._check_cancelled(job, context)
+
+                for future in finished:
+                    chunk = in_flight.pop(future)
+                    try:
+                        results = future.result() or {}
+                        # Items a cancelled chunk never got to stay unrecorded for the next run
+                        chunk_error = None if context.is_cancelled() else "No result returned"
+                    except Exception as e:
+                        traceback.print_exc()
+                        results = {}
+                        chunk_error = str(e)
+                    if chunk_error:
+                        for item in chunk:
+                            results.setdefault(item, {"status": "failed", "error": chunk_error})
+                    self._check_cancelled(self._record_results(object_id, results, progress), context)
+
+    @staticmethod
+    def _check_cancelled(job: Optional[dict], context: JobContext) -> None:
+        # A cancel can arrive through another process; it only shows up in the job's status
+        if job and job.get("status") in ("cancelling", "cancelled"):
+            context.cancel_event.set()
+
+    def _record_results(self, object_id: ObjectId, results: Dict[str, dict], progress: dict) -> dict:
+        now = datetime.utcnow()
+        increments = {"progress.processed": 0, "progress.succeeded": 0, "progress.failed": 0, "progress.skipped": 0}
+        operations = []
+        for item, result in results.items():
+            status = result.get("status") if result.get("status") in ITEM_STATUSES else "success"
+            increments["progress.processed"] += 1
+            increments[{"success": "progress.succeeded", "failed": "progress.failed", "skipped": "progress.skipped"}[status]] += 1
+            for key, value in result.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    increments[f"totals.{key}"] = increments.get(f"totals.{key}", 0) + value
+            operations.append(UpdateOne(
+                {"_id": f"{object_id}:{item}"},
+                {"$set": {"jobId": object_id, "itemId": item, "status": status, "result": result, "finishedAt": now}},
+                upsert=True
+            ))
+
+        if operations:
+            self.checkpoints.bulk_write(operations, ordered=False)
+        job = self.jobs.find_one_and_update(
+            {"_id": object_id},
+            {"$inc": increments, "$set": {"heartbeatAt": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        progress.update(job["progress"])
+
+        job_id = str(object_id)
+        for item, result in results.items():
+            self.publish(job_id, {"type": "item", "itemId": item, "result": result})
+        self.publish(job_id, {"type": "progress", "status": job["status"], "progress": job["progress"]})
+        return job
+
+
+# Shared engine; job types are registered in app/services/job_handlers.py
+job_engine = JobEngine()
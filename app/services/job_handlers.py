@@ -0,0 +1,154 @@
+# app/services/job_handlers.py
+"""Job types run by the job engine: bulk session categorization and Mem0 memory backfills (in-process or on the process pool)"""
+import logging
+from typing import Dict, List
+
+from bson import ObjectId
+
+from app.config import Config
+from app.memory.backfill import process_user_character_chats
+from app.memory.backfill_runner import memory_backfill_pool
+from app.memory.memory_service import MemoryService
+from app.routes.user_analytics import calculate_users_sessions
+from app.services.db import db
+from app.services.job_engine import JobContext, JobEngine, JobType
+from app.services.session_categorizer import SessionCategorizer, save_user_categorization
+
+logger = logging.getLogger(__name__)
+
+# Character whose chats the memory backfill processes unless a job says otherwise
+DEFAULT_BACKFILL_CHARACTER_ID = "688210873496b5e441480d22"
+
+
+def _user_names(user_ids: List[str]) -> Dict[str, str]:
+    users = db.users.find({"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}, {"userName": 1})
+    return {str(user["_id"]): user.get("userName", "Unknown") for user in users}
+
+
+def list_users(params: dict) -> List[str]:
+    """User ids in _id order, from 0-based `start_index`, at most `max_users`"""
+    cursor = db.users.find({}, {"_id": 1}).sort("_id", 1).skip(int(params.get("start_index", 0)))
+    if params.get("max_users"):
+        cursor = cursor.limit(int(params["max_users"]))
+    return [str(user["_id"]) for user in cursor]
+
+
+def categorize_user_batch(context: JobContext, user_ids: List[str]) -> Dict[str, dict]:
+    """Categorize one batch of users; sessions of the whole batch share the worker pool"""
+    session_gap = int(context.params.get("session_gap", Config.SESSION_GAP_MINUTES))
+    force_regenerate = bool(context.params.get("force_regenerate", False))
+    user_names = _user_names(user_ids)
+    results = {}
+
+    sessions_by_user = {
+        user_id: payload["sessions"]
+        for user_id, payload in calculate_users_sessions(user_ids, session_gap, include_chats=True).items()
+    }
+    for user_id in user_ids:
+        if not sessions_by_user.get(user_id):
+            results[user_id] = {"status": "skipped", "user_name": user_names.get(user_id, "Unknown"), "reason": "No sessions found"}
+
+    previous_by_user = {}
+    if not force_regenerate:
+        previous_by_user = {
+            doc["user_id"]: doc.get("sessions", [])
+            for doc in db.categorizations.find({"user_id": {"$in": user_ids}}, {"user_id": 1, "sessions": 1})
+        }
+
+    def save_user(user_id, user_session_results):
+        user_name = user_names.get(user_id, "Unknown")
+        try:
+            save_user_categorization(user_id, user_session_results, user_name)
+            results[user_id] = {
+                "status": "success",
+                "user_name": user_name,
+                "sessions_processed": len(user_session_results),
+                "sessions_failed": sum(1 for entry in user_session_results if "error" in entry)
+            }
+        except Exception as e:
+            logger.error(f"Error saving user {user_name} (ID: {user_id}): {e}")
+            results[user_id] = {"status": "failed", "user_name": user_name, "error": str(e)}
+
+    throughput = SessionCategorizer().categorize_users(sessions_by_user, save_user, previous_by_user)
+    context.emit("throughput", throughput=throughput)
+    return results
+
+
+def backfill_user_memories(context: JobContext, user_ids: List[str]) -> Dict[str, dict]:
+    """Add one user's chats with the job's character to Mem0, continuing from the saved position"""
+    character_id = context.params.get("character_id", DEFAULT_BACKFILL_CHARACTER_ID)
+    batch_size = int(context.params.get("batch_size", 50))
+    sub_batch_size = int(context.params.get("sub_batch_size", 10))
+    resume = bool(context.params.get("resume", True))
+    user_names = _user_names(user_ids)
+    memory_service = MemoryService()
+    results = {}
+
+    for user_id in user_ids:
+        if context.is_cancelled():
+            break
+        user_name = user_names.get(user_id, "Unknown User")
+        context.emit("item_start", itemId=user_id, user_name=user_name)
+
+        stats = process_user_character_chats(
+            user_id, character_id, batch_size, sub_batch_size, memory_service, resume=resume
+        )
+        results[user_id] = _backfill_result(stats, user_name)
+    return results
+
+
+def backfill_user_memories_parallel(context: JobContext, user_ids: List[str]) -> Dict[str, dict]:
+    """Add a chunk of users' chats to Mem0 on the shared backfill process pool"""
+    user_names = _user_names(user_ids)
+    results = {}
+
+    def record(stats: dict):
+        results[stats["user_id"]] = _backfill_result(stats, user_names.get(stats["user_id"], "Unknown User"))
+
+    throughput = memory_backfill_pool.run(
+        user_ids,
+        context.params.get("character_id", DEFAULT_BACKFILL_CHARACTER_ID),
+        batch_size=int(context.params.get("batch_size", 50)),
+        sub_batch_size=int(context.params.get("sub_batch_size", 10)),
+        resume=bool(context.params.get("resume", True)),
+        on_user_complete=record,
+        should_stop=context.is_cancelled
+    )
+    context.emit("throughput", throughput=throughput)
+    return results
+
+
+def _backfill_result(stats: dict, user_name: str) -> dict:
+    result = {
+        "status": "failed" if "error" in stats else "success",
+        "user_name": user_name,
+        "chats_processed": stats["total_processed"],
+        "chats_failed": stats["total_failed"],
+        "memories": stats["total_memories"],
+        "batches": stats["total_batches"]
+    }
+    for key in ("rate_limited_seconds", "error"):
+        if key in stats:
+            result[key] = stats[key]
+    return result
+
+
+def register_job_types(engine: JobEngine) -> None:
+    engine.register(JobType(
+        name="categorize_users",
+        list_items=list_users,
+        process_items=categorize_user_batch,
+        chunk_size=Config.CATEGORIZATION_USER_BATCH_SIZE
+    ))
+    engine.register(JobType(
+        name="memory_backfill",
+        list_items=list_users,
+        process_items=backfill_user_memories,
+        chunk_size=1
+    ))
+    engine.register(JobType(
+        name="memory_backfill_parallel",
+        list_items=list_users,
+        process_items=backfill_user_memories_parallel,
+        chunk_size=Config.MEMORY_BACKFILL_PROCESSES * 2
+    ))
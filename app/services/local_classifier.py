@@ -0,0 +1,210 @@
+# app/services/local_classifier.py
+"""
+CPU-only first-pass session classifier
+
+Sentence-transformers embeddings of a session's messages feed a logistic-regression head
+trained on the stored Gemini categorizations. Sessions the head is confident about are
+labelled locally; the rest are escalated to Gemini by the SessionCategorizer.
+"""
+import logging
+import os
+import random
+import threading
+from typing import List, Optional, Tuple
+
+from app.config import Config
+from app.services.db import db
+from app.utility.timestamps import parse_chat_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Sentence-transformers only looks at the first few hundred tokens anyway
+MAX_INPUT_CHARS = 2000
+LABEL_SEPARATOR = " / "
+
+
+def encode_label(primary_category: str, sub_category: str = "N/A") -> str:
+    if primary_category == "Emotional Distress" and sub_category and sub_category != "N/A":
+        return f"{primary_category}{LABEL_SEPARATOR}{sub_category}"
+    return primary_category
+
+
+def decode_label(label: str) -> dict:
+    primary_category, _, sub_category = label.partition(LABEL_SEPARATOR)
+    return {"primary_category": primary_category, "sub_category": sub_category or "N/A"}
+
+
+def session_text(messages: List[str]) -> str:
+    return "\n".join(messages)[:MAX_INPUT_CHARS]
+
+
+def load_training_examples(max_users: Optional[int] = None) -> Tuple[List[List[str]], List[str]]:
+    """
+    (messages per session, label) pairs from stored categorizations
+
+    Messages are re-read from chats over each session's time range, with the same
+    filtering and token-cap cutting the categorizer applies before predicting, so the head
+    is trained on the text it is later asked about. Failed, off-schema and locally
+    classified sessions are skipped so the head only learns from Gemini labels.
+    """
+    from app.services.session_categorizer import fit_session_messages, session_messages, validate_category_result
+    from app.services.session_store import chat_time_range_filter
+    from app.utility.token_service import TokenService
+
+    token_service = TokenService()
+
+    sessions_list, labels = [], []
+    cursor = db.categorizations.find({}, {"user_id": 1, "sessions": 1})
+    if max_users:
+        cursor = cursor.limit(max_users)
+
+    for doc in cursor:
+        for entry in doc.get("sessions", []):
+            if "error" in entry or entry.get("classified_by") == "local":
+                continue
+            try:
+                category = validate_category_result(entry)
+            except ValueError:
+                continue
+            start = parse_chat_timestamp(entry.get("session_start"))
+            end = parse_chat_timestamp(entry.get("session_end"))
+            if start is None or end is None:
+                continue
+
+            # Session ends are stored at ms precision; the range must still include the last chat
+            chats = db.chats.find(
+                {"userId": doc["user_id"], **chat_time_range_filter(start, end)},
+                {"_id": 0, "message": 1}
+            ).sort("timestamp", 1)
+            messages = session_messages({"chats": list(chats)})
+            if messages:
+                sessions_list.append(fit_session_messages(messages, Config.CATEGORIZATION_SESSION_TOKEN_CAP, token_service))
+                labels.append(encode_label(category["primary_category"], category["sub_category"]))
+
+    return sessions_list, labels
+
+
+class LocalCategoryClassifier:
+    """Embedding model + linear head; loads lazily and reports itself unavailable if untrained"""
+
+    def __init__(self, model_path: Optional[str] = None, embedding_model: Optional[str] = None):
+        self.model_path = model_path or Config.LOCAL_CLASSIFIER_PATH
+        self.embedding_model_name = embedding_model or Config.LOCAL_CLASSIFIER_EMBEDDING_MODEL
+        self._lock = threading.Lock()
+        self._encoder = None
+        self._head = None
+        self._load_failed = False
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+            self._encoder = SentenceTransformer(self.embedding_model_name, device="cpu")
+        return self._encoder
+
+    def embed(self, sessions: List[List[str]]):
+        return self._get_encoder().encode(
+            [session_text(messages) for messages in sessions],
+            batch_size=64,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+
+    def is_available(self) -> bool:
+        """Whether a trained head could be loaded (tried once)"""
+        with self._lock:
+            if self._head is not None:
+                return True
+            if self._load_failed:
+                return False
+            if not os.path.exists(self.model_path):
+                logger.info(f"No local classifier at {self.model_path}; every session goes to Gemini")
+                self._load_failed = True
+                return False
+            try:
+                import joblib
+                saved = joblib.load(self.model_path)
+                self._head = saved["head"]
+                self.embedding_model_name = saved.get("embedding_model", self.embedding_model_name)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to load local classifier from {self.model_path}: {e}")
+                self._load_failed = True
+                return False
+
+    def train(self, sessions: List[List[str]], labels: List[str]) -> "LocalCategoryClassifier":
+        from sklearn.linear_model import LogisticRegression
+
+        head = LogisticRegression(max_iter=1000, class_weight="balanced")
+        head.fit(self.embed(sessions), labels)
+        with self._lock:
+            self._head = head
+            self._load_failed = False
+        return self
+
+    def save(self) -> None:
+        import joblib
+
+        os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+        joblib.dump({"head": self._head, "embedding_model": self.embedding_model_name}, self.model_path)
+
+    def predict(self, sessions: List[List[str]]) -> List[Tuple[dict, float]]:
+        """(category result, confidence) per session"""
+        if not sessions:
+            return []
+        probabilities = self._head.predict_proba(self.embed(sessions))
+        classes = self._head.classes_
+        predictions = []
+        for row in probabilities:
+            best = int(row.argmax())
+            predictions.append((decode_label(classes[best]), float(row[best])))
+        return predictions
+
+
+def evaluate(
+    sessions: List[List[str]],
+    labels: List[str],
+    test_fraction: float = 0.2,
+    threshold: Optional[float] = None,
+    seed: int = 42
+) -> dict:
+    """
+    Hold-out evaluation against the stored (Gemini) labels
+
+    Trains a throwaway head on the training split and reports, on the test split, overall
+    agreement, agreement on the sessions it would keep local, and the fraction escalated.
+    """
+    threshold = Config.LOCAL_CLASSIFIER_CONFIDENCE if threshold is None else threshold
+    indices = list(range(len(sessions)))
+    random.Random(seed).shuffle(indices)
+    test_size = max(1, int(len(indices) * test_fraction))
+    test_idx, train_idx = indices[:test_size], indices[test_size:]
+
+    classifier = LocalCategoryClassifier(model_path=os.devnull).train(
+        [sessions[i] for i in train_idx],
+        [labels[i] for i in train_idx]
+    )
+    predictions = classifier.predict([sessions[i] for i in test_idx])
+
+    agree = agree_primary = agree_local = local = 0
+    for i, (result, confidence) in zip(test_idx, predictions):
+        matches = encode_label(result["primary_category"], result["sub_category"]) == labels[i]
+        agree += matches
+        agree_primary += result["primary_category"] == decode_label(labels[i])["primary_category"]
+        if confidence >= threshold:
+            local += 1
+            agree_local += matches
+
+    return {
+        "train_sessions": len(train_idx),
+        "test_sessions": len(test_idx),
+        "threshold": threshold,
+        "agreement": round(agree / len(test_idx) * 100, 2),
+        "primary_agreement": round(agree_primary / len(test_idx) * 100, 2),
+        "local_agreement": round(agree_local / local * 100, 2) if local else None,
+        "local_fraction": round(local / len(test_idx) * 100, 2),
+        "escalated_fraction": round((len(test_idx) - local) / len(test_idx) * 100, 2)
+    }
+
+
+# Shared so the embedding model is loaded once per process
+local_classifier = LocalCategoryClassifier()
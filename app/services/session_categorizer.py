@@ -0,0 +1,535 @@
+# app/services/session_categorizer.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.services.db import db
+from app.services.gemini import GeminiService
+from app.services.local_classifier import LocalCategoryClassifier
+from app.services.local_classifier import local_classifier as shared_local_classifier
+from app.utility.response_cache import response_cache
+from app.utility.token_service import TokenService
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter shared by worker threads
+
+    Keeps a sliding one-minute window of (time, tokens) grants; `acquire` blocks until
+    both budgets have room. A single request larger than the token budget is let
+    through on an empty window rather than blocking forever.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._grants: deque = deque()
+        self._tokens_in_window = 0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait for capacity for one request of `tokens`; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._grants and self._grants[0][0] <= now - self.window_seconds:
+                    self._tokens_in_window -= self._grants.popleft()[1]
+
+                fits_requests = len(self._grants) < self.requests_per_minute
+                fits_tokens = self._tokens_in_window + tokens <= self.tokens_per_minute or not self._grants
+                if fits_requests and fits_tokens:
+                    self._grants.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+
+                # Sleep until the oldest grant leaves the window, then re-check
+                sleep_for = max(self._grants[0][0] + self.window_seconds - now, 0.01)
+
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
+# Shared so concurrent categorization requests stay within one Gemini quota
+gemini_rate_limiter = RateLimiter(Config.GEMINI_REQUESTS_PER_MINUTE, Config.GEMINI_TOKENS_PER_MINUTE)
+
+
+# Bump whenever the prompts or categories change, so cached session results are recomputed
+PROMPT_VERSION = "2"
+
+CATEGORIES = (
+    "Life Update",
+    "General Chat",
+    "Venting & Complaining",
+    "Emotional Distress",
+    "Romantic",
+    "Other",
+)
+EMOTIONAL_DISTRESS_SUB_CATEGORIES = (
+    "Anxiety/Overwhelm",
+    "Sadness/Depression",
+    "Loneliness",
+    "Self-Doubt/Imposter Syndrome",
+    "Relationship Conflict",
+    "Other",
+)
+
+CATEGORY_INSTRUCTIONS = """Categories:
+- Life Update: Sharing news/events
+- General Chat: Casual conversation
+- Venting & Complaining: Expressing frustration
+- Emotional Distress: Personal emotional struggles
+- Romantic: Seeking romantic connection
+- Other: Unclear/random content
+
+Sub-categories (only for Emotional Distress):
+- Anxiety/Overwhelm
+- Sadness/Depression
+- Loneliness
+- Self-Doubt/Imposter Syndrome
+- Relationship Conflict
+- Other"""
+
+
+def create_simple_prompt(messages):
+    """Create simple categorization prompt"""
+    conversation = "\n".join(messages)
+
+    return f"""Categorize this conversation:
+
+{CATEGORY_INSTRUCTIONS}
+
+Conversation:
+{conversation}
+
+Respond only in JSON:
+{{
+  "primary_category": "category_name",
+  "sub_category": "N/A or subcategory"
+}}"""
+
+
+def create_batch_prompt(items: List[Tuple[str, List[str]]]):
+    """Categorization prompt for several conversations at once; items are (id, messages)"""
+    conversations = "\n\n".join(
+        f"### Conversation {item_id}\n" + "\n".join(messages)
+        for item_id, messages in items
+    )
+
+    return f"""Categorize each of the following conversations independently.
+
+{CATEGORY_INSTRUCTIONS}
+
+{conversations}
+
+Respond only with a JSON array containing exactly one object per conversation:
+[
+  {{"id": "conversation id", "primary_category": "category_name", "sub_category": "N/A or subcategory"}}
+]"""
+
+
+def session_messages(session: dict) -> List[str]:
+    """The session's message texts, without empty and warning (⚠️) messages"""
+    messages = []
+    for chat in session["chats"]:
+        message = (chat.get("message") or "").strip()
+        if message and not message.startswith("⚠️"):
+            messages.append(message)
+    return messages
+
+
+def fit_session_messages(messages: List[str], token_cap: int, token_service: TokenService) -> List[str]:
+    """
+    Cut a session to `token_cap` tokens, alternately keeping messages from its start and end
+
+    This is the exact text every classifier sees, so the local classifier is trained on it too.
+    """
+    counts = [token_service.safe_token_count(message) for message in messages]
+    if sum(counts) <= token_cap:
+        return messages
+
+    head, tail = [], []
+    budget = token_cap
+    first, last = 0, len(messages) - 1
+    take_head = True
+    while first <= last:
+        idx = first if take_head else last
+        if counts[idx] > budget:
+            # Room left for a slice of one message at most
+            if not head:
+                head.append(messages[idx][:budget * 4])
+                first += 1
+            break
+        budget -= counts[idx]
+        if take_head:
+            head.append(messages[first])
+            first += 1
+        else:
+            tail.insert(0, messages[last])
+            last -= 1
+        take_head = not take_head
+
+    omitted = last - first + 1
+    middle = [f"[... {omitted} messages omitted ...]"] if omitted > 0 else []
+    return head + middle + tail
+
+
+def session_content_hash(messages: List[str]) -> str:
+    """Cache key for a session's categorization: its message texts plus the prompt version"""
+    digest = hashlib.sha256(PROMPT_VERSION.encode())
+    for message in messages:
+        digest.update(b"\x00" + message.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_category_response(response: str):
+    response = response.strip()
+    if response.startswith("```"):
+        response = response.replace("```json", "").replace("```", "")
+    return json.loads(response)
+
+
+def validate_category_result(result) -> dict:
+    """Normalized {"primary_category", "sub_category"}; raises ValueError for anything off-schema"""
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected an object, got {result!r}")
+
+    primary_category = result.get("primary_category")
+    if primary_category not in CATEGORIES:
+        raise ValueError(f"Unknown category {primary_category!r}")
+
+    sub_category = result.get("sub_category") or "N/A"
+    if primary_category != "Emotional Distress":
+        sub_category = "N/A"
+    elif sub_category not in EMOTIONAL_DISTRESS_SUB_CATEGORIES:
+        sub_category = "Other"
+
+    return {"primary_category": primary_category, "sub_category": sub_category}
+
+
+def session_result(
+    user_id: str,
+    session: dict,
+    category_result: dict,
+    content_hash: Optional[str] = None
+) -> dict:
+    """
+    The stored categorization entry for a session
+
+    A cached entry passed as category_result keeps its processed_at, i.e. when it was
+    actually categorized.
+    """
+    result = {
+        "session_id": session["sessionId"],
+        "user_id": user_id,
+        "primary_category": category_result.get("primary_category", "Other"),
+        "sub_category": category_result.get("sub_category", "N/A"),
+        "session_start": session["startTime"],
+        "session_end": session["endTime"],
+        "chat_count": session["chatCount"],
+        "duration_minutes": session["durationMinutes"],
+        "processed_at": category_result.get("processed_at") or datetime.now().isoformat()
+    }
+    if content_hash:
+        result["content_hash"] = content_hash
+    if "error" in category_result:
+        result["error"] = category_result["error"]
+    if category_result.get("classified_by") == "local":
+        result["classified_by"] = "local"
+        result["confidence"] = category_result.get("confidence")
+    return result
+
+
+def save_user_categorization(user_id: str, session_results: List[dict], user_name: Optional[str] = None) -> None:
+    """Replace the user's categorization document (one per user)"""
+    user_doc = {
+        "user_id": user_id,
+        "total_sessions": len(session_results),
+        "processed_at": datetime.now().isoformat(),
+        "sessions": session_results
+    }
+    if user_name is not None:
+        user_doc["user_name"] = user_name
+
+    db.categorizations.replace_one({"user_id": user_id}, user_doc, upsert=True)
+
+    # Categorizations feed the cached stats and session payloads
+    response_cache.invalidate()
+
+
+class SessionCategorizer:
+    """
+    Categorizes chat sessions with Gemini on a bounded worker pool
+
+    Sessions are packed into multi-conversation prompts of at most
+    CATEGORIZATION_BATCH_MAX_SESSIONS sessions and CATEGORIZATION_BATCH_TOKEN_BUDGET
+    prompt tokens, so the instructions are paid for once per batch. Long sessions are
+    cut to CATEGORIZATION_SESSION_TOKEN_CAP tokens, keeping their start and end. Items
+    a batch answer misses or gets wrong are retried on their own.
+    With LOCAL_CLASSIFIER_ENABLED, sessions the local classifier labels with at least
+    LOCAL_CLASSIFIER_CONFIDENCE never reach Gemini.
+    Every Gemini call first takes its estimated tokens from the shared rate limiter, so
+    the pool runs as fast as the quota allows and no faster.
+    """
+
+    def __init__(
+        self,
+        gemini: Optional[GeminiService] = None,
+        max_workers: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        local_classifier: Optional[LocalCategoryClassifier] = None
+    ):
+        self.gemini = gemini or GeminiService()
+        self.max_workers = Config.CATEGORIZATION_MAX_WORKERS if max_workers is None else max_workers
+        self.rate_limiter = rate_limiter or gemini_rate_limiter
+        self.token_service = TokenService()
+        if local_classifier is None and Config.LOCAL_CLASSIFIER_ENABLED:
+            local_classifier = shared_local_classifier
+        self.local_classifier = local_classifier
+        self.local_confidence = Config.LOCAL_CLASSIFIER_CONFIDENCE
+        self.batch_token_budget = Config.CATEGORIZATION_BATCH_TOKEN_BUDGET
+        self.batch_max_sessions = Config.CATEGORIZATION_BATCH_MAX_SESSIONS
+        self.session_token_cap = Config.CATEGORIZATION_SESSION_TOKEN_CAP
+
+        self._stats_lock = threading.Lock()
+        self.gemini_calls = 0
+        self.batch_calls = 0
+        self.individual_retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.local_classified = 0
+        self.estimated_tokens = 0
+        self.rate_limited_seconds = 0.0
+        self.sessions_categorized = 0
+        self.completed_users = 0
+        self.failed_users = 0
+        self.elapsed_seconds = 0.0
+
+    def fit_messages(self, messages: List[str]) -> List[str]:
+        """Cut a session to session_token_cap tokens, alternately keeping messages from its start and end"""
+        return fit_session_messages(messages, self.session_token_cap, self.token_service)
+
+    def _call_gemini(self, prompt: str, expected_items: int = 1) -> str:
+        tokens = (
+            self.token_service.safe_token_count(prompt)
+            + Config.CATEGORIZATION_OUTPUT_TOKEN_ESTIMATE * expected_items
+        )
+        waited = self.rate_limiter.acquire(tokens)
+        with self._stats_lock:
+            self.gemini_calls += 1
+            self.estimated_tokens += tokens
+            self.rate_limited_seconds += waited
+        return self.gemini.generate_response(prompt, temperature=0.3)
+
+    def classify_messages(self, messages: List[str]) -> dict:
+        """Category result for one session's messages (Other/N.A with "error" on failure)"""
+        if not messages:
+            return {"primary_category": "Other", "sub_category": "N/A"}
+        try:
+            response = self._call_gemini(create_simple_prompt(self.fit_messages(messages)))
+            return validate_category_result(parse_category_response(response))
+        except Exception as e:
+            logger.error(f"Gemini categorization error: {e}")
+            return {"primary_category": "Other", "sub_category": "N/A", "error": str(e)}
+
+    def classify_batch(self, items: List[Tuple[str, List[str]]]) -> Dict[str, dict]:
+        """
+        Category results for several sessions' messages with one Gemini call
+
+        items are (id, messages) with already fitted messages. Items missing from the
+        answer or failing validation are retried one by one with the single-session prompt.
+        """
+        if len(items) == 1:
+            item_id, messages = items[0]
+            return {item_id: self.classify_messages(messages)}
+
+        answers = {}
+        try:
+            with self._stats_lock:
+                self.batch_calls += 1
+            parsed = parse_category_response(self._call_gemini(create_batch_prompt(items), len(items)))
+            if not isinstance(parsed, list):
+                raise ValueError("Batch response is not a JSON array")
+            expected_ids = {item_id for item_id, _ in items}
+            for entry in parsed:
+                item_id = str(entry.get("id")) if isinstance(entry, dict) else None
+                if item_id not in expected_ids or item_id in answers:
+                    continue
+                try:
+                    answers[item_id] = validate_category_result(entry)
+                except ValueError as e:
+                    logger.warning(f"Invalid batch answer for {item_id}: {e}")
+        except Exception as e:
+            logger.error(f"Gemini batch categorization error ({len(items)} sessions): {e}")
+
+        failed = [(item_id, messages) for item_id, messages in items if item_id not in answers]
+        if failed:
+            logger.info(f"Retrying {len(failed)}/{len(items)} batch items individually")
+            with self._stats_lock:
+                self.individual_retries += len(failed)
+            for item_id, messages in failed:
+                answers[item_id] = self.classify_messages(messages)
+        return answers
+
+    def pack_batches(self, items: List[Tuple[str, List[str]]]) -> List[List[Tuple[str, List[str]]]]:
+        """Group (id, fitted messages) items, in order, into batches within the session and token limits"""
+        batches, current, current_tokens = [], [], 0
+        for item_id, messages in items:
+            tokens = sum(self.token_service.safe_token_count(message) for message in messages)
+            if current and (len(current) >= self.batch_max_sessions or current_tokens + tokens > self.batch_token_budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((item_id, messages))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def categorize_session(self, user_id: str, session: dict) -> dict:
+        """Categorize one session (with its chats) into a stored session result"""
+        messages = session_messages(session)
+        return session_result(user_id, session, self.classify_messages(messages), session_content_hash(messages))
+
+    def categorize_users(
+        self,
+        sessions_by_user: Dict[str, List[dict]],
+        on_user_complete: Callable[[str, List[dict]], None],
+        previous_by_user: Optional[Dict[str, List[dict]]] = None
+    ) -> dict:
+        """
+        Categorize every session of every given user concurrently
+
+        `previous_by_user` holds each user's stored session results. A session whose
+        content hash (messages + PROMPT_VERSION) matches an error-free stored result reuses
+        that result, so only new or changed sessions reach Gemini.
+
+        `on_user_complete(user_id, session_results)` runs on the calling thread as soon as
+        all of a user's sessions are done (results in session order), so results are
+        persisted as they complete rather than at the end. An exception raised by the
+        callback is logged and does not stop the other users.
+        Returns throughput figures accumulated over every run of this categorizer.
+        """
+        start_time = time.monotonic()
+        pending = {user_id: len(sessions) for user_id, sessions in sessions_by_user.items() if sessions}
+        results: Dict[str, List[Optional[dict]]] = {user_id: [None] * count for user_id, count in pending.items()}
+        completed_users = 0
+        failed_users = 0
+
+        # Sessions without usable messages or with a cached result need no model call
+        keys = {}
+        items = []
+        cache_hits = 0
+        for user_id in pending:
+            cached = {
+                entry["content_hash"]: entry
+                for entry in (previous_by_user or {}).get(user_id, [])
+                if entry.get("content_hash") and "error" not in entry
+            }
+            for idx, session in enumerate(sessions_by_user[user_id]):
+                messages = session_messages(session)
+                if not messages:
+                    results[user_id][idx] = session_result(user_id, session, {"primary_category": "Other", "sub_category": "N/A"})
+                    pending[user_id] -= 1
+                    continue
+
+                content_hash = session_content_hash(messages)
+                if content_hash in cached:
+                    results[user_id][idx] = session_result(user_id, session, cached[content_hash], content_hash)
+                    pending[user_id] -= 1
+                    cache_hits += 1
+                else:
+                    item_id = str(len(keys) + 1)
+                    keys[item_id] = (user_id, idx, content_hash)
+                    items.append((item_id, self.fit_messages(messages)))
+
+        cache_misses = len(items)
+        local_classified = 0
+        if items and self.local_classifier is not None and self.local_classifier.is_available():
+            # Confident local predictions stay local; only the rest are escalated to Gemini
+            escalated = []
+            predictions = self.local_classifier.predict([messages for _, messages in items])
+            for (item_id, messages), (category_result, confidence) in zip(items, predictions):
+                if confidence < self.local_confidence:
+                    escalated.append((item_id, messages))
+                    continue
+                user_id, idx, content_hash = keys[item_id]
+                results[user_id][idx] = session_result(
+                    user_id,
+                    sessions_by_user[user_id][idx],
+                    {**category_result, "classified_by": "local", "confidence": round(confidence, 4)},
+                    content_hash
+                )
+                pending[user_id] -= 1
+                local_classified += 1
+            items = escalated
+
+        def complete_user(user_id):
+            nonlocal completed_users, failed_users
+            try:
+                on_user_complete(user_id, results.pop(user_id))
+                completed_users += 1
+            except Exception as e:
+                failed_users += 1
+                logger.error(f"Failed to store categorization for user {user_id}: {e}")
+
+        for user_id in [user_id for user_id, count in pending.items() if count == 0]:
+            complete_user(user_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="categorize") as executor:
+            futures = [executor.submit(self.classify_batch, batch) for batch in self.pack_batches(items)]
+
+            for future in as_completed(futures):
+                for item_id, category_result in future.result().items():
+                    user_id, idx, content_hash = keys[item_id]
+                    results[user_id][idx] = session_result(
+                        user_id, sessions_by_user[user_id][idx], category_result, content_hash
+                    )
+                    pending[user_id] -= 1
+                    if pending[user_id] == 0:
+                        complete_user(user_id)
+
+        session_count = sum(len(sessions) for sessions in sessions_by_user.values())
+        self.elapsed_seconds += time.monotonic() - start_time
+        self.sessions_categorized += session_count
+        self.completed_users += completed_users
+        self.failed_users += failed_users
+        self.cache_hits += cache_hits
+        self.cache_misses += cache_misses
+        self.local_classified += local_classified
+        lookups = self.cache_hits + self.cache_misses
+
+        elapsed = self.elapsed_seconds
+        throughput = {
+            "users": self.completed_users,
+            "failed_users": self.failed_users,
+            "sessions": self.sessions_categorized,
+            "gemini_calls": self.gemini_calls,
+            "batch_calls": self.batch_calls,
+            "individual_retries": self.individual_retries,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hits / lookups * 100, 2) if lookups else 0,
+            "local_classified": self.local_classified,
+            "escalated_to_gemini": self.cache_misses - self.local_classified,
+            "estimated_tokens": self.estimated_tokens,
+            "rate_limited_seconds": round(self.rate_limited_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "sessions_per_minute": round(self.sessions_categorized / elapsed * 60, 2) if elapsed > 0 else 0,
+            "workers": self.max_workers
+        }
+        logger.info(
+            f"Categorized {session_count} sessions for {completed_users} users in {len(futures)} requests, "
+            f"{cache_hits} reused from cache, {local_classified} classified locally "
+            f"({throughput['sessions_per_minute']} sessions/min overall)"
+        )
+        return throughput
@@ -0,0 +1,249 @@
+# app/services/session_store.py
+import traceback
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from app.config import Config
+from app.services.db import db
+from app.services.sessionization import sessionize_users
+from app.utility.timestamps import parse_chat_timestamp, timestamp_range_filter
+
+
+def chat_time_range_filter(start_time: datetime, end_time: datetime) -> dict:
+    """Filter on chats.timestamp covering [start_time, end_time] (session bounds are stored at ms precision)"""
+    return timestamp_range_filter(start_time, end_time + timedelta(milliseconds=1), end_inclusive=False)
+
+
+class SessionStore:
+    """
+    Incrementally maintained `sessions` collection
+
+    One row per (user, continuous chat activity) with a stable ObjectId that survives
+    new chats, deletions and re-runs of the analytics. Rows are maintained for a single
+    gap (Config.SESSION_GAP_MINUTES); other gaps are computed on demand. Chat inserts
+    and deletes only touch the collection while SESSION_STORE_WRITES_ENABLED is on.
+    """
+
+    def __init__(self, gap_minutes: Optional[int] = None):
+        self.gap_minutes = Config.SESSION_GAP_MINUTES if gap_minutes is None else gap_minutes
+        self.collection = db.sessions
+
+    @property
+    def gap(self) -> timedelta:
+        return timedelta(minutes=self.gap_minutes)
+
+    def record_chat(self, user_id: str, timestamp: Union[str, datetime], sender: Optional[str] = None) -> Optional[dict]:
+        """Extend, create or merge the user's session that a newly inserted chat belongs to"""
+        if not self.writes_enabled():
+            return None
+        try:
+            chat_time = parse_chat_timestamp(timestamp)
+            is_user = (sender or "User").lower() == "user"
+            now = datetime.utcnow()
+
+            # Extend the session this chat falls into (or within one gap of), or start one.
+            # Upserts racing for the same user can still create two rows; the merge folds them.
+            session = self.collection.find_one_and_update(
+                {
+                    "userId": str(user_id),
+                    "gapMinutes": self.gap_minutes,
+                    "startTime": {"$lte": chat_time + self.gap},
+                    "endTime": {"$gte": chat_time - self.gap},
+                },
+                {
+                    "$min": {"startTime": chat_time},
+                    "$max": {"endTime": chat_time},
+                    "$inc": {"chatCount": 1, "userMessages": int(is_user), "botMessages": int(not is_user)},
+                    "$set": {"updatedAt": now},
+                    "$setOnInsert": {"createdAt": now},
+                },
+                sort=[("endTime", DESCENDING)],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+
+            # A late chat can bridge two sessions; fold any neighbour now within the gap
+            return self._merge_neighbours(session)
+        except Exception as e:
+            print(f"⚠️ Failed to update sessions for user {user_id}: {e}")
+            traceback.print_exc()
+            return None
+
+    def _merge_neighbours(self, session: dict) -> dict:
+        neighbours = list(self.collection.find({
+            "_id": {"$ne": session["_id"]},
+            "userId": session["userId"],
+            "gapMinutes": self.gap_minutes,
+            "startTime": {"$lte": session["endTime"] + self.gap},
+            "endTime": {"$gte": session["startTime"] - self.gap},
+        }))
+        if not neighbours:
+            return session
+
+        # The earliest session keeps its id so references to it stay valid. Ties go to the
+        # lower id, so concurrent merges of the same rows pick the same survivor.
+        group = sorted([session] + neighbours, key=lambda s: (s["startTime"], s["_id"]))
+        survivor, absorbed = group[0], group[1:]
+
+        folded = {"startTime": survivor["startTime"], "endTime": survivor["endTime"], "chatCount": 0, "userMessages": 0, "botMessages": 0}
+        for row in absorbed:
+            # Only the merge that deletes a row adds its counts, so none are counted twice
+            deleted = self.collection.find_one_and_delete({"_id": row["_id"]})
+            if deleted is None:
+                continue
+            folded["startTime"] = min(folded["startTime"], deleted["startTime"])
+            folded["endTime"] = max(folded["endTime"], deleted["endTime"])
+            for field in ("chatCount", "userMessages", "botMessages"):
+                folded[field] += deleted.get(field, 0)
+
+        merged = self.collection.find_one_and_update(
+            {"_id": survivor["_id"]},
+            {
+                "$min": {"startTime": folded["startTime"]},
+                "$max": {"endTime": folded["endTime"]},
+                "$inc": {field: folded[field] for field in ("chatCount", "userMessages", "botMessages")},
+                "$set": {"updatedAt": datetime.utcnow()},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if merged is None:
+            # The survivor was folded into an earlier session meanwhile; recount from chats
+            self.rebuild_user(session["userId"])
+            return survivor
+        return merged
+
+    def rebuild_user(self, user_id: str) -> int:
+        """
+        Recompute a user's sessions from chats, keeping the ids of existing sessions
+
+        Used by the backfill and after chats are deleted (which can split a session).
+        Each recomputed session reuses the id of the first existing row it overlaps.
+        """
+        user_id = str(user_id)
+        computed = sessionize_users([user_id], self.gap_minutes).get(user_id, [])
+        existing = list(self.collection.find(
+            {"userId": user_id, "gapMinutes": self.gap_minutes}
+        ).sort("startTime", ASCENDING))
+
+        used_ids = set()
+        rows = []
+        for session in computed:
+            reused_id = next(
+                (
+                    row["_id"] for row in existing
+                    if row["_id"] not in used_ids
+                    and row["startTime"] <= session["endTime"]
+                    and row["endTime"] >= session["startTime"]
+                ),
+                None
+            )
+            if reused_id is not None:
+                used_ids.add(reused_id)
+            rows.append({
+                "_id": reused_id or ObjectId(),
+                "userId": user_id,
+                "gapMinutes": self.gap_minutes,
+                "startTime": session["startTime"],
+                "endTime": session["endTime"],
+                "chatCount": session["chatCount"],
+                "userMessages": session["userMessages"],
+                "botMessages": session["botMessages"],
+                "updatedAt": datetime.utcnow(),
+            })
+
+        stale_ids = [row["_id"] for row in existing if row["_id"] not in used_ids]
+        if stale_ids:
+            self.collection.delete_many({"_id": {"$in": stale_ids}})
+        for row in rows:
+            self.collection.replace_one({"_id": row["_id"]}, row, upsert=True)
+
+        return len(rows)
+
+    def get_users_sessions(self, user_ids: List[str]) -> Dict[str, List[dict]]:
+        """Precomputed sessions of many users in one query, in time order with 1-based sessionNumber"""
+        user_ids = [str(user_id) for user_id in user_ids]
+        sessions_by_user = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return sessions_by_user
+
+        cursor = self.collection.find(
+            {"userId": {"$in": user_ids}, "gapMinutes": self.gap_minutes}
+        ).sort([("userId", ASCENDING), ("startTime", ASCENDING)])
+        for row in cursor:
+            rows = sessions_by_user[row["userId"]]
+            row["sessionNumber"] = len(rows) + 1
+            rows.append(row)
+        return sessions_by_user
+
+    def get_user_sessions(self, user_id: str) -> List[dict]:
+        """Precomputed sessions of a user in time order, with 1-based sessionNumber"""
+        return self.get_users_sessions([user_id])[str(user_id)]
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """Get one precomputed session by its stable id"""
+        if not ObjectId.is_valid(session_id):
+            return None
+        return self.collection.find_one({"_id": ObjectId(session_id)})
+
+    def get_session_chats(self, session: dict) -> List[dict]:
+        """Fetch the chats belonging to a precomputed session"""
+        return list(db.chats.find(
+            {"userId": session["userId"], **chat_time_range_filter(session["startTime"], session["endTime"])},
+            {"message": 1, "sender": 1, "timestamp": 1}
+        ).sort("timestamp", ASCENDING))
+
+    def attach_chats_for_users(self, sessions_by_user: Dict[str, List[dict]]) -> Dict[ObjectId, List[dict]]:
+        """Fetch chats for the sessions of many users in a single query, keyed by session id"""
+        chats_by_session = {
+            session["_id"]: [] for sessions in sessions_by_user.values() for session in sessions
+        }
+        windows = {
+            user_id: sessions for user_id, sessions in sessions_by_user.items() if sessions
+        }
+        if not windows:
+            return chats_by_session
+
+        cursor = db.chats.find(
+            {"$or": [
+                {
+                    "userId": user_id,
+                    **chat_time_range_filter(sessions[0]["startTime"], sessions[-1]["endTime"]),
+                }
+                for user_id, sessions in windows.items()
+            ]},
+            {"userId": 1, "message": 1, "sender": 1, "timestamp": 1}
+        ).sort([("userId", ASCENDING), ("timestamp", ASCENDING)])
+
+        # Walk each user's chats and sessions in time order together
+        positions = {user_id: 0 for user_id in windows}
+        for chat in cursor:
+            sessions = windows[chat["userId"]]
+            index = positions[chat["userId"]]
+            chat_time = parse_chat_timestamp(chat["timestamp"])
+            # Session bounds are ms precision, chats can carry microseconds
+            while index < len(sessions) and chat_time >= sessions[index]["endTime"] + timedelta(milliseconds=1):
+                index += 1
+            positions[chat["userId"]] = index
+            if index < len(sessions) and chat_time >= sessions[index]["startTime"]:
+                chats_by_session[sessions[index]["_id"]].append(chat)
+
+        return chats_by_session
+
+    def attach_chats(self, user_id: str, sessions: List[dict]) -> Dict[ObjectId, List[dict]]:
+        """Fetch chats for many sessions of one user in a single query, keyed by session id"""
+        return self.attach_chats_for_users({str(user_id): sessions})
+
+    def writes_enabled(self) -> bool:
+        """Whether chat inserts and deletes keep the collection current"""
+        return Config.SESSION_STORE_WRITES_ENABLED
+
+    def is_current_for(self, session_gap_minutes: int) -> bool:
+        """Whether precomputed rows can serve a request for this gap"""
+        return Config.SESSION_STORE_READS_ENABLED and self.writes_enabled() and session_gap_minutes == self.gap_minutes
+
+
+# Shared store used by the chat controller, analytics routes and manage.py
+session_store = SessionStore()
@@ -0,0 +1,108 @@
+# app/services/sessionization.py
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from app.services.db import db
+
+
+def timestamp_to_date(field: str = "$timestamp") -> dict:
+    """Aggregation expression turning a chat timestamp (ISO string or BSON date) into a date, or null"""
+    return {"$convert": {"input": field, "to": "date", "onError": None, "onNull": None}}
+
+
+def build_session_pipeline(match: dict, session_gap_minutes: int = 30, include_chats: bool = False) -> List[dict]:
+    """
+    Build an aggregation pipeline that splits chats into sessions per user
+
+    A chat starts a new session when it is the user's first chat or the gap to the previous
+    chat is larger than `session_gap_minutes`. A running sum of those flags gives each chat
+    its 1-based session index, and chats are then grouped into one row per session.
+    """
+    gap_ms = session_gap_minutes * 60 * 1000
+
+    projection = {"userId": 1, "sender": 1, "ts": timestamp_to_date()}
+    if include_chats:
+        projection["message"] = 1
+
+    group = {
+        "_id": {"userId": "$userId", "sessionIndex": "$sessionIndex"},
+        "startTime": {"$min": "$ts"},
+        "endTime": {"$max": "$ts"},
+        "chatCount": {"$sum": 1},
+        "userMessages": {
+            "$sum": {"$cond": [{"$eq": [{"$toLower": {"$ifNull": ["$sender", "User"]}}, "user"]}, 1, 0]}
+        },
+    }
+    if include_chats:
+        group["chats"] = {"$push": {
+            "chatId": {"$toString": "$_id"},
+            "message": {"$ifNull": ["$message", ""]},
+            "sender": {"$ifNull": ["$sender", "User"]},
+            "ts": "$ts",
+        }}
+
+    return [
+        {"$match": match},
+        {"$project": projection},
+        {"$match": {"ts": {"$ne": None}}},
+        {"$setWindowFields": {
+            "partitionBy": "$userId",
+            "sortBy": {"ts": 1},
+            "output": {"prevTs": {"$shift": {"output": "$ts", "by": -1}}},
+        }},
+        {"$set": {"newSession": {"$cond": [
+            {"$or": [
+                {"$eq": ["$prevTs", None]},
+                {"$gt": [{"$subtract": ["$ts", "$prevTs"]}, gap_ms]},
+            ]},
+            1,
+            0,
+        ]}}},
+        {"$setWindowFields": {
+            "partitionBy": "$userId",
+            "sortBy": {"ts": 1},
+            "output": {"sessionIndex": {"$sum": "$newSession", "window": {"documents": ["unbounded", "current"]}}},
+        }},
+        {"$group": group},
+        {"$sort": {"_id.userId": 1, "_id.sessionIndex": 1}},
+    ]
+
+
+def sessionize_users(
+    user_ids: Iterable[str],
+    session_gap_minutes: int = 30,
+    include_chats: bool = False
+) -> Dict[str, List[dict]]:
+    """
+    Run server-side sessionization for one or more users
+
+    Returns {user_id: [session, ...]} ordered by session index. Each session has
+    sessionIndex, startTime, endTime, chatCount, userMessages, botMessages and,
+    with include_chats, the session's chats in time order.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return {}
+
+    match = {"userId": user_ids[0]} if len(user_ids) == 1 else {"userId": {"$in": user_ids}}
+    pipeline = build_session_pipeline(match, session_gap_minutes, include_chats)
+
+    sessions_by_user = defaultdict(list)
+    for row in db.chats.aggregate(pipeline, allowDiskUse=True):
+        session = {
+            "sessionIndex": row["_id"]["sessionIndex"],
+            "startTime": row["startTime"],
+            "endTime": row["endTime"],
+            "chatCount": row["chatCount"],
+            "userMessages": row["userMessages"],
+            "botMessages": row["chatCount"] - row["userMessages"],
+        }
+        if include_chats:
+            # $push keeps input order, but that is not guaranteed after $group, so sort explicitly
+            chats = sorted(row["chats"], key=lambda chat: chat["ts"])
+            for chat in chats:
+                del chat["ts"]
+            session["chats"] = chats
+        sessions_by_user[row["_id"]["userId"]].append(session)
+
+    return dict(sessions_by_user)
@@ -0,0 +1,182 @@
+# app/services/test_cohort_analytics.py
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import cohort_analytics
+from app.services.cohort_analytics import WeeklyActivityMatrix
+
+FIRST_WEEK = date(2024, 1, 1)  # A Monday
+LAST_WEEK = date(2024, 1, 8)
+
+
+class FakeCursor(list):
+    """Rows are given already sorted by (userId, timestamp), as the query asks"""
+
+    def sort(self, keys):
+        assert keys == [("userId", 1), ("timestamp", 1)]
+        return self
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    """Chats returned by db.chats.find; the test fills the list"""
+    rows = []
+    fake_db = SimpleNamespace(chats=SimpleNamespace(find=lambda query, projection: FakeCursor(rows)))
+    monkeypatch.setattr(cohort_analytics, "db", fake_db)
+    return rows
+
+
+def chat(user_id, *args):
+    return {"userId": user_id, "timestamp": datetime(*args)}
+
+
+def load(user_ids=("u1", "u2"), session_gap_minutes=30):
+    return WeeklyActivityMatrix(list(user_ids), FIRST_WEEK, LAST_WEEK, session_gap_minutes).load()
+
+
+def test_gaps_within_threshold_add_to_session_minutes(chats):
+    chats += [
+        chat("u1", 2024, 1, 1, 10, 0),
+        chat("u1", 2024, 1, 1, 10, 10),
+        chat("u1", 2024, 1, 1, 10, 40),  # 30 min gap: still the same session
+    ]
+    matrix = load()
+
+    assert matrix.chats[0].tolist() == [3, 0]
+    assert matrix.duration[0].tolist() == [40.0, 0.0]
+
+
+def test_gap_over_threshold_starts_a_new_session(chats):
+    chats += [
+        chat("u1", 2024, 1, 1, 10, 0),
+        chat("u1", 2024, 1, 1, 10, 20),
+        chat("u1", 2024, 1, 1, 10, 51),  # 31 min gap
+        chat("u1", 2024, 1, 1, 11, 1),
+    ]
+    matrix = load()
+
+    assert matrix.chats[0, 0] == 4
+    assert matrix.duration[0, 0] == pytest.approx(30.0)
+
+
+def test_session_gap_is_configurable(chats):
+    chats += [chat("u1", 2024, 1, 1, 10, 0), chat("u1", 2024, 1, 1, 10, 45)]
+
+    assert load(session_gap_minutes=30).duration[0, 0] == 0.0
+    assert load(session_gap_minutes=60).duration[0, 0] == pytest.approx(45.0)
+
+
+def test_sessions_do_not_span_weeks_or_users(chats):
+    chats += [
+        chat("u1", 2024, 1, 7, 23, 50),  # Sunday, week 0
+        chat("u1", 2024, 1, 8, 0, 5),    # Monday, week 1: 15 min later but not counted
+        chat("u2", 2024, 1, 8, 0, 10),   # Another user 5 min later: not counted either
+        chat("u2", 2024, 1, 8, 0, 25),
+    ]
+    matrix = load()
+
+    assert matrix.chats.tolist() == [[1, 1], [0, 2]]
+    assert matrix.duration.tolist() == [[0.0, 0.0], [0.0, 15.0]]
+
+
+def test_first_and_last_chat_per_user_week(chats):
+    chats += [
+        chat("u1", 2024, 1, 2, 9, 0),
+        chat("u1", 2024, 1, 4, 18, 30),
+        chat("u1", 2024, 1, 9, 12, 0),
+        chat("u2", 2024, 1, 3, 8, 15),
+    ]
+    matrix = load()
+
+    assert matrix.first_chat == {
+        (0, 0): "2024-01-02T09:00:00",
+        (0, 1): "2024-01-09T12:00:00",
+        (1, 0): "2024-01-03T08:15:00",
+    }
+    assert matrix.last_chat == {
+        (0, 0): "2024-01-04T18:30:00",
+        (0, 1): "2024-01-09T12:00:00",
+        (1, 0): "2024-01-03T08:15:00",
+    }
+
+
+def test_unparseable_timestamps_are_ignored(chats):
+    chats += [
+        {"userId": "u1", "timestamp": "not a timestamp"},  # Strings sort before dates
+        chat("u1", 2024, 1, 1, 10, 0),
+        chat("u1", 2024, 1, 1, 10, 5),
+    ]
+    matrix = load()
+
+    assert matrix.chats[0, 0] == 2
+    assert matrix.duration[0, 0] == pytest.approx(5.0)
+
+
+def test_no_users_skips_the_query(monkeypatch):
+    monkeypatch.setattr(cohort_analytics, "db", None)
+    matrix = load(user_ids=())
+
+    assert matrix.chats.shape == (0, 2)
+
+
+
+class FakeRollupCursor(list):
+    def sort(self, keys):
+        assert keys == [("userId", 1), ("date", 1)]
+        return self
+
+
+def rollup(user_id, day, chat_count, session_minutes, first, last):
+    return {
+        "userId": user_id,
+        "date": day,
+        "chatCount": chat_count,
+        "sessionMinutes": session_minutes,
+        "firstChatTime": first,
+        "lastChatTime": last,
+    }
+
+
+@pytest.fixture
+def rollups(monkeypatch):
+    """Rows returned by db.user_daily_stats.find, given in (userId, date) order"""
+    rows = []
+    fake_db = SimpleNamespace(
+        chats=SimpleNamespace(find=lambda query, projection: FakeCursor([chat("u1", 2024, 1, 3, 10, 0)])),
+        user_daily_stats=SimpleNamespace(find=lambda query, projection: FakeRollupCursor(rows)),
+    )
+    monkeypatch.setattr(cohort_analytics, "db", fake_db)
+    return rows
+
+
+def test_rollups_are_summed_per_week(rollups):
+    rollups += [
+        rollup("u1", "2024-01-02", 3, 12.5, "2024-01-02T09:00:00", "2024-01-02T09:20:00"),
+        rollup("u1", "2024-01-05", 2, 4.0, "2024-01-05T18:00:00", "2024-01-05T18:04:00"),
+        rollup("u1", "2024-01-09", 1, 0.0, "2024-01-09T12:00:00", "2024-01-09T12:00:00"),
+        rollup("u2", "2024-01-08", 4, 30.0, "2024-01-08T00:05:00", "2024-01-08T00:35:00"),
+    ]
+    matrix = WeeklyActivityMatrix(["u1", "u2"], FIRST_WEEK, LAST_WEEK).load_from_rollups()
+
+    assert matrix.chats.tolist() == [[5, 1], [0, 4]]
+    assert matrix.duration.tolist() == [[16.5, 0.0], [0.0, 30.0]]
+    assert matrix.first_chat[(0, 0)] == "2024-01-02T09:00:00"
+    assert matrix.last_chat[(0, 0)] == "2024-01-05T18:04:00"
+    assert matrix.first_chat[(1, 1)] == "2024-01-08T00:05:00"
+
+
+def test_load_weekly_activity_reads_rollups_when_enabled(rollups, monkeypatch):
+    rollups.append(rollup("u1", "2024-01-03", 2, 5.0, "2024-01-03T10:00:00", "2024-01-03T10:05:00"))
+    gap = cohort_analytics.daily_stats.gap_minutes
+
+    monkeypatch.setattr(cohort_analytics.Config, "DAILY_STATS_ROLLUP_READS_ENABLED", False)
+    assert cohort_analytics.load_weekly_activity(["u1"], FIRST_WEEK, LAST_WEEK).chats.tolist() == [[1, 0]]
+
+    monkeypatch.setattr(cohort_analytics.Config, "DAILY_STATS_ROLLUP_READS_ENABLED", True)
+    assert cohort_analytics.load_weekly_activity(["u1"], FIRST_WEEK, LAST_WEEK).chats.tolist() == [[2, 0]]
+
+    # Rollups only hold the configured gap; any other gap is computed from chats
+    other_gap = cohort_analytics.load_weekly_activity(["u1"], FIRST_WEEK, LAST_WEEK, session_gap_minutes=gap + 15)
+    assert other_gap.chats.tolist() == [[1, 0]]
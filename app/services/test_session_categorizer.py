@@ -0,0 +1,52 @@
+# app/services/test_session_categorizer.py
+import pytest
+
+from app.services.session_categorizer import parse_category_response, validate_category_result
+
+
+@pytest.mark.parametrize("result, expected", [
+    (
+        {"primary_category": "Emotional Distress", "sub_category": "Loneliness"},
+        {"primary_category": "Emotional Distress", "sub_category": "Loneliness"},
+    ),
+    (
+        {"primary_category": "Emotional Distress", "sub_category": "Boredom"},
+        {"primary_category": "Emotional Distress", "sub_category": "Other"},
+    ),
+    (
+        {"primary_category": "Emotional Distress"},
+        {"primary_category": "Emotional Distress", "sub_category": "Other"},
+    ),
+    (
+        {"primary_category": "Romantic", "sub_category": "Loneliness"},
+        {"primary_category": "Romantic", "sub_category": "N/A"},
+    ),
+    (
+        {"primary_category": "General Chat", "sub_category": None, "session_id": "s1"},
+        {"primary_category": "General Chat", "sub_category": "N/A"},
+    ),
+])
+def test_valid_results_are_normalized(result, expected):
+    assert validate_category_result(result) == expected
+
+
+@pytest.mark.parametrize("result", [
+    None,
+    "General Chat",
+    ["General Chat"],
+    {},
+    {"primary_category": "general chat"},
+    {"primary_category": "Small Talk", "sub_category": "N/A"},
+])
+def test_off_schema_results_raise_value_error(result):
+    with pytest.raises(ValueError):
+        validate_category_result(result)
+
+
+def test_parse_category_response_strips_code_fences():
+    response = '```json\n{"primary_category": "Life Update", "sub_category": "N/A"}\n```'
+
+    assert validate_category_result(parse_category_response(response)) == {
+        "primary_category": "Life Update",
+        "sub_category": "N/A",
+    }
@@ -0,0 +1,105 @@
+# app/services/timestamp_migration.py
+import threading
+import time
+import traceback
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.config import Config
+from app.services.db import db
+from app.utility.timestamps import parse_chat_timestamp
+
+
+def migrate_chat_timestamps(
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    stop_event: Optional[threading.Event] = None
+) -> dict:
+    """
+    Convert ISO-string chats.timestamp values into BSON dates
+
+    Walks string-typed chats newest first, batch by batch, so it can run next to live
+    traffic and be stopped and restarted at any time. Going newest first keeps every
+    remaining string timestamp older than every date one (new chats are already dates),
+    which is what keeps `sort("timestamp")` chronological while the migration runs.
+    Each update is conditional on the old string value, so a concurrent write is never
+    overwritten.
+    """
+    if not Config.CHAT_TIMESTAMPS_NATIVE:
+        # New chats would still be written as strings, newer than the migrated dates
+        print("⚠️ Timestamp migration skipped: enable CHAT_TIMESTAMPS_NATIVE first")
+        return {"skipped": True}
+
+    batch_size = Config.CHAT_TIMESTAMP_MIGRATION_BATCH_SIZE if batch_size is None else batch_size
+    pause_seconds = Config.CHAT_TIMESTAMP_MIGRATION_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+
+    stats = {"scanned": 0, "migrated": 0, "unparseable": 0, "summaries_migrated": 0}
+    last_chat = None
+    start_time = time.time()
+
+    while not (stop_event and stop_event.is_set()):
+        query = {"timestamp": {"$type": "string"}}
+        if last_chat is not None:
+            # Keyset on (timestamp, _id) descending; unparseable strings stay behind the cursor
+            query["$or"] = [
+                {"timestamp": {"$lt": last_chat["timestamp"]}},
+                {"timestamp": last_chat["timestamp"], "_id": {"$lt": last_chat["_id"]}},
+            ]
+
+        batch = list(
+            db.chats.find(query, {"timestamp": 1})
+            .sort([("timestamp", -1), ("_id", -1)])
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for chat in batch:
+            moment = parse_chat_timestamp(chat["timestamp"])
+            if moment is None:
+                stats["unparseable"] += 1
+                continue
+            operations.append(UpdateOne(
+                {"_id": chat["_id"], "timestamp": chat["timestamp"]},
+                {"$set": {"timestamp": moment}}
+            ))
+
+        if operations:
+            # Ordered, so a batch is also converted newest first
+            stats["migrated"] += db.chats.bulk_write(operations, ordered=True).modified_count
+        stats["scanned"] += len(batch)
+        last_chat = batch[-1]
+
+        print(f"🕒 Timestamp migration: {stats['migrated']} chats migrated ({stats['scanned']} scanned)")
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    # Summary checkpoints hold a copy of the last summarized chat's timestamp
+    for summary in db.summaries.find({"lastSummarizedTimestamp": {"$type": "string"}}, {"lastSummarizedTimestamp": 1}):
+        moment = parse_chat_timestamp(summary["lastSummarizedTimestamp"])
+        if moment is not None:
+            db.summaries.update_one({"_id": summary["_id"]}, {"$set": {"lastSummarizedTimestamp": moment}})
+            stats["summaries_migrated"] += 1
+
+    stats["elapsed_seconds"] = round(time.time() - start_time, 1)
+    print(f"✅ Timestamp migration finished: {stats}")
+    return stats
+
+
+def start_background_timestamp_migration() -> Optional[threading.Thread]:
+    """Run the migration in a daemon thread when enabled in config"""
+    if not Config.CHAT_TIMESTAMP_MIGRATION_ON_STARTUP:
+        return None
+
+    def run():
+        try:
+            migrate_chat_timestamps()
+        except Exception as e:
+            print(f"❌ Timestamp migration failed: {e}")
+            traceback.print_exc()
+
+    thread = threading.Thread(target=run, name="chat-timestamp-migration", daemon=True)
+    thread.start()
+    return thread
@@ -3,17 +3,17 @@ from flask_socketio import SocketIO
 from flask import request
 from app.services.db import db
 from datetime import datetime
-from app.services.claude import get_claude_reply
-from app.socket.controller.chat_controller import fetch_chat_history,save_user_message
-from app.memory.memory_service import MemoryService
+from app.services.claude import get_claude_reply, prefetch_conversation_context
+from app.socket.controller.chat_controller import fetch_chat_history,fetch_chat_history_page,save_user_message
 from app.services.aws_bucket import handle_voice_upload
 from app.routes.speech_to_text import transcribe_audio
 import requests
 
+CHAT_HISTORY_DEFAULT_PAGE_SIZE = 50
+
 def register_chat_events(socketio: SocketIO):
     print("SocketIO initialized:", socketio)
     chats = db.chats
-    memory_service = MemoryService()
 
     # Socket Connected 
     @socketio.on('connect')
@@ -26,19 +26,51 @@ def register_chat_events(socketio: SocketIO):
         print(f"Client disconnected: {request.sid}")
 
     # Socket to Fetch the chat history 
+    # Optional: "limit" (page size), "before" (scroll-back cursor), "since" (delta sync cursor).
+    # Without any of them the whole history is sent, as older clients expect.
     @socketio.on("fetch_chat_history")
     def handle_fetch_chat_history(data):
         try:
             user_id = data.get("userId")
             character_id = data.get("characterId")
-            messages_list = fetch_chat_history(user_id, character_id)
-
-            socketio.emit("receive_chat_history", {
-                "messages": messages_list
-            }, to=request.sid)
+            before = data.get("before")
+            since = data.get("since")
+            limit = data.get("limit")
+
+            if before or since or limit:
+                try:
+                    page = fetch_chat_history_page(
+                        user_id,
+                        character_id,
+                        limit=limit or CHAT_HISTORY_DEFAULT_PAGE_SIZE,
+                        before=before,
+                        since=since
+                    )
+                except ValueError as e:
+                    socketio.emit("chat_history_error", {"error": str(e)}, to=request.sid)
+                    return
+                messages_list = page["messages"]
+                socketio.emit("receive_chat_history", page, to=request.sid)
+            else:
+                messages_list = fetch_chat_history(user_id, character_id)
+                socketio.emit("receive_chat_history", {
+                    "messages": messages_list
+                }, to=request.sid)
 
             print(f"📤 Sent {len(messages_list)} messages to client {request.sid}")
 
+            # Scroll-back pages hold older messages, no need to re-warm caches for them
+            if before:
+                return
+
+            # Warm user, prompt and recent-window caches before the first trigger_ai_reply
+            socketio.start_background_task(
+                prefetch_conversation_context,
+                user_id,
+                character_id,
+                data.get("characterName")
+            )
+
         except Exception as e:
             print(f"❌ Error fetching chat history: {e}")
             socketio.emit("chat_history_error", {
@@ -60,12 +92,9 @@ def register_chat_events(socketio: SocketIO):
                 raise ValueError("Missing required fields")
 
             # Save user message to database
+            # (memory is written once per turn, together with the AI reply, in get_claude_reply)
             message_data = save_user_message(user_id, character_id, message)
             
-            # Add user message to Mem0 memory
-            memory_service.add_message_to_memory(user_id, character_id, message, "User")
-            print(f"💾 User message added to Mem0 memory: {message[:50]}...")
-            
             socketio.emit("message_sent", message_data, to=request.sid)
 
         except Exception as e:
@@ -155,10 +184,7 @@ def register_chat_events(socketio: SocketIO):
                 message=transcribed_text,
                 audio_url=audio_url
             )
-            
-            # Add to memory
-            memory_service.add_message_to_memory(user_id, character_id, transcribed_text, "User")
-            print(f"💾 Voice message added to Mem0 memory: {transcribed_text[:50]}...")
+            # Memory is written once per turn, together with the AI reply, in get_claude_reply
 
             # Emit confirmation back to frontend
             socketio.emit("voice_message_saved", {
@@ -265,10 +291,6 @@ def register_chat_events(socketio: SocketIO):
                     )
                     print(f"Message Data: {message_data}")
 
-                    # Add to memory
-                    memory_service.add_message_to_memory(user_id, character_id, transcribed_text, "User")
-                    print(f"💾 Audio message added to Mem0 memory: {transcribed_text[:50]}...")
-
                     # Emit user message back to frontend
                     socketio.emit("message_sent", {
                         "userId": message_data["userId"],
@@ -1,8 +1,29 @@
 from datetime import datetime
+from bson import ObjectId
+from app.config import Config
 from app.services.db import db
-from app.memory.summary import update_summary_with_new_message
+from app.memory.summary_scheduler import summary_scheduler
+from app.utility.claude_reply import append_to_cached_recent_chats
+from app.services.session_store import session_store
+from app.services.daily_stats import daily_stats
+from app.utility.timestamps import Timestamp, chat_timestamp_for_storage, format_chat_timestamp
+from app.utility.chat_cursor import chat_keyset_filter, decode_chat_cursor, encode_chat_cursor
 from typing import Optional
 
+def _insert_chat(message_data: dict, created_at: datetime):
+    """Insert a chat with a native timestamp; message_data keeps the ISO string used in payloads"""
+    document = {**message_data, "timestamp": chat_timestamp_for_storage(created_at)}
+    inserted_id = db.chats.insert_one(document).inserted_id
+    if Config.SUMMARY_UPDATES_ENABLED and document.get("message"):
+        update_conversation_summary(
+            document["userId"],
+            document["characterId"],
+            document["message"],
+            chat_id=inserted_id,
+            timestamp=document["timestamp"]
+        )
+    return inserted_id
+
 # Save User Message
 def save_user_message(
     user_id: str, 
@@ -11,7 +32,8 @@ def save_user_message(
     image_url: Optional[str] = None,
     audio_url: Optional[str] = None
 ) -> dict:
-    timestamp = datetime.utcnow().isoformat()
+    created_at = datetime.utcnow()
+    timestamp = created_at.isoformat()
     message_data = {
         "userId": str(user_id),
         "characterId": str(character_id),
@@ -30,8 +52,11 @@ def save_user_message(
         # If none of the content fields are provided, raise an error
         raise ValueError("At least one of message, image_url, or audio_url must be provided")
 
-    result = db.chats.insert_one(message_data)
-    message_data["_id"] = str(result.inserted_id)  # Convert ObjectId to string
+    inserted_id = _insert_chat(message_data, created_at)
+    message_data["_id"] = str(inserted_id)  # Convert ObjectId to string
+    append_to_cached_recent_chats(message_data)
+    session_store.record_chat(user_id, created_at, "user")
+    daily_stats.record_chat(user_id, created_at, "user")
     return message_data
 
 # Save AI Message
@@ -41,7 +66,8 @@ def save_ai_message(
     message: str,
     image_url: Optional[str] = None
 ) -> dict:
-    timestamp = datetime.utcnow().isoformat()
+    created_at = datetime.utcnow()
+    timestamp = created_at.isoformat()
     message_data = {
         "userId": str(user_id),
         "characterId": str(character_id),
@@ -49,9 +75,27 @@ def save_ai_message(
         "message": message,
         "timestamp": timestamp
     }
-    db.chats.insert_one(message_data)
+    message_data["_id"] = _insert_chat(message_data, created_at)
+    append_to_cached_recent_chats(message_data)
+    session_store.record_chat(user_id, created_at, "ai")
+    daily_stats.record_chat(user_id, created_at, "ai")
     return message_data
 
+# Largest page a client may request from fetch_chat_history_page
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+def _format_history_message(msg: dict) -> dict:
+    return {
+        "_id": str(msg["_id"]),
+        "userId": msg["userId"],
+        "characterId": msg["characterId"],
+        "sender": msg["sender"],
+        "message": msg.get("message"),
+        "image_url": msg.get("image_url"),  # Will be None if not present
+        "audio_url": msg.get("audio_url"),  # Will be None if not present
+        "timestamp": format_chat_timestamp(msg["timestamp"])
+    }
+
 # Fetch Chat History
 def fetch_chat_history(
     user_id: str, 
@@ -65,27 +109,72 @@ def fetch_chat_history(
     messages = db.chats.find({
         "userId": str(user_id),
         "characterId": str(character_id)
-    }).sort("timestamp", 1)
+    }).sort([("timestamp", 1), ("_id", 1)])
     
-    return [{
-        "userId": msg["userId"],
-        "characterId": msg["characterId"],
-        "sender": msg["sender"],
-        "message": msg.get("message"),
-        "image_url": msg.get("image_url"),  # Will be None if not present
-        "audio_url": msg.get("audio_url"),  # Will be None if not present
-        "timestamp": msg["timestamp"]
-    } for msg in messages]
+    return [_format_history_message(msg) for msg in messages]
+
+def fetch_chat_history_page(
+    user_id: str,
+    character_id: str,
+    limit: int,
+    before: Optional[str] = None,
+    since: Optional[str] = None
+) -> dict:
+    """
+    One page of a conversation, oldest message first.
+
+    - before: cursor from a previous page; returns the `limit` messages just older than it (scroll-back)
+    - since: cursor from a previous page; returns up to `limit` messages newer than it (delta sync)
+    - neither: the latest `limit` messages
+
+    Returns {"messages", "hasMore", "before", "since"}: `before` points at the oldest message
+    returned and `since` at the newest, so clients keep the oldest `before` for scroll-back
+    and the newest `since` for the next delta sync. `hasMore` tells whether more messages
+    exist in the requested direction. Raises ValueError for missing ids or a bad cursor.
+    """
+    if not all([user_id, character_id]):
+        raise ValueError("Missing userId or characterId")
+    if before and since:
+        raise ValueError("Pass either before or since, not both")
+
+    limit = max(1, min(int(limit), CHAT_HISTORY_MAX_PAGE_SIZE))
+    query = {"userId": str(user_id), "characterId": str(character_id)}
+
+    if since:
+        query.update(chat_keyset_filter(decode_chat_cursor(since), descending=False))
+        chats = list(db.chats.find(query).sort([("timestamp", 1), ("_id", 1)]).limit(limit + 1))
+        has_more = len(chats) > limit
+        chats = chats[:limit]
+    else:
+        if before:
+            query.update(chat_keyset_filter(decode_chat_cursor(before), descending=True))
+        chats = list(db.chats.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1))
+        has_more = len(chats) > limit
+        chats = chats[:limit][::-1]
+
+    return {
+        "messages": [_format_history_message(msg) for msg in chats],
+        "hasMore": has_more,
+        "before": encode_chat_cursor(chats[0]) if chats else before,
+        "since": encode_chat_cursor(chats[-1]) if chats else since,
+    }
 
 def update_conversation_summary(
     user_id: str, 
     character_id: str, 
     new_message: str,
-    image_url: Optional[str] = None
-) -> str:
-    """Update conversation summary for a user and character."""
-    return update_summary_with_new_message(
-        user_id=user_id,
-        character_id=character_id,
-        new_message=new_message
+    image_url: Optional[str] = None,
+    chat_id: Optional[ObjectId] = None,
+    timestamp: Optional[Timestamp] = None
+) -> None:
+    """
+    Queue a message for the next debounced summary update of a user and character.
+
+    Called for every saved chat with text; `timestamp` is the stored value, so it can
+    serve as the summary checkpoint.
+    """
+    summary_scheduler.schedule(
+        user_id,
+        character_id,
+        {"message": new_message, "_id": chat_id, "timestamp": timestamp}
     )
\ No newline at end of file
@@ -0,0 +1,26 @@
+from flask_socketio import SocketIO, join_room, leave_room
+from flask import request
+from app.services.job_engine import job_engine, serialize_job
+
+
+def register_job_events(socketio: SocketIO):
+    # Progress of background jobs is emitted as "job_progress" to the room "job:<id>"
+    job_engine.attach_socketio(socketio)
+
+    @socketio.on("watch_job")
+    def handle_watch_job(data):
+        job_id = (data or {}).get("jobId")
+        job = job_engine.get(job_id) if job_id else None
+        if not job:
+            socketio.emit("job_error", {"jobId": job_id, "error": "Job not found"}, to=request.sid)
+            return
+
+        join_room(f"job:{job_id}")
+        # Current state first, so a late watcher does not wait for the next event
+        socketio.emit("job_progress", {"type": "snapshot", "jobId": job_id, "job": serialize_job(job)}, to=request.sid)
+
+    @socketio.on("unwatch_job")
+    def handle_unwatch_job(data):
+        job_id = (data or {}).get("jobId")
+        if job_id:
+            leave_room(f"job:{job_id}")
@@ -0,0 +1,111 @@
+# app/utility/audio_conversion.py
+"""
+Voice note transcoding to 16 kHz mono 16-bit WAV (what Azure Speech expects)
+
+Audio is streamed through ffmpeg's stdin and stdout, so nothing touches the disk. ffmpeg
+cannot seek back on a pipe to fill in the RIFF and data chunk sizes, so they are patched
+in afterwards. Containers that need a seekable input (e.g. MP4/M4A with the index at the
+end) fail on a pipe; those fall back to the temp-file path.
+"""
+import os
+import struct
+import subprocess
+import tempfile
+import time
+from typing import List, Optional
+
+from app.config import Config
+
+WAV_OUTPUT_ARGS = [
+    '-ar', '16000',                 # Sample rate: 16kHz (recommended for speech)
+    '-ac', '1',                     # Mono channel
+    '-sample_fmt', 's16',           # 16-bit signed integer
+    '-f', 'wav',                    # Output format WAV
+]
+
+
+class AudioConversionError(Exception):
+    """ffmpeg is missing, failed or timed out"""
+
+
+class AudioDecodeError(AudioConversionError):
+    """ffmpeg ran but could not turn the input into WAV"""
+
+
+def _ffmpeg_command(source: str, destination: str) -> List[str]:
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', source, *WAV_OUTPUT_ARGS, '-y', destination]
+
+
+def fix_wav_header(wav_data: bytes) -> bytes:
+    """Set the RIFF and data chunk sizes of a WAV written to a non-seekable output"""
+    if len(wav_data) < 12 or wav_data[:4] != b'RIFF' or wav_data[8:12] != b'WAVE':
+        return wav_data
+
+    wav = bytearray(wav_data)
+    struct.pack_into('<I', wav, 4, len(wav) - 8)
+
+    # Walk the chunks to "data" (ffmpeg may write LIST metadata before it)
+    offset = 12
+    while offset + 8 <= len(wav):
+        chunk_id = bytes(wav[offset:offset + 4])
+        if chunk_id == b'data':
+            struct.pack_into('<I', wav, offset + 4, len(wav) - offset - 8)
+            break
+        chunk_size = struct.unpack_from('<I', wav, offset + 4)[0]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return bytes(wav)
+
+
+def _run_ffmpeg(command: List[str], input_data: Optional[bytes], timeout: float) -> bytes:
+    try:
+        result = subprocess.run(command, input=input_data, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise AudioConversionError(f"Audio conversion timed out after {timeout}s")
+    except FileNotFoundError:
+        raise AudioConversionError("FFmpeg not installed. Please install FFmpeg to convert audio files.")
+
+    if result.returncode != 0:
+        raise AudioDecodeError(f"FFmpeg conversion failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def convert_to_wav_piped(audio_data: bytes, timeout: Optional[float] = None) -> bytes:
+    """Transcode in memory through ffmpeg's stdin/stdout"""
+    timeout = Config.AUDIO_CONVERSION_TIMEOUT_SECONDS if timeout is None else timeout
+    wav_data = _run_ffmpeg(_ffmpeg_command('pipe:0', 'pipe:1'), audio_data, timeout)
+    if not wav_data:
+        raise AudioDecodeError("FFmpeg produced no audio")
+    return fix_wav_header(wav_data)
+
+
+def convert_to_wav_via_temp_files(audio_data: bytes, timeout: Optional[float] = None) -> bytes:
+    """Transcode through an input and an output temp file (for inputs ffmpeg must seek in)"""
+    timeout = Config.AUDIO_CONVERSION_TIMEOUT_SECONDS if timeout is None else timeout
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, 'input')
+        output_path = os.path.join(temp_dir, 'output.wav')
+        with open(input_path, 'wb') as input_file:
+            input_file.write(audio_data)
+        _run_ffmpeg(_ffmpeg_command(input_path, output_path), None, timeout)
+        with open(output_path, 'rb') as output_file:
+            return output_file.read()
+
+
+def convert_to_wav(audio_data: bytes, timeout: Optional[float] = None) -> bytes:
+    """
+    Convert audio (Opus/Ogg, MP3, AAC, ...) to WAV for Azure Speech Services
+
+    Raises AudioConversionError if ffmpeg is missing, times out or cannot decode the audio.
+    """
+    conversion_start_time = time.time()
+    try:
+        wav_data = convert_to_wav_piped(audio_data, timeout)
+        path = "piped"
+    except AudioDecodeError as e:
+        print(f"⚠️ Piped conversion failed ({e}); retrying with temp files")
+        wav_data = convert_to_wav_via_temp_files(audio_data, timeout)
+        path = "temp files"
+
+    print(f"✅ Converted {len(audio_data)} bytes to {len(wav_data)} bytes of WAV ({path}) "
+          f"in {time.time() - conversion_start_time:.2f}s")
+    return wav_data
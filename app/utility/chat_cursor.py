@@ -0,0 +1,70 @@
+# app/utility/chat_cursor.py
+"""
+Keyset (timestamp, _id) cursors over chats
+
+A cursor records the exact stored `timestamp` of the last chat a client has seen (date or
+ISO string, see app/utility/timestamps.py) together with its `_id`. The next page starts
+strictly after that pair in the requested sort order, so pages never skip or repeat chats
+that share a timestamp, and no offset has to be skipped over on the server.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import NamedTuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.utility.timestamps import Timestamp
+
+
+class ChatCursor(NamedTuple):
+    timestamp: Timestamp
+    chat_id: ObjectId
+
+
+def encode_chat_cursor(chat: dict) -> str:
+    """Opaque, URL-safe cursor pointing at `chat` (needs its raw `_id` and `timestamp`)"""
+    timestamp = chat["timestamp"]
+    payload = {
+        "t": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        "d": isinstance(timestamp, datetime),
+        "id": str(chat["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_chat_cursor(token: str) -> ChatCursor:
+    """Parse a cursor from encode_chat_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp = datetime.fromisoformat(payload["t"]) if payload["d"] else str(payload["t"])
+        return ChatCursor(timestamp, ObjectId(payload["id"]))
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+def chat_keyset_filter(cursor: ChatCursor, descending: bool = True) -> dict:
+    """
+    Query fragment matching chats after `cursor` when sorted by (timestamp, _id)
+
+    Range operators only match values of the same BSON type, and all string timestamps
+    sort before all date ones, so crossing the string/date boundary is spelled out. This
+    matches chronological order because the migration keeps every remaining string
+    timestamp older than every date one (see app/utility/timestamps.py).
+    Returns {"$or": [...]}; combine it with other `$or` conditions through `$and`.
+    """
+    range_operator = "$lt" if descending else "$gt"
+    conditions = [
+        {"timestamp": {range_operator: cursor.timestamp}},
+        {"timestamp": cursor.timestamp, "_id": {range_operator: cursor.chat_id}},
+    ]
+
+    is_date = isinstance(cursor.timestamp, datetime)
+    if descending and is_date:
+        conditions.append({"timestamp": {"$type": "string"}})
+    elif not descending and not is_date:
+        conditions.append({"timestamp": {"$type": "date"}})
+
+    return {"$or": conditions}
@@ -1,6 +1,12 @@
 import tiktoken
 from app.services.db import db
 from datetime import datetime
+from typing import List, Optional
+from app.utility.context_cache import context_cache
+
+RECENT_CHATS_LIMIT = 20
+# Most user messages folded into one memory turn when several arrive before a reply
+UNANSWERED_MESSAGES_LIMIT = 20
 
 # ------------------------- Token Counter ------------------------- #
 def claude_token_count(text: str) -> int:
@@ -23,61 +29,106 @@ def fetch_global_summary(user_id: str, character_id: str) -> str:
         return ""
 
 # ------------------------- Fetch Recent Chats ------------------------- #
+def format_chat_line(chat: dict) -> Optional[str]:
+    """Format a single chat document as a context line for the LLM (None for empty messages)"""
+    sender = chat.get("sender")
+    message = (chat.get("message") or "").strip()
+    
+    if not message:  # Skip empty messages
+        return None
+
+    # Handle timestamp - check if it's a string or datetime object
+    timestamp_str = None
+    if "timestamp" in chat:
+        timestamp = chat["timestamp"]
+        
+        if isinstance(timestamp, datetime):
+            # It's already a datetime object
+            timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        elif isinstance(timestamp, str):
+            try:
+                # Parse the ISO format string and format it
+                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                timestamp_str = dt.strftime("%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                # If parsing fails, use the original string
+                timestamp_str = timestamp
+        
+        if timestamp_str:
+            # Format message for Claude
+            return f"[{timestamp_str}] {sender}: {message}"
+
+    # Include message without timestamp if there is no usable timestamp
+    return f"{sender}: {message}"
+
+
+def last_user_message(lines: List[str]) -> Optional[str]:
+    """Text of the newest user message in lines built by format_chat_line, if any"""
+    for line in reversed(lines):
+        if line.startswith("[") and "] " in line:
+            line = line.split("] ", 1)[1]
+        sender, _, message = line.partition(": ")
+        if sender.lower() == "user" and message:
+            return message
+    return None
+
+
+def fetch_recent_chat_lines(user_id: str, character_id: str, limit: int = 20) -> List[str]:
+    """Fetch the most recent chats as formatted context lines, oldest first"""
+    # Query for recent chats
+    chat_cursor = db.chats.find(
+        {"userId": str(user_id), "characterId": str(character_id)},
+        {"sender": 1, "message": 1, "timestamp": 1}
+    ).sort("timestamp", -1).limit(limit)
+
+    lines = []
+    for chat in reversed(list(chat_cursor)):  # Reverse to get chronological order
+        line = format_chat_line(chat)
+        if line:
+            lines.append(line)
+    return lines
+
+
+def fetch_unanswered_user_messages(user_id: str, character_id: str, limit: int = UNANSWERED_MESSAGES_LIMIT) -> List[str]:
+    """Texts of the user messages sent since the last AI reply, oldest first"""
+    chat_cursor = db.chats.find(
+        {"userId": str(user_id), "characterId": str(character_id)},
+        {"sender": 1, "message": 1}
+    ).sort([("timestamp", -1), ("_id", -1)]).limit(limit)
+
+    messages = []
+    for chat in chat_cursor:
+        if chat.get("sender") != "user":
+            break
+        message = (chat.get("message") or "").strip()
+        if message:
+            messages.append(message)
+    return list(reversed(messages))
+
+
+def append_to_cached_recent_chats(chat: dict) -> None:
+    """Keep a cached recent-chat window current after a new chat is inserted"""
+    user_id, character_id = chat.get("userId"), chat.get("characterId")
+    recent_lines = context_cache.get(user_id, character_id, "recent_chats")
+    if recent_lines is None:
+        return
+    line = format_chat_line(chat)
+    if line:
+        context_cache.set(user_id, character_id, "recent_chats", (recent_lines + [line])[-RECENT_CHATS_LIMIT:])
+
+
 def fetch_recent_chats(user_id: str, character_id: str, limit: int = 20) -> str:
     try:
-        # Query for recent chats
-        chat_cursor = db.chats.find(
-            {"userId": str(user_id), "characterId": str(character_id)}
-        ).sort("timestamp", -1).limit(limit)
-
-        chat_docs = list(chat_cursor)
-        # print(f"Chats Docs: {chat_docs}")
+        messages = fetch_recent_chat_lines(user_id, character_id, limit)
         
         # Handle case where no chats exist
-        if not chat_docs:
+        if not messages:
             return "No previous messages found."
 
-        messages = []
-        for chat in reversed(chat_docs):  # Reverse to get chronological order
-            sender = chat.get("sender")
-            message = chat.get("message", "").strip()
-            
-            if not message:  # Skip empty messages
-                continue
-
-            # Handle timestamp - check if it's a string or datetime object
-            timestamp_str = None
-            if "timestamp" in chat:
-                timestamp = chat["timestamp"]
-                
-                if isinstance(timestamp, datetime):
-                    # It's already a datetime object
-                    timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                elif isinstance(timestamp, str):
-                    try:
-                        # Parse the ISO format string and format it
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        timestamp_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        # If parsing fails, use the original string
-                        timestamp_str = timestamp
-                
-                if timestamp_str:
-                    # Format message for Claude
-                    messages.append(f"[{timestamp_str}] {sender}: {message}")
-                else:
-                    # Include message without timestamp if timestamp parsing fails
-                    messages.append(f"{sender}: {message}")
-            else:
-                # Include message without timestamp if no timestamp field
-                messages.append(f"{sender}: {message}")
-
         print(f"Messages: {messages}")    
 
-        return "\n".join(messages) if messages else "No valid messages found."
+        return "\n".join(messages)
         
     except Exception as e:
         print(f"Error fetching recent chats: {e}")
         return "Error retrieving chat history."
-
-        
\ No newline at end of file
@@ -0,0 +1,101 @@
+# app/utility/context_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import Config
+
+
+class ConversationContextCache:
+    """
+    In-process TTL cache for per-conversation reply context (user, prompt, recent chats)
+
+    Holds at most `max_conversations` conversations, dropping the least recently used one
+    when full. Expired entries are removed on read and by a sweep every `ttl_seconds`.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_conversations: Optional[int] = None):
+        self.ttl_seconds = Config.CONTEXT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_conversations = Config.CONTEXT_CACHE_MAX_CONVERSATIONS if max_conversations is None else max_conversations
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Tuple[float, Any]]]" = OrderedDict()
+        self._next_sweep = time.monotonic() + self.ttl_seconds
+
+    @staticmethod
+    def _conversation_key(user_id: str, character_id: str) -> Tuple[str, str]:
+        return str(user_id), str(character_id)
+
+    def get(self, user_id: str, character_id: str, key: str) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired"""
+        conversation_key = self._conversation_key(user_id, character_id)
+        with self._lock:
+            entries = self._entries.get(conversation_key)
+            entry = entries.get(key) if entries else None
+            if not entry:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del entries[key]
+                if not entries:
+                    del self._entries[conversation_key]
+                return None
+            self._entries.move_to_end(conversation_key)
+            return value
+
+    def set(self, user_id: str, character_id: str, key: str, value: Any) -> None:
+        """Cache a value for a conversation"""
+        conversation_key = self._conversation_key(user_id, character_id)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.setdefault(conversation_key, {})[key] = (now + self.ttl_seconds, value)
+            self._entries.move_to_end(conversation_key)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            while len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries and conversations left empty (caller holds the lock)"""
+        for conversation_key in list(self._entries):
+            entries = self._entries[conversation_key]
+            for key in [k for k, (expires_at, _) in entries.items() if expires_at < now]:
+                del entries[key]
+            if not entries:
+                del self._entries[conversation_key]
+        self._next_sweep = now + self.ttl_seconds
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def invalidate(self, user_id: str, character_id: str, prefix: Optional[str] = None) -> None:
+        """Drop cached values for a conversation (all of them, or only keys starting with prefix)"""
+        conversation_key = self._conversation_key(user_id, character_id)
+        with self._lock:
+            if prefix is None:
+                self._entries.pop(conversation_key, None)
+                return
+            entries = self._entries.get(conversation_key, {})
+            for key in [k for k in entries if k.startswith(prefix)]:
+                del entries[key]
+
+    def invalidate_user(self, user_id: str, prefix: Optional[str] = None) -> None:
+        """Drop cached values of every conversation of a user (all, or keys starting with prefix)"""
+        with self._lock:
+            for conversation_key in [k for k in self._entries if k[0] == str(user_id)]:
+                if prefix is None:
+                    del self._entries[conversation_key]
+                    continue
+                entries = self._entries[conversation_key]
+                for key in [k for k in entries if k.startswith(prefix)]:
+                    del entries[key]
+
+    def clear(self) -> None:
+        """Drop every cached conversation"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared instance used by the chat socket, chat controller and ChatService
+context_cache = ConversationContextCache()
@@ -0,0 +1,142 @@
+# app/utility/response_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import wraps
+from typing import Callable, Hashable, NamedTuple, Optional
+
+from flask import Response, make_response, request
+
+from app.config import Config
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    mimetype: str
+    etag: str
+    ttl_seconds: int
+
+
+class ResponseCache:
+    """Bounded in-process TTL cache of serialized GET responses"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = Config.ANALYTICS_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + value.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path_prefix: Optional[str] = None) -> None:
+        """Drop every cached response, or only those whose path starts with path_prefix"""
+        with self._lock:
+            if path_prefix is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0].startswith(path_prefix)]:
+                del self._entries[key]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Shared cache for the analytics and categorization dashboards
+response_cache = ResponseCache()
+
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    """Parse YYYY-MM-DD, or YYYY-MM as the last day of that month"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        pass
+    try:
+        month_start = datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        return None
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def date_param_end(*names: str) -> Callable:
+    """range_end helper: the latest date found in the given query params (None if absent)"""
+    def range_end(args) -> Optional[date]:
+        days = [day for day in (parse_day(args.get(name)) for name in names) if day]
+        return max(days) if days else None
+    return range_end
+
+
+def _normalized_args(args) -> tuple:
+    return tuple(sorted((key, value) for key, values in args.lists() for value in values))
+
+
+def cached_response(range_end: Optional[Callable] = None):
+    """
+    Cache a GET endpoint's serialized response keyed on its path and normalized query params
+
+    `range_end(request.args)` returns the last day the response covers. Responses for ranges
+    ending before today are historical and kept for ANALYTICS_CACHE_HISTORICAL_TTL_SECONDS;
+    anything else (or no range_end) is live and kept for ANALYTICS_CACHE_LIVE_TTL_SECONDS.
+    Live keys include the current time bucket so they roll over on their own.
+    Responses carry an ETag, and a matching If-None-Match gets an empty 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.ANALYTICS_CACHE_ENABLED or request.method != "GET":
+                return view(*args, **kwargs)
+
+            end = range_end(request.args) if range_end else None
+            if end is not None and end < datetime.now().date():
+                ttl_seconds = Config.ANALYTICS_CACHE_HISTORICAL_TTL_SECONDS
+                bucket = None
+            else:
+                ttl_seconds = Config.ANALYTICS_CACHE_LIVE_TTL_SECONDS
+                bucket = int(time.time() // ttl_seconds)
+
+            key = (request.path, _normalized_args(request.args), bucket)
+            cached = response_cache.get(key)
+            cache_status = "HIT"
+
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                cached = CachedResponse(body, response.mimetype, hashlib.sha1(body).hexdigest(), ttl_seconds)
+                response_cache.set(key, cached)
+                cache_status = "MISS"
+
+            if request.if_none_match.contains(cached.etag):
+                response = Response(status=304)
+            else:
+                response = Response(cached.body, mimetype=cached.mimetype)
+            response.set_etag(cached.etag)
+            response.headers["Cache-Control"] = f"private, max-age={cached.ttl_seconds}"
+            response.headers["X-Cache"] = cache_status
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,73 @@
+# app/utility/test_audio_conversion.py
+import struct
+from typing import Optional
+
+from app.utility.audio_conversion import fix_wav_header
+
+# What ffmpeg writes when it cannot seek back on stdout
+UNKNOWN_SIZE = 0xFFFFFFFF
+
+FMT_CHUNK = b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 16000, 32000, 2, 16)
+
+
+def chunk(chunk_id: bytes, payload: bytes, size: Optional[int] = None) -> bytes:
+    size = len(payload) if size is None else size
+    return chunk_id + struct.pack('<I', size) + payload + b'\x00' * (len(payload) & 1)
+
+
+def streamed_wav(*chunks: bytes) -> bytes:
+    return b'RIFF' + struct.pack('<I', UNKNOWN_SIZE) + b'WAVE' + b''.join(chunks)
+
+
+def riff_size(wav: bytes) -> int:
+    return struct.unpack_from('<I', wav, 4)[0]
+
+
+def test_riff_and_data_sizes_are_filled_in():
+    samples = b'\x01\x00' * 800
+    wav = fix_wav_header(streamed_wav(FMT_CHUNK, chunk(b'data', samples, UNKNOWN_SIZE)))
+
+    assert riff_size(wav) == len(wav) - 8
+    data_offset = wav.index(b'data')
+    assert struct.unpack_from('<I', wav, data_offset + 4)[0] == len(samples)
+    assert wav[data_offset + 8:] == samples
+
+
+def test_metadata_chunks_before_data_are_skipped():
+    metadata = chunk(b'LIST', b'INFOISFT\x0e\x00\x00\x00Lavf60.16.100\x00')
+    samples = b'\x02\x00' * 10
+    wav = fix_wav_header(streamed_wav(FMT_CHUNK, metadata, chunk(b'data', samples, UNKNOWN_SIZE)))
+
+    data_offset = len(wav) - len(samples) - 8
+    assert wav[data_offset:data_offset + 4] == b'data'
+    assert struct.unpack_from('<I', wav, data_offset + 4)[0] == len(samples)
+    # The LIST chunk is left as it was
+    assert metadata in wav
+
+
+def test_odd_sized_chunks_are_padded_when_walking():
+    odd_chunk = chunk(b'junk', b'abc')  # 3 bytes plus a pad byte
+    samples = b'\x03\x00' * 4
+    wav = fix_wav_header(streamed_wav(FMT_CHUNK, odd_chunk, chunk(b'data', samples, UNKNOWN_SIZE)))
+
+    assert struct.unpack_from('<I', wav, len(wav) - len(samples) - 4)[0] == len(samples)
+
+
+def test_correct_headers_are_unchanged():
+    samples = b'\x04\x00' * 16
+    body = b'WAVE' + FMT_CHUNK + chunk(b'data', samples)
+    wav = b'RIFF' + struct.pack('<I', len(body)) + body
+
+    assert fix_wav_header(wav) == wav
+
+
+def test_missing_data_chunk_only_fixes_riff_size():
+    wav = fix_wav_header(streamed_wav(FMT_CHUNK))
+
+    assert riff_size(wav) == len(wav) - 8
+    assert wav[8:] == b'WAVE' + FMT_CHUNK
+
+
+def test_non_wav_input_is_returned_as_is():
+    for data in (b'', b'RIFF', b'OggS\x00\x02' + b'\x00' * 20, b'RIFF\x00\x00\x00\x00AVI LIST'):
+        assert fix_wav_header(data) == data
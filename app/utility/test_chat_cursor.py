@@ -0,0 +1,80 @@
+# app/utility/test_chat_cursor.py
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.utility.chat_cursor import ChatCursor, chat_keyset_filter, decode_chat_cursor, encode_chat_cursor
+
+CHAT_ID = ObjectId("65a1f0c2e4b0a1b2c3d4e5f6")
+
+
+def test_date_timestamp_round_trips():
+    timestamp = datetime(2024, 1, 12, 9, 30, 15, 123000)
+    cursor = decode_chat_cursor(encode_chat_cursor({"_id": CHAT_ID, "timestamp": timestamp}))
+
+    assert cursor == ChatCursor(timestamp, CHAT_ID)
+    assert isinstance(cursor.timestamp, datetime)
+
+
+def test_string_timestamp_round_trips_unchanged():
+    timestamp = "2023-06-01T08:00:00.000Z"
+    cursor = decode_chat_cursor(encode_chat_cursor({"_id": str(CHAT_ID), "timestamp": timestamp}))
+
+    assert cursor == ChatCursor(timestamp, CHAT_ID)
+
+
+def test_cursor_is_url_safe_without_padding():
+    token = encode_chat_cursor({"_id": CHAT_ID, "timestamp": "2023-06-01T08:00:00"})
+
+    assert "=" not in token
+    assert set(token) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not-a-cursor",
+    encode_chat_cursor({"_id": "not-an-object-id", "timestamp": "2023-06-01T08:00:00"}),
+    "eyJ0IjoiMjAyMy0wNi0wMSJ9",  # {"t":"2023-06-01"}: no "d" or "id"
+])
+def test_malformed_cursors_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_chat_cursor(token)
+
+
+def test_keyset_filter_breaks_timestamp_ties_on_id():
+    timestamp = datetime(2024, 1, 12, 9, 30)
+    conditions = chat_keyset_filter(ChatCursor(timestamp, CHAT_ID), descending=False)["$or"]
+
+    assert conditions[:2] == [
+        {"timestamp": {"$gt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$gt": CHAT_ID}},
+    ]
+
+
+def test_keyset_filter_crosses_from_dates_to_strings_when_descending():
+    timestamp = datetime(2024, 1, 12, 9, 30)
+
+    assert chat_keyset_filter(ChatCursor(timestamp, CHAT_ID))["$or"] == [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": CHAT_ID}},
+        {"timestamp": {"$type": "string"}},
+    ]
+
+
+def test_keyset_filter_crosses_from_strings_to_dates_when_ascending():
+    timestamp = "2023-06-01T08:00:00"
+
+    assert chat_keyset_filter(ChatCursor(timestamp, CHAT_ID), descending=False)["$or"] == [
+        {"timestamp": {"$gt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$gt": CHAT_ID}},
+        {"timestamp": {"$type": "date"}},
+    ]
+
+
+def test_keyset_filter_stays_within_the_type_otherwise():
+    date_cursor = ChatCursor(datetime(2024, 1, 12), CHAT_ID)
+    string_cursor = ChatCursor("2023-06-01T08:00:00", CHAT_ID)
+
+    assert len(chat_keyset_filter(date_cursor, descending=False)["$or"]) == 2
+    assert len(chat_keyset_filter(string_cursor, descending=True)["$or"]) == 2
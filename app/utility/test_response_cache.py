@@ -0,0 +1,140 @@
+# app/utility/test_response_cache.py
+from datetime import date, timedelta
+
+import pytest
+from flask import Flask, jsonify
+
+from app.utility import response_cache as response_cache_module
+from app.utility.response_cache import CachedResponse, ResponseCache, cached_response, date_param_end, parse_day
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def entry(body=b"{}", ttl_seconds=60):
+    return CachedResponse(body, "application/json", "etag", ttl_seconds)
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = ResponseCache(max_entries=10)
+    cache.set(("/a", (), None), entry(ttl_seconds=60))
+
+    clock.now += 60
+    assert cache.get(("/a", (), None)) is not None
+    clock.now += 1
+    assert cache.get(("/a", (), None)) is None
+    assert cache.get_stats() == {"entries": 0, "hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.set(("/a", (), None), entry(b"a"))
+    cache.set(("/b", (), None), entry(b"b"))
+    cache.get(("/a", (), None))  # /b is now the least recently used
+    cache.set(("/c", (), None), entry(b"c"))
+
+    assert cache.get(("/b", (), None)) is None
+    assert cache.get(("/a", (), None)).body == b"a"
+    assert cache.get(("/c", (), None)).body == b"c"
+
+
+def test_invalidate_by_path_prefix(clock):
+    cache = ResponseCache(max_entries=10)
+    cache.set(("/api/analytics/users", (), None), entry())
+    cache.set(("/api/categorization/sessions", (), None), entry())
+
+    cache.invalidate("/api/categorization")
+    assert cache.get(("/api/categorization/sessions", (), None)) is None
+    assert cache.get(("/api/analytics/users", (), None)) is not None
+
+    cache.invalidate()
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_parse_day():
+    assert parse_day("2024-02-10") == date(2024, 2, 10)
+    assert parse_day("2024-02") == date(2024, 2, 29)
+    assert parse_day("2023-12") == date(2023, 12, 31)
+    assert parse_day("yesterday") is None
+    assert parse_day(None) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(response_cache_module, "response_cache", ResponseCache(max_entries=10))
+    monkeypatch.setattr(response_cache_module.Config, "ANALYTICS_CACHE_ENABLED", True)
+
+    app = Flask(__name__)
+    app.view_calls = 0
+
+    @app.route("/report")
+    @cached_response(range_end=date_param_end("start_date", "end_date"))
+    def report():
+        app.view_calls += 1
+        return jsonify({"calls": app.view_calls})
+
+    @app.route("/missing")
+    @cached_response()
+    def missing():
+        app.view_calls += 1
+        return jsonify({"error": "not found"}), 404
+
+    return app.test_client()
+
+
+def test_repeated_requests_are_served_from_the_cache(client):
+    first = client.get("/report?end_date=2020-01-31&start_date=2020-01-01")
+    second = client.get("/report?start_date=2020-01-01&end_date=2020-01-31")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == {"calls": 1}
+    assert client.application.view_calls == 1
+
+
+def test_historical_and_live_ranges_get_their_ttls(client):
+    historical = client.get("/report?end_date=2020-01-31")
+    live = client.get(f"/report?end_date={(date.today() + timedelta(days=1)).isoformat()}")
+
+    assert historical.headers["Cache-Control"] == f"private, max-age={response_cache_module.Config.ANALYTICS_CACHE_HISTORICAL_TTL_SECONDS}"
+    assert live.headers["Cache-Control"] == f"private, max-age={response_cache_module.Config.ANALYTICS_CACHE_LIVE_TTL_SECONDS}"
+
+
+def test_matching_etag_gets_an_empty_304(client):
+    etag = client.get("/report?end_date=2020-01-31").headers["ETag"]
+
+    not_modified = client.get("/report?end_date=2020-01-31", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+    assert not_modified.headers["ETag"] == etag
+
+    changed = client.get("/report?end_date=2020-01-31", headers={"If-None-Match": '"stale"'})
+    assert changed.status_code == 200
+    assert changed.get_json() == {"calls": 1}
+
+
+def test_error_responses_are_not_cached(client):
+    assert client.get("/missing").status_code == 404
+    assert client.get("/missing").status_code == 404
+    assert client.application.view_calls == 2
+
+
+def test_disabled_cache_always_calls_the_view(client, monkeypatch):
+    monkeypatch.setattr(response_cache_module.Config, "ANALYTICS_CACHE_ENABLED", False)
+    client.get("/report?end_date=2020-01-31")
+    response = client.get("/report?end_date=2020-01-31")
+
+    assert "X-Cache" not in response.headers
+    assert client.application.view_calls == 2
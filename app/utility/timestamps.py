@@ -0,0 +1,88 @@
+# app/utility/timestamps.py
+"""
+Chat timestamp helpers for the ISO-string -> BSON date migration
+
+Chats used to store `timestamp` as an ISO string; new chats store a native BSON date.
+Until every document is migrated, reads must accept both. BSON orders all strings
+before all dates. That is only chronological while every string timestamp is older than
+every date one, so the migration converts chats newest first and refuses to run while
+new chats are still written as strings (CHAT_TIMESTAMPS_NATIVE off). Strings that cannot
+be parsed are left in place and still sort before all dates.
+"""
+from datetime import datetime
+from typing import Optional, Union
+
+from app.config import Config
+
+Timestamp = Union[str, datetime]
+
+
+def parse_chat_timestamp(value: Optional[Timestamp]) -> Optional[datetime]:
+    """Turn a stored chat timestamp (ISO string or datetime) into a naive UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_chat_timestamp(value: Optional[Timestamp]) -> Optional[str]:
+    """ISO string for API/socket payloads, whichever way the timestamp is stored"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def chat_timestamp_for_storage(value: datetime) -> Timestamp:
+    """The value to write into chats.timestamp for a new chat"""
+    return value if Config.CHAT_TIMESTAMPS_NATIVE else value.isoformat()
+
+
+def timestamp_range_filter(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    end_inclusive: bool = True,
+    field: str = "timestamp"
+) -> dict:
+    """
+    Query fragment matching `field` in [start, end] for both date and string timestamps
+
+    Returns {"$or": [<date range>, <string range>]}; combine it with other `$or`
+    conditions through `$and`.
+    """
+    end_operator = "$lte" if end_inclusive else "$lt"
+    date_range, string_range = {}, {}
+    if start is not None:
+        date_range["$gte"] = start
+        string_range["$gte"] = start.isoformat()
+    if end is not None:
+        date_range[end_operator] = end
+        string_range[end_operator] = end.isoformat()
+    if not date_range:
+        return {}
+
+    return {"$or": [{field: date_range}, {field: string_range}]}
+
+
+def timestamp_after_filter(value: Timestamp, field: str = "timestamp") -> dict:
+    """Query fragment matching `field` strictly after `value` for both storage types"""
+    moment = parse_chat_timestamp(value)
+    if moment is None:
+        return {field: {"$gt": value}}
+    return {"$or": [{field: {"$gt": _to_bson_precision(moment)}}, {field: {"$gt": moment.isoformat()}}]}
+
+
+def timestamp_equals_filter(value: Timestamp, field: str = "timestamp") -> dict:
+    """Query fragment matching `field` equal to `value` for both storage types"""
+    moment = parse_chat_timestamp(value)
+    if moment is None:
+        return {field: value}
+    return {"$or": [{field: _to_bson_precision(moment)}, {field: moment.isoformat()}]}
+
+
+def _to_bson_precision(moment: datetime) -> datetime:
+    # BSON dates keep milliseconds; migrated string timestamps lose their microseconds
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
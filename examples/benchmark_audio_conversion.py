@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Audio Conversion Benchmark
+
+Compares the latency of transcoding a voice note to WAV through ffmpeg pipes (in memory)
+against the temp-file path. Requires ffmpeg on the PATH.
+
+Usage:
+    python examples/benchmark_audio_conversion.py [audio_file] [--iterations 20]
+
+Without a file, a 10 second Ogg/Opus clip is generated with ffmpeg.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utility.audio_conversion import convert_to_wav_piped, convert_to_wav_via_temp_files
+
+
+def generate_test_clip(seconds=10):
+    """Ogg/Opus clip like the voice notes the mobile app uploads"""
+    result = subprocess.run(
+        [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-c:a', 'libopus', '-b:a', '32k', '-f', 'ogg', 'pipe:1'
+        ],
+        capture_output=True,
+        timeout=60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not generate test clip: {result.stderr.decode(errors='replace')}")
+    return result.stdout
+
+
+def benchmark(name, convert, audio_data, iterations):
+    convert(audio_data)  # Warm up (page cache, ffmpeg binary)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        wav_data = convert(audio_data)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{name:<12} mean {statistics.mean(timings):8.1f} ms   p50 {statistics.median(timings):8.1f} ms   "
+          f"p95 {p95:8.1f} ms   ({len(wav_data)} bytes of WAV)")
+    return wav_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare piped and temp-file audio conversion")
+    parser.add_argument("audio_file", nargs="?", help="Audio file to convert (default: generated Ogg/Opus clip)")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.audio_file:
+        with open(args.audio_file, 'rb') as audio_file:
+            audio_data = audio_file.read()
+    else:
+        audio_data = generate_test_clip()
+
+    print("🎵 Audio Conversion Benchmark")
+    print("=" * 50)
+    print(f"Input: {args.audio_file or 'generated Ogg/Opus clip'} ({len(audio_data)} bytes), {args.iterations} iterations")
+
+    piped_wav = benchmark("piped", convert_to_wav_piped, audio_data, args.iterations)
+    temp_file_wav = benchmark("temp files", convert_to_wav_via_temp_files, audio_data, args.iterations)
+
+    if piped_wav == temp_file_wav:
+        print("✅ Both paths produce identical WAV output")
+    else:
+        print("⚠️ Outputs differ (sizes: piped {0}, temp files {1})".format(len(piped_wav), len(temp_file_wav)))
+
+
+if __name__ == "__main__":
+    main()
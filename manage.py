@@ -0,0 +1,252 @@
+"""
+Maintenance commands
+
+Usage:
+    python manage.py backfill-sessions [--user-id USER_ID]
+    python manage.py backfill-daily-stats [--user-id USER_ID]
+    python manage.py rebuild-daily-stats --start YYYY-MM-DD --end YYYY-MM-DD [--user-id USER_ID]
+    python manage.py migrate-timestamps [--batch-size N] [--pause SECONDS]
+    python manage.py ensure-indexes [--collection NAME ...]
+    python manage.py explain-queries
+    python manage.py train-classifier [--max-users N]
+    python manage.py evaluate-classifier [--test-fraction F] [--threshold T] [--max-users N]
+    python manage.py backfill-memories [--user-id USER_ID ...] [--start-index N] [--max-users N] [--processes N]
+                                       [--character-id ID] [--batch-size N] [--sub-batch-size N] [--restart]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from app.services.db import db
+from app.services.indexes import INDEXES
+from app.utility.timestamps import parse_chat_timestamp
+
+
+def backfill_sessions(args):
+    """
+    Build the `sessions` collection from existing chats (safe to re-run; ids are kept)
+
+    Run it while the app has SESSION_STORE_WRITES_ENABLED on, so chats saved meanwhile are
+    recorded too, and turn SESSION_STORE_READS_ENABLED on once it has finished.
+    """
+    from app.services.session_store import session_store
+
+    user_ids = [args.user_id] if args.user_id else db.chats.distinct("userId")
+    print(f"🔄 Backfilling sessions for {len(user_ids)} user(s) (gap: {session_store.gap_minutes} minutes)")
+
+    start_time = time.time()
+    total_sessions = 0
+    for idx, user_id in enumerate(user_ids, start=1):
+        try:
+            total_sessions += session_store.rebuild_user(user_id)
+        except Exception as e:
+            print(f"❌ Failed to backfill sessions for user {user_id}: {e}")
+        if idx % 100 == 0:
+            print(f"   {idx}/{len(user_ids)} users processed")
+
+    print(f"✅ Stored {total_sessions} sessions for {len(user_ids)} user(s) in {time.time() - start_time:.1f}s")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date {value!r}. Use YYYY-MM-DD")
+
+
+def rebuild_daily_stats(args):
+    """Recompute `user_daily_stats` rows for a date range from chats"""
+    from app.services.daily_stats import daily_stats
+
+    if args.start > args.end:
+        print("❌ --start must not be after --end")
+        return 1
+
+    print(f"🔄 Rebuilding daily stats from {args.start} to {args.end}" + (f" for user {args.user_id}" if args.user_id else ""))
+    start_time = time.time()
+    written = daily_stats.rebuild_range(args.start, args.end, user_id=args.user_id)
+    print(f"✅ Wrote {written} daily stats rows in {time.time() - start_time:.1f}s")
+
+
+def backfill_daily_stats(args):
+    """
+    Build `user_daily_stats` for the whole chat history
+
+    Turn DAILY_STATS_ROLLUP_READS_ENABLED on once it has finished; until then the analytics
+    keep scanning chats.
+    """
+    query = {"userId": args.user_id} if args.user_id else {}
+    first_chat = db.chats.find_one(query, {"timestamp": 1}, sort=[("timestamp", 1)])
+    if not first_chat:
+        print("ℹ️ No chats found, nothing to backfill")
+        return
+
+    args.start = parse_chat_timestamp(first_chat["timestamp"]).date()
+    args.end = datetime.utcnow().date()
+    return rebuild_daily_stats(args)
+
+
+def migrate_timestamps(args):
+    """Convert ISO-string chat timestamps to BSON dates"""
+    from app.services.timestamp_migration import migrate_chat_timestamps
+
+    remaining = db.chats.count_documents({"timestamp": {"$type": "string"}})
+    print(f"🔄 {remaining} chats still have string timestamps")
+    migrate_chat_timestamps(batch_size=args.batch_size, pause_seconds=args.pause)
+
+
+def ensure_indexes(args):
+    """Build the declared indexes (existing ones are left alone)"""
+    from app.services.indexes import ensure_indexes as build_indexes
+
+    start_time = time.time()
+    report = build_indexes(args.collection)
+    failed = sum(len(result["failed"]) for result in report.values())
+    print(f"{'⚠️' if failed else '✅'} Indexes ensured in {time.time() - start_time:.1f}s ({failed} failed)")
+    return 1 if failed else 0
+
+
+def explain_queries(args):
+    """Explain the app's known query shapes and flag collection scans"""
+    from app.services.indexes import explain_query_shapes
+
+    results = explain_query_shapes()
+    scans = 0
+    for result in results:
+        label = f"{result['collection']}: {result['name']}"
+        if "error" in result:
+            print(f"❌ {label} — explain failed: {result['error']}")
+        elif result["collectionScan"]:
+            scans += 1
+            print(f"⚠️ {label} — COLLSCAN ({' <- '.join(result['stages'])})")
+        else:
+            sort_note = " (in-memory sort)" if result["inMemorySort"] else ""
+            print(f"✅ {label} — {' <- '.join(result['stages'])}{sort_note}")
+
+    print(f"{scans} of {len(results)} query shapes use a collection scan")
+    return 1 if scans else 0
+
+
+def train_classifier(args):
+    """Fit the local category classifier on stored Gemini categorizations and save it"""
+    from app.services.local_classifier import LocalCategoryClassifier, load_training_examples
+
+    sessions, labels = load_training_examples(args.max_users)
+    if len(set(labels)) < 2:
+        print(f"❌ Need sessions from at least two categories to train, found {len(sessions)} session(s)")
+        return 1
+
+    print(f"🔄 Training on {len(sessions)} sessions across {len(set(labels))} labels")
+    start_time = time.time()
+    classifier = LocalCategoryClassifier().train(sessions, labels)
+    classifier.save()
+    print(f"✅ Saved classifier to {classifier.model_path} in {time.time() - start_time:.1f}s")
+
+
+def evaluate_classifier(args):
+    """Hold-out agreement of the local classifier with the stored Gemini labels"""
+    from app.services.local_classifier import evaluate, load_training_examples
+
+    sessions, labels = load_training_examples(args.max_users)
+    if len(set(labels)) < 2 or len(sessions) < 10:
+        print(f"❌ Not enough labelled sessions to evaluate ({len(sessions)} found)")
+        return 1
+
+    report = evaluate(sessions, labels, test_fraction=args.test_fraction, threshold=args.threshold)
+    print(f"📊 Trained on {report['train_sessions']} sessions, tested on {report['test_sessions']}")
+    print(f"   Agreement with Gemini: {report['agreement']}% (primary category: {report['primary_agreement']}%)")
+    print(f"   At confidence >= {report['threshold']}: {report['local_fraction']}% kept local, "
+          f"{report['escalated_fraction']}% escalated, {report['local_agreement']}% agreement on local labels")
+
+
+def backfill_memories(args):
+    """Add users' chats to Mem0 on a process pool and report throughput"""
+    from app.memory.backfill_runner import MemoryBackfillPool
+    from app.services.job_handlers import DEFAULT_BACKFILL_CHARACTER_ID, list_users
+
+    user_ids = args.user_id or list_users({"start_index": args.start_index, "max_users": args.max_users})
+    character_id = args.character_id or DEFAULT_BACKFILL_CHARACTER_ID
+    pool = MemoryBackfillPool(processes=args.processes)
+    print(f"🔄 Backfilling memories for {len(user_ids)} user(s) with character {character_id} on {pool.processes} process(es)")
+
+    def on_user_complete(result):
+        status = f"❌ {result['error']}" if "error" in result else "✅"
+        print(f"   {status} {result['user_id']}: {result['total_processed']} messages, {result['total_failed']} failed "
+              f"({result.get('elapsed_seconds', 0)}s, {result.get('rate_limited_seconds', 0)}s rate limited)")
+
+    try:
+        report = pool.run(
+            user_ids,
+            character_id,
+            batch_size=args.batch_size,
+            sub_batch_size=args.sub_batch_size,
+            resume=not args.restart,
+            on_user_complete=on_user_complete
+        )
+    finally:
+        pool.shutdown()
+
+    print(f"📊 {report['users']} users ({report['failed_users']} failed), {report['messages']} messages in {report['elapsed_seconds']}s")
+    print(f"   {report['users_per_minute']} users/min, {report['messages_per_second']} messages/s, "
+          f"{report['rate_limited_seconds']}s waiting on rate limits")
+    return 1 if report["failed_users"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sessions_parser = subparsers.add_parser("backfill-sessions", help="Build the sessions collection from chats")
+    sessions_parser.add_argument("--user-id", help="Only backfill this user")
+    sessions_parser.set_defaults(func=backfill_sessions)
+
+    backfill_daily_parser = subparsers.add_parser("backfill-daily-stats", help="Build user_daily_stats from all chats")
+    backfill_daily_parser.add_argument("--user-id", help="Only backfill this user")
+    backfill_daily_parser.set_defaults(func=backfill_daily_stats)
+
+    rebuild_daily_parser = subparsers.add_parser("rebuild-daily-stats", help="Recompute user_daily_stats for a date range")
+    rebuild_daily_parser.add_argument("--start", required=True, type=_parse_date, help="First day (YYYY-MM-DD)")
+    rebuild_daily_parser.add_argument("--end", required=True, type=_parse_date, help="Last day (YYYY-MM-DD)")
+    rebuild_daily_parser.add_argument("--user-id", help="Only rebuild this user")
+    rebuild_daily_parser.set_defaults(func=rebuild_daily_stats)
+
+    timestamps_parser = subparsers.add_parser("migrate-timestamps", help="Convert string chat timestamps to BSON dates")
+    timestamps_parser.add_argument("--batch-size", type=int, default=None, help="Chats per batch")
+    timestamps_parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between batches")
+    timestamps_parser.set_defaults(func=migrate_timestamps)
+
+    indexes_parser = subparsers.add_parser("ensure-indexes", help="Build the declared MongoDB indexes")
+    indexes_parser.add_argument("--collection", action="append", choices=sorted(INDEXES), help="Only this collection (repeatable)")
+    indexes_parser.set_defaults(func=ensure_indexes)
+
+    explain_parser = subparsers.add_parser("explain-queries", help="Flag known query shapes that scan a whole collection")
+    explain_parser.set_defaults(func=explain_queries)
+
+    train_parser = subparsers.add_parser("train-classifier", help="Train the local session category classifier")
+    train_parser.add_argument("--max-users", type=int, default=None, help="Only use this many users' categorizations")
+    train_parser.set_defaults(func=train_classifier)
+
+    evaluate_parser = subparsers.add_parser("evaluate-classifier", help="Evaluate the local classifier against Gemini labels")
+    evaluate_parser.add_argument("--test-fraction", type=float, default=0.2, help="Share of sessions held out for testing")
+    evaluate_parser.add_argument("--threshold", type=float, default=None, help="Confidence needed to skip Gemini")
+    evaluate_parser.add_argument("--max-users", type=int, default=None, help="Only use this many users' categorizations")
+    evaluate_parser.set_defaults(func=evaluate_classifier)
+
+    memories_parser = subparsers.add_parser("backfill-memories", help="Add existing chats to Mem0 on a process pool")
+    memories_parser.add_argument("--user-id", action="append", help="Only this user (repeatable)")
+    memories_parser.add_argument("--start-index", type=int, default=0, help="Skip this many users (in _id order)")
+    memories_parser.add_argument("--max-users", type=int, default=None, help="Process at most this many users")
+    memories_parser.add_argument("--processes", type=int, default=None, help="Worker processes")
+    memories_parser.add_argument("--character-id", default=None, help="Character whose chats are added")
+    memories_parser.add_argument("--batch-size", type=int, default=50, help="Chats per batch")
+    memories_parser.add_argument("--sub-batch-size", type=int, default=10, help="Chats per sub-batch")
+    memories_parser.add_argument("--restart", action="store_true", help="Ignore saved positions and start from each user's first chat")
+    memories_parser.set_defaults(func=backfill_memories)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())